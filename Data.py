@@ -1,52 +1,239 @@
 import numpy as np
 import scipy.optimize as op
 import scipy.interpolate as ip
-import ast, os, time, threading, copy, datetime
-from math import sin, cos, sqrt, pi
+import ast, os, time, threading, copy, datetime, itertools, zlib, lzma, tempfile, mmap, weakref, hashlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from math import sin, cos, sqrt, pi, ceil
 import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
 from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtCore import Qt, pyqtSignal, QThread, QObject
 from struct import Struct
-import kspace
+try:
+    import kspace
+    KSPACE_BACKEND = "compiled"   # kspace in use, "numpy" when the extension is not built for this interpreter
+except ImportError:
+    import kspacenumpy as kspace
+    KSPACE_BACKEND = "numpy"
+
+
+LAZY_FILE_SIZE = 256*1024**2   # files larger than this (in bytes) are memory-mapped on import
+SLAB_SIZE = 16*1024**2   # bytes converted and written at a time by the file writers
+JOURNAL_CHECKPOINT_INTERVAL = 5   # operations between two checkpoints of the journal
+JOURNAL_MAX_CHECKPOINTS = 4   # replayable checkpoints kept by the journal, older ones are dropped
+JOURNAL_CHECKPOINT_BYTES = 1024**3   # bytes of data held in memory by the replayable checkpoints, older ones are dropped above it
+MEMORY_BUDGET = 512*1024**2   # bytes a processing step may hold at once, memory-mapped data larger than this is processed out of core
+SCRATCH_DIR = os.path.join(os.path.expanduser("~"), ".arpesviewer", "scratch")
+UNIFORM_TOLERANCE = 1e-6   # largest deviation from a uniform grid, relative to the step, for a scale to be kept as offset and step
+KSPACE_SOLVER = "closed"   # solver of the vertical slit angles, "closed" for the closed-form inverse or "newton" for the iterative one of kspace
+PLAN_CACHE_SIZE = 256*1024**2   # bytes of k-space mapping plans kept, the least recently used ones are dropped above it
+
+
+class DataFileError(Exception):
+    '''
+    Error in reading a data file outside the GUI thread.
+    '''
+    pass
+
+
+def showError(message):
+    '''
+    Show a reading error, it is raised as DataFileError when called outside the GUI thread or in a worker process.
+    '''
+    if threading.current_thread() is threading.main_thread() and mp.parent_process() is None:
+        QMessageBox.information(None, "Error", message, QMessageBox.Ok)
+    else:
+        raise DataFileError(message)
 
 
 #decorator
 def FalseRawData(func):
     '''
     Decorator setting rawdataflag.
+    A result which is still a view of rawdata is copied once here, so that rawdata is never modified by later operations.
+    Data read from a file on request (LazyArray) is copied to an array first.
     '''
     def wrapper(*args):
         instance = args[0]
-        func(*args)
+        if isinstance(instance.data, LazyArray):
+            instance.data = copyArray(instance.data)
+        result = func(*args)
+        if result == -1:   # the operation failed and left the data as it was
+            return result
+        instance.detach()
+        instance.modified()
         instance.rawdataflag = False
-        instance.writeProperty(False)
+        instance.journal.record(wrapper, args[1:], instance)
+        return result
     return wrapper
 
 
-def ArPy2Data(filepath):
+def mapArray(filepath, dtype, offset, shape, mode='c'):
+    '''
+    Map a column-major (Igor ordered) data block of a file without reading it.
+    mode 'c' keeps in-place modifications in memory, mode 'r' is read-only.
+    '''
+    return np.memmap(filepath, dtype=dtype, mode=mode, offset=offset, shape=shape, order='F')
+
+
+@contextmanager
+def replacedFile(filepath):
+    '''
+    Path of a temporary file next to filepath which replaces it once written, nothing is replaced if it was not created.
+    Data memory-mapped from filepath, as when a lazily loaded file is exported to itself, stays readable during the write,
+    and filepath is left as it was if the write fails.
+    A file which cannot be replaced, as a mapped file on Windows, is reported with showError.
+    '''
+    directory, base = os.path.split(os.path.abspath(filepath))
+    temppath = os.path.join(directory, ".%s.%d.%d.tmp" % (base, os.getpid(), threading.get_ident()))
+    try:
+        yield temppath
+        if os.path.exists(temppath):
+            try:
+                os.replace(temppath, filepath)
+            except OSError as err:
+                showError("Cannot replace "+base+": "+(err.strerror or str(err))+".")
+    finally:
+        if os.path.exists(temppath):
+            os.remove(temppath)
+
+
+class LazyArray():
+    '''
+    Read-only array of a file whose hyperslabs are read on request, as the viewers slice the data they show.
+    Subclasses implement read(slices) for a tuple of integers and slices of positive step, other keys read the whole array.
+    '''
+    def __init__(self, shape, dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size*self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read(tuple(slice(0, n) for n in self.shape))
+        return data if dtype is None else data.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        ellipsis = [i for i, k in enumerate(key) if k is Ellipsis]
+        if len(ellipsis) == 1:
+            i = ellipsis[0]
+            key = key[:i]+(slice(None),)*(self.ndim-len(key)+1)+key[i+1:]
+        if len(key) > self.ndim or not all(isinstance(k, (slice, int, np.integer)) for k in key):
+            return np.asarray(self)[key]
+        slices = []
+        reverse = []   # reverses the dimensions read in ascending order for a negative step
+        shape = []
+        for k, n in zip(key+(slice(None),)*(self.ndim-len(key)), self.shape):
+            if isinstance(k, slice):
+                start, stop, step = k.indices(n)
+                count = len(range(start, stop, step))
+                if step < 0 and count > 0:
+                    start, step = start+step*(count-1), -step
+                    reverse.append(slice(None, None, -1))
+                else:
+                    reverse.append(slice(None))
+                slices.append(slice(start, start+step*(count-1)+1 if count > 0 else start, step))
+                shape.append(count)
+            else:
+                i = int(k)+n if k < 0 else int(k)
+                if i < 0 or i >= n:
+                    raise IndexError("index %d is out of bounds for axis with size %d" % (k, n))
+                slices.append(i)
+        if 0 in shape:
+            return np.empty(shape, dtype=self.dtype)
+        return self.read(tuple(slices))[tuple(reverse)]
+
+
+def isMapped(data):
+    '''
+    True if data is a memory-mapped file or a view of one.
+    '''
+    while isinstance(data, np.ndarray):
+        if isinstance(data, np.memmap):
+            return True
+        data = data.base
+    return isinstance(data, mmap.mmap) and data not in sharedMappings
+
+
+def outOfCore(data):
+    '''
+    Memory-mapped or lazy data larger than MEMORY_BUDGET is processed slab by slab into scratch files instead of in memory.
+    '''
+    return (isMapped(data) or isinstance(data, LazyArray)) and data.nbytes > MEMORY_BUDGET
+
+
+def scratchArray(shape, dtype):
+    '''
+    Array mapped on an anonymous file of SCRATCH_DIR, the file is removed by the system once the array is released.
+    '''
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    with tempfile.TemporaryFile(dir=SCRATCH_DIR) as scratchfile:
+        return np.memmap(scratchfile, dtype=dtype, mode='w+', shape=shape)
+
+
+def newArray(data, shape, dtype):
+    '''
+    Uninitialized result array for an operation on data, on disk if data is out of core.
+    '''
+    if outOfCore(data):
+        return scratchArray(shape, dtype)
+    return np.empty(shape, dtype=dtype)
+
+
+def slabStep(data, axis, factor=1, multiple=1):
+    '''
+    Number of indices along axis in a slab whose float64 copy, times factor for the temporaries, fits in MEMORY_BUDGET.
+    The step is a multiple of multiple.
+    '''
+    slicebytes = 8*int(np.prod(data.shape))//max(data.shape[axis], 1)
+    step = MEMORY_BUDGET//max(slicebytes*factor, 1)
+    return max(step//multiple, 1)*multiple
+
+
+def copyArray(data):
+    if not outOfCore(data):
+        return np.copy(data)
+    result = scratchArray(data.shape, data.dtype)
+    step = slabStep(data, 0)
+    for i in range(0, data.shape[0], step):
+        result[i:i+step] = data[i:i+step]
+    return result
+
+
+def ArPy2Data(filepath, lazy=False):
     '''
     The arpy file should be exported from Igor Pro.
+    If lazy is True, the data section is memory-mapped instead of being read into memory.
     '''
+    if isChunkedArPy(filepath):
+        return ChunkedArPy2Data(filepath)
     base = os.path.basename(filepath)
     filename = os.path.splitext(base)[0]
     with open(filepath, "rb") as binfile:
         headerStruct = Struct("<9sss5i")
         header = headerStruct.unpack(binfile.read(headerStruct.size))
         if header[0].decode("UTF-8") != "ARPY_FILE":
-            QMessageBox.information(None, "Error", filepath.split('/')[-1]+" is not a standard data file.", QMessageBox.Ok)
+            showError(filepath.split('/')[-1]+" is not a standard data file.")
             return None
         else:
             #read string property
-            if header[1].decode("UTF-8") == 'N':
-                energyAxis = None
-            else:
-                energyAxis = header[1].decode("UTF-8")
-            if header[2].decode("UTF-8") == 'N':
-                spacemode = None
-            elif header[2].decode("UTF-8") == 'A':
-                spacemode = "Angular"
-            elif header[2].decode("UTF-8") == 'M':
-                spacemode = "Momentum"
+            energyAxis, spacemode = decodeArPyFlags(header[1], header[2])
 
             #read dimension
             dims = header[3]
@@ -60,74 +247,57 @@ def ArPy2Data(filepath):
             xscale = np.zeros(size[0], dtype=np.float64)
             byte_num = binfile.readinto(xscale)
             if byte_num != 8*size[0]:
-                QMessageBox.information(None, "Error", "Error in reading xscale.", QMessageBox.Ok)
+                showError("Error in reading xscale.")
                 return None
             if dims > 1:
                 yscale = np.zeros(size[1], dtype=np.float64)
                 byte_num = binfile.readinto(yscale)
                 if byte_num != 8*size[1]:
-                    QMessageBox.information(None, "Error", "Error in reading yscale.", QMessageBox.Ok)
+                    showError("Error in reading yscale.")
                     return None
             if dims > 2:
                 zscale = np.zeros(size[2], dtype=np.float64)
                 byte_num = binfile.readinto(zscale)
                 if byte_num != 8*size[2]:
-                    QMessageBox.information(None, "Error", "Error in reading zscale.", QMessageBox.Ok)
+                    showError("Error in reading zscale.")
                     return None
             if dims > 3:
                 tscale = np.zeros(size[3], dtype=np.float64)
                 byte_num = binfile.readinto(tscale)
                 if byte_num != 8*size[3]:
-                    QMessageBox.information(None, "Error", "Error in reading tscale.", QMessageBox.Ok)
+                    showError("Error in reading tscale.")
                     return None
             
             #read data
-            if dims == 1:
-                shape = size[0]
-                item_num = size[0]
-                data = np.zeros(shape, dtype=np.float32)
-                byte_num = binfile.readinto(data)
-            elif dims == 2:
-                shape = (size[1], size[0])
-                item_num = size[0]*size[1]
-                data = np.zeros(shape, dtype=np.float32)
+            shape = size[0:dims]
+            item_num = int(np.prod(shape))
+            rawdata = None
+            if lazy:
+                # igor uses Fortran order, the data section starts right after the scales
+                offset = binfile.tell()
+                if os.path.getsize(filepath)-offset < 4*item_num:
+                    showError("Error in reading data.")
+                    return None
+                data = mapArray(filepath, np.float32, offset, shape)
+                rawdata = mapArray(filepath, np.float32, offset, shape, mode='r')
+            else:
+                data = np.zeros(shape[::-1], dtype=np.float32)   # numpy uses C order: layer first, column second, row third
                 byte_num = binfile.readinto(data)
+                if byte_num != 4*item_num:
+                    showError("Error in reading data.")
+                    return None
                 data = data.T
-            elif dims == 3:
-                shape = (size[2], size[1], size[0])   # numpy uses C order: layer first, column second, row third
-                item_num = size[0]*size[1]*size[2]
-                data = np.zeros(shape, dtype=np.float32)
-                byte_num = binfile.readinto(data)
-                data = data.transpose(2,1,0)
-            elif dims == 4:
-                shape = (size[3], size[2], size[1], size[0])
-                item_num = size[0]*size[1]*size[2]*size[3]
-                data = np.zeros(shape, dtype=np.float32)
-                byte_num = binfile.readinto(data)
-                data = data.transpose(3,2,1,0)
-            if byte_num != 4*item_num:
-                QMessageBox.information(None, "Error", "Error in reading data.", QMessageBox.Ok)
-                return None
             
-            spec = Spectrum(filename, data=data, xscale=xscale, yscale=yscale, zscale=zscale, tscale=tscale, spacemode=spacemode, energyAxis=energyAxis)
+            spec = Spectrum(filename, data=data, xscale=xscale, yscale=yscale, zscale=zscale, tscale=tscale, spacemode=spacemode, energyAxis=energyAxis, rawdata=rawdata)
             spec.property["Path"]=filepath
             return spec
 
 
 def Data2ArPy(Data, filepath):
-    with open(filepath, "wb") as binfile:
+    with replacedFile(filepath) as temppath, open(temppath, "wb") as binfile:
         # write header
         filestring = b"ARPY_FILE"
-        if Data.energyAxis is None:
-            energyaxis = b'N'
-        else:
-            energyaxis = bytes(Data.energyAxis.encode('UTF-8'))
-        if Data.spacemode is None:
-            spacemode = b'N'
-        elif Data.spacemode == "Angular":
-            spacemode = b'A'
-        elif Data.spacemode == "Momentum":
-            spacemode = b'M'
+        energyaxis, spacemode = encodeArPyFlags(Data)
         dims = Data.dims
         xsize = Data.dimension[0]
         if dims > 1:
@@ -159,8 +329,238 @@ def Data2ArPy(Data, filepath):
             binfile.write(tscale.tobytes(order='F'))
 
         # write data
-        data = Data.data.astype(np.float32)
-        binfile.write(data.tobytes(order='F'))
+        writeSlabs(binfile, Data.data, np.float32)
+
+
+def writeSlabs(binfile, data, dtype, slabsize=SLAB_SIZE):
+    '''
+    Write data to binfile in Fortran order, converting to dtype one slab of at most slabsize bytes at a time.
+    '''
+    dtype = np.dtype(dtype)
+    slicebytes = dtype.itemsize*int(np.prod(data.shape[:-1]))   # one index of the last (slowest) axis
+    if data.ndim > 1 and slicebytes > slabsize:
+        for i in range(data.shape[-1]):
+            writeSlabs(binfile, data[..., i], dtype, slabsize)
+    else:
+        step = max(slabsize//max(slicebytes, 1), 1)
+        for i in range(0, data.shape[-1], step):
+            slab = np.asfortranarray(data[..., i:i+step], dtype=dtype)
+            binfile.write(slab.T)   # the transpose of a Fortran ordered slab is C contiguous with the same bytes
+
+
+def decodeArPyFlags(energyaxis, spacemode):
+    if energyaxis.decode("UTF-8") == 'N':
+        energyAxis = None
+    else:
+        energyAxis = energyaxis.decode("UTF-8")
+    spacemode = {'N':None, 'A':"Angular", 'M':"Momentum"}.get(spacemode.decode("UTF-8"))
+    return energyAxis, spacemode
+
+
+def encodeArPyFlags(Data):
+    if Data.energyAxis is None:
+        energyaxis = b'N'
+    else:
+        energyaxis = bytes(Data.energyAxis.encode('UTF-8'))
+    if Data.spacemode is None:
+        spacemode = b'N'
+    elif Data.spacemode == "Angular":
+        spacemode = b'A'
+    elif Data.spacemode == "Momentum":
+        spacemode = b'M'
+    return energyaxis, spacemode
+
+
+# ArPy v2: header, float64 scales, compressed float32 chunks in Fortran order, chunk index (offset, length) at the end
+ARPY2_MAGIC = b"ARPY_FIL2"
+ARPY2_VERSION = 2
+ARPY2_HEADER = Struct("<9sHss5i4iBq")  # magic, version, energyAxis, spacemode, dims, size[4], chunk[4], codec, index offset
+ARPY2_CHUNK_SIZE = 1 << 18   # default number of points in a chunk (1 MB of float32)
+ARPY2_CODECS = {"none":0, "zlib":1, "lzma":2}
+
+
+def isChunkedArPy(filepath):
+    with open(filepath, "rb") as binfile:
+        return binfile.read(len(ARPY2_MAGIC)) == ARPY2_MAGIC
+
+
+def compressChunk(block, codec, level):
+    if codec == 1:
+        return zlib.compress(block, level)
+    elif codec == 2:
+        return lzma.compress(block, preset=level)
+    return bytes(block)
+
+
+def decompressChunk(raw, codec):
+    if codec == 1:
+        return zlib.decompress(raw)
+    elif codec == 2:
+        return lzma.decompress(raw)
+    return raw
+
+
+def boundedMap(pool, func, items, window):
+    '''
+    Ordered pool.imap with at most window items submitted and not yet consumed, items are only drawn as results are taken.
+    '''
+    pending = deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (item,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+class ChunkedArPyFile():
+    '''
+    Reader of ArPy v2 files. Only the chunks intersecting a requested hyperslab are read, and they are decoded in parallel.
+    '''
+    def __init__(self, filepath):
+        self.filepath = filepath
+        with open(filepath, "rb") as binfile:
+            header = ARPY2_HEADER.unpack(binfile.read(ARPY2_HEADER.size))
+            if header[0] != ARPY2_MAGIC or header[1] > ARPY2_VERSION:
+                raise DataFileError(os.path.basename(filepath)+" is not a supported ArPy v2 file.")
+            self.energyAxis, self.spacemode = decodeArPyFlags(header[2], header[3])
+            self.dims = header[4]
+            self.shape = header[5:5+self.dims]
+            self.chunk = header[9:9+self.dims]
+            self.codec = header[13]
+            self.scales = [np.fromfile(binfile, dtype='<f8', count=n) for n in self.shape]
+            self.grid = tuple(-(-n//c) for n, c in zip(self.shape, self.chunk))
+            binfile.seek(header[14])
+            self.index = np.fromfile(binfile, dtype='<i8', count=2*int(np.prod(self.grid))).reshape(-1, 2)
+            if len(self.index) != np.prod(self.grid) or any(len(scale) != n for scale, n in zip(self.scales, self.shape)):
+                raise DataFileError("Error in reading "+os.path.basename(filepath)+".")
+
+    def chunkSlices(self, key):
+        return tuple(slice(k*c, min((k+1)*c, n)) for k, c, n in zip(key, self.chunk, self.shape))
+
+    def readChunks(self, binfile, keys):
+        for key in keys:
+            offset, length = self.index[np.ravel_multi_index(key, self.grid, order='F')]
+            binfile.seek(offset)
+            yield key, binfile.read(length)
+
+    def decode(self, item):
+        key, raw = item
+        shape = tuple(sl.stop-sl.start for sl in self.chunkSlices(key))
+        return key, np.frombuffer(decompressChunk(raw, self.codec), dtype='<f4').reshape(shape, order='F')
+
+    def read(self, slices=None, core=None):
+        '''
+        Read the hyperslab given by a tuple of slices (step 1) as a float32 array, Fortran ordered in memory or on a scratch file above MEMORY_BUDGET.
+        '''
+        if slices is None:
+            slices = ()
+        slices = tuple(slices)+(slice(None),)*(self.dims-len(slices))
+        bounds = [sl.indices(n)[0:2] for sl, n in zip(slices, self.shape)]
+        shape = tuple(max(stop-start, 0) for start, stop in bounds)
+        if 4*int(np.prod(shape)) > MEMORY_BUDGET:
+            out = scratchArray(shape, np.float32)
+        else:
+            out = np.empty(shape, dtype=np.float32, order='F')
+        if out.size == 0:
+            return out
+        keys = itertools.product(*[range(start//c, (stop-1)//c+1) for (start, stop), c in zip(bounds, self.chunk)])
+        core = core or os.cpu_count()
+        with open(self.filepath, "rb") as binfile, ThreadPool(core) as pool:
+            for key, block in boundedMap(pool, self.decode, self.readChunks(binfile, keys), 2*core):
+                src = []
+                dst = []
+                for sl, (start, stop) in zip(self.chunkSlices(key), bounds):
+                    lo, hi = max(sl.start, start), min(sl.stop, stop)
+                    src.append(slice(lo-sl.start, hi-sl.start))
+                    dst.append(slice(lo-start, hi-start))
+                out[tuple(dst)] = block[tuple(src)]
+        return out
+
+
+def ChunkedArPy2Data(filepath, core=None):
+    base = os.path.basename(filepath)
+    filename = os.path.splitext(base)[0]
+    try:
+        arpyfile = ChunkedArPyFile(filepath)
+        data = arpyfile.read(core=core)
+    except (DataFileError, ValueError) as err:
+        showError(str(err))
+        return None
+    scales = arpyfile.scales+[None]*(4-arpyfile.dims)
+    spec = Spectrum(filename, data=data, xscale=scales[0], yscale=scales[1], zscale=scales[2], tscale=scales[3], spacemode=arpyfile.spacemode, energyAxis=arpyfile.energyAxis)
+    spec.property["Path"]=filepath
+    return spec
+
+
+def Data2ChunkedArPy(Data, filepath, chunks=None, codec="zlib", level=1, core=None):
+    '''
+    Write Data in the ArPy v2 format, chunks are compressed in parallel with at most 2*core of them in memory.
+    '''
+    data = Data.data
+    dims = data.ndim
+    if chunks is None:
+        edge = max(int(ARPY2_CHUNK_SIZE**(1/dims)), 1)
+        chunks = tuple(min(n, edge) for n in data.shape)
+    codec = ARPY2_CODECS[codec]
+    grid = tuple(-(-n//c) for n, c in zip(data.shape, chunks))
+    keys = list(itertools.product(*[range(g) for g in grid]))
+    keys.sort(key=lambda key: np.ravel_multi_index(key, grid, order='F'))
+
+    def encode(key):
+        sl = tuple(slice(k*c, (k+1)*c) for k, c in zip(key, chunks))
+        block = np.asfortranarray(data[sl], dtype='<f4')
+        return compressChunk(block.T, codec, level)   # the transpose is C contiguous with Fortran ordered bytes
+
+    with replacedFile(filepath) as temppath, open(temppath, "wb") as binfile:
+        energyaxis, spacemode = encodeArPyFlags(Data)
+        size = tuple(data.shape)+(0,)*(4-dims)
+        chunk = tuple(chunks)+(0,)*(4-dims)
+        binfile.write(ARPY2_HEADER.pack(ARPY2_MAGIC, ARPY2_VERSION, energyaxis, spacemode, dims, *size, *chunk, codec, 0))
+        for scale in (Data.xscale, Data.yscale, Data.zscale, Data.tscale)[0:dims]:
+            binfile.write(np.asarray(scale, dtype='<f8').tobytes())
+        index = np.zeros((len(keys), 2), dtype='<i8')
+        core = core or os.cpu_count()
+        with ThreadPool(core) as pool:
+            for i, raw in enumerate(boundedMap(pool, encode, keys, 2*core)):
+                index[i] = binfile.tell(), len(raw)
+                binfile.write(raw)
+        indexoffset = binfile.tell()
+        binfile.write(index.tobytes())
+        binfile.seek(0)
+        binfile.write(ARPY2_HEADER.pack(ARPY2_MAGIC, ARPY2_VERSION, energyaxis, spacemode, dims, *size, *chunk, codec, indexoffset))
+
+
+def probeArPy(filepath):
+    '''
+    Describe an arpy file (v1 or v2) from its header and the scale end points.
+    '''
+    base = os.path.basename(filepath)
+    filename = os.path.splitext(base)[0]
+    if isChunkedArPy(filepath):
+        arpyfile = ChunkedArPyFile(filepath)
+        scaleinfo = [(scale[0], scale[-1], scale[1]-scale[0] if len(scale) > 1 else 0) for scale in arpyfile.scales]
+        return [DataInfo(filename, filepath, arpyfile.shape, scaleinfo, arpyfile.spacemode, arpyfile.energyAxis)]
+    with open(filepath, "rb") as binfile:
+        headerStruct = Struct("<9sss5i")
+        header = headerStruct.unpack(binfile.read(headerStruct.size))
+        if header[0] != b"ARPY_FILE":
+            raise DataFileError(base+" is not a standard data file.")
+        energyAxis, spacemode = decodeArPyFlags(header[1], header[2])
+        dims = header[3]
+        size = header[4:4+dims]
+        scaleinfo = []
+        offset = headerStruct.size
+        for n in size:
+            binfile.seek(offset)
+            head = np.fromfile(binfile, dtype='<f8', count=min(n, 2))
+            binfile.seek(offset+8*(n-1))
+            last = np.fromfile(binfile, dtype='<f8', count=1)
+            if len(head) < min(n, 2) or len(last) < 1:
+                raise DataFileError("Error in reading "+base+".")
+            scaleinfo.append((head[0], last[0], head[1]-head[0] if n > 1 else 0))
+            offset += 8*n
+    return [DataInfo(filename, filepath, size, scaleinfo, spacemode, energyAxis)]
 
 
 def Ig2Py2Data(filepath):
@@ -170,40 +570,117 @@ def Ig2Py2Data(filepath):
     base = os.path.basename(filepath)
     filename = os.path.splitext(base)[0]
     with open(filepath) as txtfile:
-        filestr = txtfile.readlines()
-        if len(filestr) == 0 or filestr[0].rstrip() != "#Igor to Python":
-            QMessageBox.information(None, "Error", filepath.split('/')[-1]+" is not a standard data file.", QMessageBox.Ok)
+        if txtfile.readline().rstrip() != "#Igor to Python" or not seekSection(txtfile, "[Header]"):
+            showError(filepath.split('/')[-1]+" is not a standard data file.")
             return None
         else:
             #read property
-            headeridx = filestr.index("[Header]\n")
             ProStr = "{"
-            i = 1
-            while not len(filestr[headeridx+i].rstrip()) == 0:
-                ProStr += filestr[headeridx+i].rstrip()+","
-                i += 1
+            line = txtfile.readline()
+            while not len(line.rstrip()) == 0:
+                ProStr += line.rstrip()+","
+                line = txtfile.readline()
             ProStr += "\"Location\":\""+filepath+"\","
             ProStr += "}"
 
             #read scale
             ScaleStr = ""
-            scaleidx = filestr.index("[Scale]\n")
-            i = 1
-            while not len(filestr[scaleidx+i].rstrip()) == 0:
-                ScaleStr += filestr[scaleidx+i]
-                i += 1
+            seekSection(txtfile, "[Scale]")
+            line = txtfile.readline()
+            while not len(line.rstrip()) == 0:
+                ScaleStr += line
+                line = txtfile.readline()
             
-            #read data
-            dataidx = filestr.index("[Data]\n")
-            DataStr = ""
-            for line in filestr[dataidx+1:]:
-                DataStr += line
-            spec = Spectrum(filename, propstr=ProStr, scalestr=ScaleStr, datastr=DataStr)
+            #read data straight into an array sized from the header
+            seekSection(txtfile, "[Data]")
+            dimension = ast.literal_eval(ProStr).get("Dimension")
+            if dimension is None:
+                data = readNumbers(txtfile)
+            else:
+                dimension = tuple(int(i) for i in ast.literal_eval(dimension))
+                data = readNumbers(txtfile, int(np.prod(dimension)))
+            if data is None:
+                showError("Error in reading data.")
+                return None
+            if dimension is not None:
+                data.shape = dimension
+            spec = Spectrum(filename, data=data, propstr=ProStr, scalestr=ScaleStr)
             return spec
 
 
-def scale2pnt(value, scale):
-    return (np.abs(scale - value)).argmin()
+def seekSection(txtfile, section):
+    '''
+    Move txtfile to the line after the section title, return False if it is not found.
+    '''
+    for line in txtfile:
+        if line.rstrip() == section:
+            return True
+    return False
+
+
+def readNumbers(txtfile, count=None, chunksize=1 << 22):
+    '''
+    Parse whitespace separated numbers from txtfile chunk by chunk.
+    If count is given, the numbers are written into a preallocated array and None is returned on a count mismatch.
+    '''
+    if count is None:
+        data = []
+    else:
+        data = np.empty(count, dtype=np.float64)
+    pos = 0
+    tail = ""
+    while True:
+        chunk = txtfile.read(chunksize)
+        text = tail+chunk
+        tail = ""
+        if len(chunk) > 0 and not text[-1].isspace():
+            # the last number may be cut by the chunk boundary, keep it for the next chunk
+            cut = max(text.rfind(" "), text.rfind("\t"), text.rfind("\n"), text.rfind("\r"))+1
+            text, tail = text[:cut], text[cut:]
+        if len(text) > 0 and not text.isspace():   # fromstring gives [-1.] for blanks
+            try:
+                values = np.fromstring(text, sep=" ")   # any whitespace separates numbers
+            except ValueError:
+                return None
+            if count is None:
+                data.append(values)
+            elif pos+len(values) > count:
+                return None
+            else:
+                data[pos:pos+len(values)] = values
+            pos += len(values)
+        if len(chunk) == 0:
+            break
+    if count is None:
+        return np.concatenate(data) if len(data) > 0 else np.empty(0, dtype=np.float64)
+    elif pos != count:
+        return None
+    return data
+
+
+def probeIg2Py(filepath):
+    '''
+    Describe an ig2py file from its [Header] section.
+    '''
+    base = os.path.basename(filepath)
+    filename = os.path.splitext(base)[0]
+    with open(filepath) as txtfile:
+        if txtfile.readline().rstrip() != "#Igor to Python" or not seekSection(txtfile, "[Header]"):
+            raise DataFileError(base+" is not a standard data file.")
+        ProStr = "{"
+        line = txtfile.readline()
+        while not len(line.rstrip()) == 0:
+            ProStr += line.rstrip()+","
+            line = txtfile.readline()
+        ProStr += "}"
+    pro = ast.literal_eval(ProStr)
+    dimension = tuple(int(i) for i in ast.literal_eval(pro.get("Dimension", "()")))
+    scaleinfo = []
+    for axis, n in zip("XYZT", dimension):
+        first = float(pro.get(axis+"Min", 0))
+        step = float(pro.get(axis+"Step", 0))
+        scaleinfo.append(uniformScaleInfo(first, step, n))
+    return [DataInfo(filename, filepath, dimension, scaleinfo, pro.get("spacemode"), pro.get("energyAxis"))]
 
 
 def Angle2Kx_single(energy, angle):
@@ -276,15 +753,31 @@ def KxKy2Angle_array(energy, kx, ky):
         return np.arcsin(sintheta)*180/np.pi
 
 
+@FalseRawData
+def offset(Data, axis, delta):
+    i = AXIS_NAMES.index(axis)
+    Data.axes[i] = Data.axes[i].shift(delta)
+
+
+@FalseRawData
+def removeNaN(Data, value):
+    if outOfCore(Data.data):
+        result = scratchArray(Data.data.shape, Data.data.dtype)
+        step = slabStep(Data.data, 0, 2)
+        for i in range(0, Data.data.shape[0], step):
+            slab = np.asarray(Data.data[i:i+step])
+            result[i:i+step] = np.where(np.isnan(slab), slab.dtype.type(value), slab)
+        Data.data = result
+    else:
+        Data.data = np.where(np.isnan(Data.data), Data.data.dtype.type(value), Data.data)
+
+
 @FalseRawData
 def transpose2D(Data):
     Data.data = Data.data.T
     x, y = Data.dimension
     Data.dimension=(y, x)
-    Data.xmin, Data.ymin = Data.ymin, Data.xmin
-    Data.xmax, Data.ymax = Data.ymax, Data.xmax
-    Data.xstep, Data.ystep = Data.ystep, Data.xstep
-    Data.xscale, Data.yscale = Data.yscale, Data.xscale
+    Data.axes[0], Data.axes[1] = Data.axes[1], Data.axes[0]
     if Data.energyAxis == 'X':
         Data.energyAxis = 'Y'
     elif Data.energyAxis == 'Y':
@@ -296,10 +789,7 @@ def transpose3D(Data):
     Data.data = Data.data.transpose(1,0,2)
     x, y, z = Data.dimension
     Data.dimension=(y, x, z)
-    Data.xmin, Data.ymin = Data.ymin, Data.xmin
-    Data.xmax, Data.ymax = Data.ymax, Data.xmax
-    Data.xstep, Data.ystep = Data.ystep, Data.xstep
-    Data.xscale, Data.yscale = Data.yscale, Data.xscale
+    Data.axes[0], Data.axes[1] = Data.axes[1], Data.axes[0]
     if Data.energyAxis == 'X':
         Data.energyAxis = 'Y'
     elif Data.energyAxis == 'Y':
@@ -312,10 +802,7 @@ def changeZAxis3D(Data, ZAxis):
         Data.data = Data.data.transpose(1,2,0)
         x, y, z = Data.dimension
         Data.dimension=(y, z, x)
-        Data.xmin, Data.ymin, Data.zmin = Data.ymin, Data.zmin, Data.xmin
-        Data.xmax, Data.ymax, Data.zmax = Data.ymax, Data.zmax, Data.xmax
-        Data.xstep, Data.ystep, Data.zstep = Data.ystep, Data.zstep, Data.xstep
-        Data.xscale, Data.yscale, Data.zscale = Data.yscale, Data.zscale, Data.xscale
+        Data.axes[0:3] = Data.axes[1], Data.axes[2], Data.axes[0]
         if Data.energyAxis == 'X':
             Data.energyAxis = 'Z'
         elif Data.energyAxis == 'Y':
@@ -326,10 +813,7 @@ def changeZAxis3D(Data, ZAxis):
         Data.data = Data.data.transpose(2,0,1)
         x, y, z = Data.dimension
         Data.dimension=(z, x, y)
-        Data.xmin, Data.ymin, Data.zmin = Data.zmin, Data.xmin, Data.ymin
-        Data.xmax, Data.ymax, Data.zmax = Data.zmax, Data.xmax, Data.ymax
-        Data.xstep, Data.ystep, Data.zstep = Data.zstep, Data.xstep, Data.ystep
-        Data.xscale, Data.yscale, Data.zscale = Data.zscale, Data.xscale, Data.yscale
+        Data.axes[0:3] = Data.axes[2], Data.axes[0], Data.axes[1]
         if Data.energyAxis == 'X':
             Data.energyAxis = 'Y'
         elif Data.energyAxis == 'Y':
@@ -342,88 +826,71 @@ def changeZAxis3D(Data, ZAxis):
 def mirror2D(Data, axis):
     if axis == 'X':
         Data.data = Data.data[::-1, :]
-        Data.xmin, Data.xmax = -1*Data.xmax, -1*Data.xmin 
-        Data.xscale = -Data.xscale[::-1]
+        Data.axes[0] = Data.axes[0].mirror()
     elif axis == 'Y':
         Data.data = Data.data[:, ::-1]
-        Data.ymin, Data.ymax = -1*Data.ymax, -1*Data.ymin
-        Data.yscale = -Data.yscale[::-1]
+        Data.axes[1] = Data.axes[1].mirror()
 
 
 @FalseRawData
 def mirror3D(Data, axis):
     if axis == 'X':
         Data.data = Data.data[::-1, :, :]
-        Data.xmin, Data.xmax = -1*Data.xmax, -1*Data.xmin 
-        Data.xscale = -Data.xscale[::-1]
+        Data.axes[0] = Data.axes[0].mirror()
     elif axis == 'Y':
         Data.data = Data.data[:, ::-1, :]
-        Data.ymin, Data.ymax = -1*Data.ymax, -1*Data.ymin
-        Data.yscale = -Data.yscale[::-1]
+        Data.axes[1] = Data.axes[1].mirror()
+
+
+def normalArray(data, axis):
+    '''
+    Scale each line of data along axis to [0, 1], lines with less than two values or no range become NaN.
+    '''
+    mask = np.isnan(data)
+    minvalue = np.where(mask, np.inf, data).min(axis, keepdims=True)
+    maxvalue = np.where(mask, -np.inf, data).max(axis, keepdims=True)
+    valid = ((~mask).sum(axis, keepdims=True) > 1) & (maxvalue > minvalue)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, (data-minvalue)/(maxvalue-minvalue), np.nan).astype(data.dtype, copy=False)
 
 
 @FalseRawData
 def normal2D(Data, axis):
-    if axis == 'X':
-        for i in range(Data.data.shape[1]):
-            XDC = Data.data[:, i]
-            mask = np.isnan(XDC)
-            if len(XDC[~mask]) > 1:
-                minvalue = XDC[~mask].min()
-                maxvalue = XDC[~mask].max()
-                if maxvalue > minvalue:
-                    XDC = (XDC-minvalue)/(maxvalue-minvalue)
-                    Data.data[:, i] = XDC
-                else:
-                    Data.data[:, i] = np.nan
-            else:
-                Data.data[:, i] = np.nan
-    elif axis == 'Y':
-        for i in range(Data.data.shape[0]):
-            YDC = Data.data[i, :]
-            mask = np.isnan(YDC)
-            if len(YDC[~mask]) > 1:
-                minvalue = YDC[~mask].min()
-                maxvalue = YDC[~mask].max()
-                if maxvalue > minvalue:
-                    YDC = (YDC-minvalue)/(maxvalue-minvalue)
-                    Data.data[i, :] = YDC
-                else:
-                    Data.data[i, :] = np.nan
-            else:
-                Data.data[i, :] = np.nan
+    axis = {'X':0, 'Y':1}.get(axis)
+    if axis is None:
+        return
+    if outOfCore(Data.data):
+        result = scratchArray(Data.data.shape, Data.data.dtype)
+        step = slabStep(Data.data, 1-axis, 4)
+        for i in range(0, Data.data.shape[1-axis], step):
+            index = (slice(None), slice(i, i+step)) if axis == 0 else (slice(i, i+step), slice(None))
+            result[index] = normalArray(np.asarray(Data.data[index]), axis)
+        Data.data = result
+    else:
+        Data.data = normalArray(Data.data, axis)
 
 
 @FalseRawData
 def crop(Data, x0, x1, y0, y1):
-    if x0 < Data.xscale[scale2pnt(x0, Data.xscale)]:
-        x0idx = max(scale2pnt(x0, Data.xscale) - 1, 0)
-    else:
-        x0idx = scale2pnt(x0, Data.xscale)
-    if x1 > Data.xscale[scale2pnt(x1, Data.xscale)]:
-        x1idx = min(scale2pnt(x1, Data.xscale) + 1, Data.dimension[0])
-    else:
-        x1idx = scale2pnt(x1, Data.xscale)
-    if y0 < Data.yscale[scale2pnt(y0, Data.yscale)]:
-        y0idx = max(scale2pnt(y0, Data.yscale) - 1, 0)
-    else:
-        y0idx = scale2pnt(y0, Data.yscale)
-    if y1 > Data.yscale[scale2pnt(y1, Data.yscale)]:
-        y1idx = min(scale2pnt(y1, Data.yscale) + 1, Data.dimension[1])
-    else:
-        y1idx = scale2pnt(y1, Data.yscale)
+    xaxis, yaxis = Data.axes[0], Data.axes[1]
+    x0idx, x1idx = xaxis.index(x0), xaxis.index(x1)
+    y0idx, y1idx = yaxis.index(y0), yaxis.index(y1)
+    if x0 < xaxis.value(x0idx):
+        x0idx = max(x0idx - 1, 0)
+    if x1 > xaxis.value(x1idx):
+        x1idx = min(x1idx + 1, Data.dimension[0])
+    if y0 < yaxis.value(y0idx):
+        y0idx = max(y0idx - 1, 0)
+    if y1 > yaxis.value(y1idx):
+        y1idx = min(y1idx + 1, Data.dimension[1])
     if Data.dims == 2:
         Data.data = Data.data[x0idx:x1idx+1, y0idx:y1idx+1]
         Data.dimension = (x1idx-x0idx+1, y1idx-y0idx+1)
     elif Data.dims == 3:
         Data.data = Data.data[x0idx:x1idx+1, y0idx:y1idx+1, :]
         Data.dimension = Data.data.shape
-    Data.xscale = Data.xscale[x0idx:x1idx+1]
-    Data.yscale = Data.yscale[y0idx:y1idx+1]
-    Data.xmin = Data.xscale[0]
-    Data.xmax = Data.xscale[-1]
-    Data.ymin = Data.yscale[0]
-    Data.ymax = Data.yscale[-1]
+    Data.axes[0] = Data.axes[0].crop(x0idx, x1idx+1)
+    Data.axes[1] = Data.axes[1].crop(y0idx, y1idx+1)
 
 
 @FalseRawData
@@ -440,11 +907,7 @@ def merge2D(Data, xnum, ynum):
         if Data.data.shape[0] % xnum != 0:
             weight[-1, 0] = 1/(Data.data.shape[0] % xnum)
         Data.data = np.stack(sliceList).sum(0)*weight
-        offset = Data.xmin + Data.xstep*(xnum-1)/2
-        Data.xstep = xnum*Data.xstep
-        Data.xscale = offset + Data.xstep*np.arange(Data.data.shape[0])
-        Data.xmin = Data.xscale[0]
-        Data.xmax = Data.xscale[-1]
+        Data.axes[0] = Data.axes[0].merge(xnum, Data.data.shape[0])
     if ynum > 1 and ynum < Data.data.shape[1]:
         sliceList = []
         newynum = int(np.ceil(Data.data.shape[1]/ynum))
@@ -457,14 +920,88 @@ def merge2D(Data, xnum, ynum):
         if Data.data.shape[1] % ynum != 0:
             weight[-1] = 1/(Data.data.shape[1] % ynum)
         Data.data = np.stack(sliceList).sum(0)*weight
-        offset = Data.ymin + Data.ystep*(ynum-1)/2
-        Data.ystep = ynum*Data.ystep
-        Data.yscale = offset + Data.ystep*np.arange(Data.data.shape[1])
-        Data.ymin = Data.yscale[0]
-        Data.ymax = Data.yscale[-1]
+        Data.axes[1] = Data.axes[1].merge(ynum, Data.data.shape[1])
     Data.dimension = Data.data.shape
 
 
+class KMappingPlan():
+    '''
+    Gather indices and weights mapping an (energy, angle) cut onto an (energy, k) grid, the energies of both grids are the same.
+    Each point is a linear interpolation between two neighbouring angles of its own energy row, which is what the bilinear
+    interpolation of interpn reduces to on these grids. Points out of the angle range get a NaN weight.
+    '''
+    def __init__(self, eaxis, angleaxis, kscale):
+        kgrid, energygrid = np.meshgrid(kscale, eaxis.scale)
+        anglegrid = K2Angle_array(energygrid, kgrid)
+        self.valid = anglegrid is not None and not np.isnan(anglegrid).any()
+        if not self.valid:
+            return
+        pos = angleaxis.positions(anglegrid)
+        n = angleaxis.length
+        self.lower = np.floor(np.nan_to_num(pos)).clip(0, max(n-2, 0)).astype(np.intp)
+        self.upper = np.minimum(self.lower+1, n-1)
+        self.weight = np.where(np.isnan(pos), np.nan, pos-self.lower)
+        self.nbytes = self.lower.nbytes+self.upper.nbytes+self.weight.nbytes
+
+    def apply(self, data, start=0, stop=None, out=None):
+        '''
+        Map energy rows start:stop, data holds these rows only and may be any view with energy on axis 0.
+        '''
+        lower, upper, weight = self.lower[start:stop], self.upper[start:stop], self.weight[start:stop]
+        if out is None:
+            out = np.empty(lower.shape, dtype=np.float64)
+        left = np.take_along_axis(data, lower, 1)
+        np.subtract(np.take_along_axis(data, upper, 1), left, out=out, dtype=np.float64)
+        out *= weight
+        out += left
+        return out
+
+
+kmappingPlans = OrderedDict()   # (energy axis, angle axis, k axis): KMappingPlan, least recently used first
+kmappingLock = threading.Lock()
+
+
+def kmappingPlan(eaxis, angleaxis, kscale):
+    '''
+    The mapping plan of this geometry, built once and kept while it fits in PLAN_CACHE_SIZE.
+    '''
+    key = (eaxis.fingerprint(), angleaxis.fingerprint(), kscale[0], kscale[-1], len(kscale))
+    with kmappingLock:
+        plan = kmappingPlans.get(key)
+        if plan is not None:
+            kmappingPlans.move_to_end(key)
+            return plan
+    plan = KMappingPlan(eaxis, angleaxis, kscale)
+    if plan.valid:
+        with kmappingLock:
+            kmappingPlans[key] = plan
+            total = sum(plan.nbytes for plan in kmappingPlans.values())
+            while total > PLAN_CACHE_SIZE and len(kmappingPlans) > 1:
+                total -= kmappingPlans.popitem(last=False)[1].nbytes
+    return plan
+
+
+def kspaceArray(Data, kscale, energyaxis):
+    '''
+    Tokspace2D of the data with the energy on axis energyaxis (0 or 1), out-of-core data is done slab by slab into a scratch array.
+    None is returned if some k is out of reach.
+    '''
+    plan = kmappingPlan(Data.axes[energyaxis], Data.axes[1-energyaxis], kscale)
+    if not plan.valid:
+        return None
+    result = newArray(Data.data, Data.data.shape, np.float64)
+    data, data_k = (Data.data, result) if energyaxis == 0 else (Data.data.T, result.T)
+    if outOfCore(Data.data):
+        step = slabStep(data, 0, 8)
+        for i in range(0, data.shape[0], step):
+            plan.apply(np.asarray(data[i:i+step]), i, i+step, data_k[i:i+step])
+    elif energyaxis == 0:
+        plan.apply(data, out=data_k)
+    else:
+        data_k[:] = plan.apply(data)
+    return result
+
+
 @FalseRawData
 def Tokspace2D(Data, energyaxis):
     if Data.spacemode != "Momentum":
@@ -479,15 +1016,11 @@ def Tokspace2D(Data, energyaxis):
                 kmin = Angle2Kx_single(Data.xmax, Data.ymin)
                 kmax = Angle2Kx_single(Data.xmin, Data.ymax)
             kscale = np.linspace(kmin, kmax, len(Data.yscale))
-            kgrid, energygrid = np.meshgrid(kscale, Data.xscale)
-            anglegrid = K2Angle_array(energygrid, kgrid)
-            if np.isnan(anglegrid).any():
+            data_k = kspaceArray(Data, kscale, 0)
+            if data_k is None:
                 return -1
-            data_k = ip.interpn((Data.xscale, Data.yscale), Data.data, np.vstack((energygrid.flatten(), anglegrid.flatten())).T, bounds_error=False, fill_value=np.nan)
-            Data.data = data_k.reshape(Data.dimension[0], Data.dimension[1])
-            Data.yscale = kscale
-            Data.ymin, Data.ymax = kmin, kmax
-            Data.ystep = (kmax-kmin)/(len(Data.yscale)-1)
+            Data.data = data_k
+            Data.axes[1] = Axis(kmin, (kmax-kmin)/(len(kscale)-1), len(kscale))
         elif Data.energyAxis == 'Y' or energyaxis == 'Y':
             if Data.xmin*Data.xmax < 0:
                 kmin = Angle2Kx_single(Data.ymax, Data.xmin)
@@ -499,75 +1032,73 @@ def Tokspace2D(Data, energyaxis):
                 kmin = Angle2Kx_single(Data.ymax, Data.xmin)
                 kmax = Angle2Kx_single(Data.ymin, Data.xmax)
             kscale = np.linspace(kmin, kmax, len(Data.xscale))
-            kgrid, energygrid = np.meshgrid(kscale, Data.yscale)
-            anglegrid = K2Angle_array(energygrid, kgrid)
-            if np.isnan(anglegrid).any():
+            data_k = kspaceArray(Data, kscale, 1)
+            if data_k is None:
                 return -1
-            data_k = ip.interpn((Data.xscale, Data.yscale), Data.data, np.vstack((anglegrid.T.flatten(), energygrid.T.flatten())).T, bounds_error=False, fill_value=np.nan)
-            Data.data = data_k.reshape(Data.dimension[0], Data.dimension[1])
-            Data.xscale = kscale
-            Data.xmin, Data.xmax = kmin, kmax
-            Data.xstep = (kmax-kmin)/(len(Data.xscale)-1)
+            Data.data = data_k
+            Data.axes[0] = Axis(kmin, (kmax-kmin)/(len(kscale)-1), len(kscale))
         Data.spacemode = "Momentum"
+        if Data.energyAxis == None:
+            Data.energyAxis = energyaxis
         return 0
 
 
-@FalseRawData
-def merge3D(Data, xnum, ynum, znum):
-    if xnum > 1 and xnum < Data.data.shape[0]:
-        sliceList = []
-        newxnum = int(np.ceil(Data.data.shape[0]/xnum))
-        for i in range(xnum):
-            subdata = Data.data[i::xnum, :, :]
-            if subdata.shape[0] != newxnum:
-                subdata = np.vstack((subdata, np.zeros((1, subdata.shape[1], subdata.shape[2]))))
-            sliceList.append(subdata)
-        weight = np.ones((newxnum, 1, 1))/xnum
-        if Data.data.shape[0] % xnum != 0:
-            weight[-1, 0, 0] = 1/(Data.data.shape[0] % xnum)
-        Data.data = np.stack(sliceList).sum(0)*weight
-        offset = Data.xmin + Data.xstep*(xnum-1)/2
-        Data.xstep = xnum*Data.xstep
-        Data.xscale = offset + Data.xstep*np.arange(Data.data.shape[0])
-        Data.xmin = Data.xscale[0]
-        Data.xmax = Data.xscale[-1]
-    if ynum > 1 and ynum < Data.data.shape[1]:
-        sliceList = []
-        newynum = int(np.ceil(Data.data.shape[1]/ynum))
-        for i in range(ynum):
-            subdata = Data.data[:, i::ynum, :]
-            if subdata.shape[1] != newynum:
-                subdata = np.vstack((subdata.transpose(1,0,2), np.zeros((1, subdata.shape[0], subdata.shape[2])))).transpose(1,0,2)
-            sliceList.append(subdata)
-        weight = np.ones((1, newynum, 1))/ynum
-        if Data.data.shape[1] % ynum != 0:
-            weight[0, -1, 0] = 1/(Data.data.shape[1] % ynum)
-        Data.data = np.stack(sliceList).sum(0)*weight
-        offset = Data.ymin + Data.ystep*(ynum-1)/2
-        Data.ystep = ynum*Data.ystep
-        Data.yscale = offset + Data.ystep*np.arange(Data.data.shape[1])
-        Data.ymin = Data.yscale[0]
-        Data.ymax = Data.yscale[-1]
-    if znum > 1 and znum < Data.data.shape[2]:
+def mergeArray(data, nums):
+    '''
+    Average groups of nums[i] neighbouring points along each axis i, the last group of an axis may be smaller.
+    '''
+    for axis, num in enumerate(nums):
+        if num <= 1:
+            continue
+        data = np.moveaxis(data, axis, 0)
         sliceList = []
-        newznum = int(np.ceil(Data.data.shape[2]/znum))
-        for i in range(znum):
-            subdata = Data.data[:, :, i::znum]
-            if subdata.shape[2] != newznum:
-                subdata = np.vstack((subdata.transpose(2,0,1), np.zeros((1, subdata.shape[0], subdata.shape[1])))).transpose(1,2,0)
+        newnum = int(np.ceil(data.shape[0]/num))
+        for i in range(num):
+            subdata = data[i::num]
+            if subdata.shape[0] != newnum:
+                subdata = np.concatenate((subdata, np.zeros((1,)+subdata.shape[1:])))
             sliceList.append(subdata)
-        weight = np.ones((1, 1, newznum))/znum
-        if Data.data.shape[2] % znum != 0:
-            weight[0, 0, -1] = 1/(Data.data.shape[2] % znum)
-        Data.data = np.stack(sliceList).sum(0)*weight
-        offset = Data.zmin + Data.zstep*(znum-1)/2
-        Data.zstep = znum*Data.zstep
-        Data.zscale = offset + Data.zstep*np.arange(Data.data.shape[2])
-        Data.zmin = Data.zscale[0]
-        Data.zmax = Data.zscale[-1]
+        weight = np.ones((newnum,)+(1,)*(data.ndim-1))/num
+        if data.shape[0] % num != 0:
+            weight[-1] = 1/(data.shape[0] % num)
+        data = np.moveaxis(np.stack(sliceList).sum(0)*weight, 0, axis)
+    return data
+
+
+@FalseRawData
+def merge3D(Data, xnum, ynum, znum):
+    nums = [num if 1 < num < n else 1 for num, n in zip((xnum, ynum, znum), Data.data.shape)]
+    if outOfCore(Data.data):
+        # groups along x never straddle two slabs
+        shape = tuple(int(np.ceil(n/num)) for n, num in zip(Data.data.shape, nums))
+        result = scratchArray(shape, np.result_type(Data.data.dtype, np.float64))
+        step = slabStep(Data.data, 0, 4, nums[0])
+        for i in range(0, Data.data.shape[0], step):
+            result[i//nums[0]:(i+step)//nums[0]] = mergeArray(np.asarray(Data.data[i:i+step]), nums)
+        Data.data = result
+    else:
+        Data.data = mergeArray(Data.data, nums)
+    for i, num in enumerate(nums):
+        if num > 1:
+            Data.axes[i] = Data.axes[i].merge(num, Data.data.shape[i])
     Data.dimension = Data.data.shape
 
 
+def sampleGrid(data, xscale, yscale, x, y):
+    '''
+    Linear interpolation of data on xscale, yscale at the points x, y, NaN out of the scales.
+    The kspace.bilinear kernel is used when it is built and the scales are uniform, interpn otherwise.
+    '''
+    x, y = np.ravel(x).astype(np.float64), np.ravel(y).astype(np.float64)
+    if hasattr(kspace, "bilinear") and min(len(xscale), len(yscale)) > 1 and Axis.fromScale(xscale).coords is None and Axis.fromScale(yscale).coords is None:
+        if data.dtype not in (np.float32, np.float64):
+            data = data.astype(np.float64)
+        out = np.empty(len(x), dtype=np.float64)
+        kspace.bilinear(data, np.ascontiguousarray(xscale, dtype=np.float64), np.ascontiguousarray(yscale, dtype=np.float64), x, y, out, np.nan)
+        return out
+    return ip.interpn((xscale, yscale), data, np.vstack((x, y)).T, bounds_error=False, fill_value=np.nan)
+
+
 def interpzcut(argslist):
     #argslist = [data, energy, kxgrid, kygrid, xscale, yscale]
     try:
@@ -577,46 +1108,107 @@ def interpzcut(argslist):
         if np.isnan(phigrid).all() or np.isnan(thetagrid).all():
             data_k = np.array([np.nan])
         else:
-            data_k = ip.interpn((argslist[4], argslist[5]), argslist[0], np.vstack((phigrid.flatten(), thetagrid.flatten())).T, bounds_error=False, fill_value=np.nan).reshape(shape)
+            data_k = sampleGrid(argslist[0], argslist[4], argslist[5], phigrid, thetagrid).reshape(shape)
     finally:
         return data_k
 
 
+def solveAngles(phi, pxlist, pylist):
+    '''
+    Closed-form inverse of px = sin(a)cos(phi)+cos(a)sin(phi)cos(t), py = cos(a)sin(t) for arrays of px, py.
+    (sin(a), py, cos(a)cos(t)) is a unit vector, so with r = sqrt(1-py^2) the px equation is r*sin(b+phi) = px where sin(a) = r*sin(b).
+    The branch of b with cos(a)cos(t) >= 0 is taken when there is one, as the photoelectrons go towards the analyzer.
+    Return a, t in radians, both are PI where there is no solution as for the non-converged points of kspace.solver.
+    '''
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = np.sqrt(1-pylist*pylist)
+        asinp = np.arcsin(pxlist/r)
+        beta = asinp-phi
+        beta = np.where(np.cos(beta) < 0, pi-asinp-phi, beta)
+        alphalist = np.arcsin(r*np.sin(beta))
+        thetalist = np.arctan2(pylist, r*np.cos(beta))
+    invalid = np.isnan(alphalist) | np.isnan(thetalist)
+    alphalist[invalid] = pi
+    thetalist[invalid] = pi
+    return alphalist, thetalist
+
+
 def interpzcut_v(argslist):
-    #argslist = [data, energy, kxgrid, kygrid, xscale, yscale, bias, mis, error]
-    data, energy, kxgrid, kygrid, xscale, yscale, bias, mis, error = argslist
+    #argslist = [data, energy, kxgrid, kygrid, xscale, yscale, bias, mis, error, solver]
+    data, energy, kxgrid, kygrid, xscale, yscale, bias, mis, error, solver = argslist
     bias *= pi/180
-    kxgrid /= 0.512*sqrt(energy)
-    kygrid /= 0.512*sqrt(energy)
+    kxgrid = kxgrid/(0.512*sqrt(energy))   # the grids may be shared with other slices
+    kygrid = kygrid/(0.512*sqrt(energy))
     kxsize, kysize = kxgrid.shape
     kxlist = kxgrid.flatten().astype(np.float64)
     kylist = kygrid.flatten().astype(np.float64)
-    philist = np.ones(len(kxlist), dtype=np.float64)*(xscale[0]+xscale[-1])*pi/360
-    thetalist = np.ones(len(kxlist), dtype=np.float64)*(yscale[0]+yscale[-1])*pi/360
-    
-    # @np.vectorize
-    # def solve_angles(kx, ky):
-    #     phi, theta = op.fsolve(Angle2KxKy_func, [(phimin+phimax)/2, (thetamin+thetamax)/2], (bias, kx, ky), fprime=Angle2KxKy_jac, col_deriv=True, xtol=error, maxfev=mis)
-    #     return phi, theta
-
-    # t0 = datetime.datetime.now()
-    #philist, thetalist = solve_angles(kxgrid.flatten(), kygrid.flatten())
-    kspace.solver(philist, thetalist, bias, kxlist, kylist, error, mis)
-    # t1 = datetime.datetime.now()
-    # print((t1-t0).microseconds)
+    if solver == "closed":
+        philist, thetalist = solveAngles(bias, kxlist, kylist)
+    else:
+        philist = np.ones(len(kxlist), dtype=np.float64)*(xscale[0]+xscale[-1])*pi/360
+        thetalist = np.ones(len(kxlist), dtype=np.float64)*(yscale[0]+yscale[-1])*pi/360
+        kspace.solver(philist, thetalist, bias, kxlist, kylist, error, mis)
     philist *= 180/pi
     thetalist *= 180/pi
 
     if np.isnan(philist).all() or np.isnan(thetalist).all():
         data_k = np.array([np.nan])
     else:
-        data_k = ip.interpn((xscale, yscale), data, np.vstack((philist, thetalist)).T, bounds_error=False, fill_value=np.nan).reshape(kxsize, kysize)
+        data_k = sampleGrid(data, xscale, yscale, philist, thetalist).reshape(kxsize, kysize)
     
     return data_k
 
 
+sharedBlocks = {}   # key: (SharedMemory, shape, dtype) attached by a worker of ThetaKspace3D
+sharedParams = None
+sharedMappings = weakref.WeakSet()   # mappings of the shared memory blocks holding results, they are memory rather than mapped files
+
+
+def sharedResult(shm, shape):
+    '''
+    float64 array on a shared memory block, the block is closed once the array is released.
+    '''
+    result = np.ndarray(shape, np.float64, buffer=shm.buf)
+    if isinstance(result.base, mmap.mmap):   # NumPy takes the mapping under shm.buf as the base
+        sharedMappings.add(result.base)
+    weakref.finalize(result, shm.close)
+    return result
+
+
+def attachShared(blocks, params):
+    '''
+    Pool initializer, attach the shared memory blocks given as {key: (name, shape, dtype)}.
+    '''
+    global sharedParams
+    from multiprocessing import shared_memory
+    for key, (name, shape, dtype) in blocks.items():
+        sharedBlocks[key] = (shared_memory.SharedMemory(name=name), shape, dtype)
+    sharedParams = params
+
+
+def sharedArray(key):
+    shm, shape, dtype = sharedBlocks[key]
+    return np.ndarray(shape, dtype, buffer=shm.buf)
+
+
+def interpzcutShared(i):
+    '''
+    Convert the slice i of the shared data cube into the shared result cube, False is returned if it is all NaN.
+    '''
+    xscale, yscale, energy, bias, mis, error, solver = sharedParams
+    data, kxgrid, kygrid = sharedArray("data")[:, :, i], sharedArray("kx"), sharedArray("ky")
+    if bias is None:
+        data_k = interpzcut([data, energy[i], kxgrid, kygrid, xscale, yscale])
+    else:
+        data_k = interpzcut_v([data, energy[i], kxgrid, kygrid, xscale, yscale, bias, mis, error, solver])
+    if np.isnan(data_k).all():
+        return False
+    sharedArray("result")[:, :, i] = data_k
+    return True
+
+
 class ThetaKspace3D(threading.Thread):
-    def __init__(self, data, slit, bias, dlg, core, mis, error, mainPID, s):
+    def __init__(self, data, slit, bias, dlg, core, mis, error, mainPID, s, solver=KSPACE_SOLVER):
         super(ThetaKspace3D, self).__init__()
         self.data = data
         self.slit = slit
@@ -625,19 +1217,131 @@ class ThetaKspace3D(threading.Thread):
         self.core = core
         self.mis = mis
         self.error = error
+        self.solver = solver
         self.mainPID = mainPID
         self.s = s
         self.flag = True
 
+    def convert(self, kxgrid, kygrid, bias):
+        '''
+        Convert every energy slice on the kx, ky grids with the threads of kspace, or with the pool if the compiled kspace is an older one.
+        The pool shares the cubes through shared memory, slices are sent to it when that is not available.
+        bias is None for the horizontal slit.
+        Return the result cube, None if the conversion failed or was cancelled.
+        '''
+        if hasattr(kspace, "convert"):
+            return self.convertThreads(kxgrid, kygrid, bias)
+        try:
+            from multiprocessing import shared_memory   # Python 3.8 and later
+        except ImportError:
+            shared_memory = None
+        if outOfCore(self.data.data) or shared_memory is None:
+            return self.convertSlices(kxgrid, kygrid, bias)
+        nz = self.data.dimension[2]
+        arrays = {"data":self.data.data, "kx":kxgrid, "ky":kygrid}
+        shms = {}
+        try:
+            # the data and the grids are copied once to shared memory, workers write the result in place and only indices are sent
+            for key, array in arrays.items():
+                shms[key] = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, array.dtype, buffer=shms[key].buf)[...] = array
+            shape = kxgrid.shape+(nz,)
+            shms["result"] = shared_memory.SharedMemory(create=True, size=max(8*int(np.prod(shape)), 1))
+            blocks = {key:(shm.name, arrays[key].shape, arrays[key].dtype) for key, shm in shms.items() if key in arrays}
+            blocks["result"] = (shms["result"].name, shape, np.float64)
+            params = (self.data.xscale, self.data.yscale, self.data.zscale, bias, self.mis, self.error, self.solver)
+            pool = mp.Pool(self.core, initializer=attachShared, initargs=(blocks, params))
+            for i, valid in enumerate(pool.imap(interpzcutShared, range(nz))):
+                if not valid:
+                    self.s.stoped.emit(0)
+                    self.flag = False
+                    pool.terminate()
+                    break
+                elif not self.dlg.isVisible():
+                    self.flag = False
+                    pool.terminate()
+                    break
+                else:
+                    self.s.progress.emit(int(i*1000/nz))
+            pool.close()
+            pool.join()
+            if self.flag:
+                # the result stays in its block, which is closed once the array is released
+                result = shms.pop("result")
+                result.unlink()
+                return sharedResult(result, shape)
+        finally:
+            for shm in shms.values():
+                shm.close()
+                shm.unlink()
+
+    def convertThreads(self, kxgrid, kygrid, bias):
+        '''
+        Convert with the threads of kspace.convert, which needs no process or copy of the grids.
+        The energies are done slab by slab to check progress and cancelling, slabs of out-of-core data are read one at a time.
+        '''
+        nz = self.data.dimension[2]
+        datacollector = newArray(self.data.data, kxgrid.shape+(nz,), np.float64)
+        mode = 0 if bias is None else (1 if self.solver == "closed" else 2)
+        phi = 0 if bias is None else bias*pi/180
+        xscale, yscale, zscale = (np.ascontiguousarray(scale, dtype=np.float64) for scale in (self.data.xscale, self.data.yscale, self.data.zscale))
+        kxgrid, kygrid = np.ascontiguousarray(kxgrid, dtype=np.float64), np.ascontiguousarray(kygrid, dtype=np.float64)
+        step = min(slabStep(self.data.data, 2, 2), max(nz//100, 1))
+        for i in range(0, nz, step):
+            if not self.dlg.isVisible():
+                self.flag = False
+                return
+            data_k = datacollector[:, :, i:i+step]
+            data = np.asarray(self.data.data[:, :, i:i+step])
+            if data.dtype not in (np.float32, np.float64):
+                data = data.astype(np.float64)
+            kspace.convert(data, xscale, yscale, zscale[i:i+step], kxgrid, kygrid, data_k, 
+            mode, phi, self.error, self.mis, self.core)
+            if np.isnan(data_k).all(axis=(0, 1)).any():
+                self.s.stoped.emit(0)
+                self.flag = False
+                return
+            self.s.progress.emit(int(i*1000/nz))
+        return datacollector
+
+    def convertSlices(self, kxgrid, kygrid, bias):
+        '''
+        Out-of-core data does not fit in shared memory, its slices are sent to the pool and the results written to a scratch array.
+        Also used when shared memory is not available (Python before 3.8).
+        '''
+        datacollector = newArray(self.data.data, kxgrid.shape+(self.data.dimension[2],), np.float64)
+        pool = mp.Pool(self.core)
+        if bias is None:
+            args = ((self.data.data[:, :, i], self.data.zscale[i], kxgrid, kygrid, self.data.xscale, self.data.yscale) for i in range(self.data.dimension[2]))
+            results = pool.imap(interpzcut, args)
+        else:
+            args = ((self.data.data[:, :, i], self.data.zscale[i], kxgrid, kygrid, self.data.xscale, self.data.yscale, bias, self.mis, self.error, self.solver) for i in range(self.data.dimension[2]))
+            results = pool.imap(interpzcut_v, args)
+        for i, data in enumerate(results):
+            if (np.isnan(data)).all():
+                self.s.stoped.emit(0)
+                self.flag = False
+                pool.terminate()
+                break
+            elif not self.dlg.isVisible():
+                self.flag = False
+                pool.terminate()
+                break
+            else:
+                datacollector[:, :, i] = data
+                self.s.progress.emit(int(i*1000/len(self.data.zscale)))
+        pool.close()
+        pool.join()
+        if self.flag:
+            return datacollector
+
     def run(self):
         if self.data.spacemode != "Momentum":
             while not self.dlg.isVisible():
                 pass
             self.dlg.activateWindow()
             if self.slit == 'H':
-                self.data.xscale += self.bias
-                self.data.xmin += self.bias
-                self.data.xmax += self.bias
+                self.data.axes[0] = self.data.axes[0].shift(self.bias)
                 if self.data.xmin < 0:
                     kxmin = Angle2Kx_single(self.data.zmax, self.data.xmin)
                 else:
@@ -662,38 +1366,18 @@ class ThetaKspace3D(threading.Thread):
                     self.s.stoped.emit(0)
                     self.flag = False
                 if os.getpid() == self.mainPID and self.flag:
-                    datacollector = []
-                    pool = mp.Pool(self.core)
-                    args = [(self.data.data[:, :, i], self.data.zscale[i], kxgrid, kygrid, self.data.xscale, self.data.yscale) for i in range(self.data.dimension[2])]
-                    for i, data in enumerate(pool.imap(interpzcut, args)):
-                        if (np.isnan(data)).all():
-                            self.s.stoped.emit(0)
-                            self.flag = False
-                            pool.terminate()
-                            break
-                        elif not self.dlg.isVisible():
-                            self.flag = False
-                            pool.terminate()
-                            break
-                        else:
-                            datacollector.append(data)
-                            self.s.progress.emit(int(i*1000/len(self.data.zscale)))
-                    pool.close()
-                    pool.join()
+                    datacollector = self.convert(kxgrid, kygrid, None)
                     if self.flag:
-                        self.data.data = np.stack(datacollector, axis=2)
+                        self.data.data = datacollector
                         self.data.dimension = self.data.data.shape
-                        self.data.xscale = kxscale
-                        self.data.yscale = kyscale
-                        self.data.xmin, self.data.xmax = kxmin, kxmax
-                        self.data.ymin, self.data.ymax = kymin, kymax
-                        self.data.xstep = (kxmax-kxmin)/(len(self.data.xscale)-1)
-                        self.data.ystep = (kymax-kymin)/(len(self.data.yscale)-1)
+                        self.data.axes[0] = Axis(kxmin, (kxmax-kxmin)/(len(kxscale)-1), len(kxscale))
+                        self.data.axes[1] = Axis(kymin, (kymax-kymin)/(len(kyscale)-1), len(kyscale))
                         self.data.rawdataflag = False
                         self.s.progress.emit(1000)
                         self.data.spacemode = "Momentum"
                         self.data.rawdataflag = False
-                        self.data.writeProperty(False)
+                        self.data.modified()
+                        self.data.journal.record(None, (self.slit, self.bias), self.data, pin=True)
                         while not self.dlg.isVisible():
                             time.sleep(0.01)
                         self.s.finished.emit()
@@ -733,38 +1417,18 @@ class ThetaKspace3D(threading.Thread):
                     self.s.stoped.emit(0)
                     self.flag = False
                 if os.getpid() == self.mainPID and self.flag:
-                    datacollector = []
-                    pool = mp.Pool(self.core)
-                    args = [(self.data.data[:, :, i], self.data.zscale[i], kxgrid, kygrid, self.data.xscale, self.data.yscale, self.bias, self.mis, self.error) for i in range(self.data.dimension[2])]
-                    for i, data in enumerate(pool.imap(interpzcut_v, args)):
-                        if (np.isnan(data)).all():
-                            self.s.stoped.emit(0)
-                            self.flag = False
-                            pool.terminate()
-                            break
-                        elif not self.dlg.isVisible():
-                            self.flag = False
-                            pool.terminate()
-                            break
-                        else:
-                            datacollector.append(data)
-                            self.s.progress.emit(int(i*1000/len(self.data.zscale)))
-                    pool.close()
-                    pool.join()
+                    datacollector = self.convert(kxgrid, kygrid, self.bias)
                     if self.flag:
-                        self.data.data = np.stack(datacollector, axis=2)
+                        self.data.data = datacollector
                         self.data.dimension = self.data.data.shape
-                        self.data.xscale = kxscale
-                        self.data.yscale = kyscale
-                        self.data.xmin, self.data.xmax = kxmin, kxmax
-                        self.data.ymin, self.data.ymax = kymin, kymax
-                        self.data.xstep = (kxmax-kxmin)/(len(self.data.xscale)-1)
-                        self.data.ystep = (kymax-kymin)/(len(self.data.yscale)-1)
+                        self.data.axes[0] = Axis(kxmin, (kxmax-kxmin)/(len(kxscale)-1), len(kxscale))
+                        self.data.axes[1] = Axis(kymin, (kymax-kymin)/(len(kyscale)-1), len(kyscale))
                         self.data.rawdataflag = False
                         self.s.progress.emit(1000)
                         self.data.spacemode = "Momentum"
                         self.data.rawdataflag = False
-                        self.data.writeProperty(False)
+                        self.data.modified()
+                        self.data.journal.record(None, (self.slit, self.bias), self.data, pin=True)
                         while not self.dlg.isVisible():
                             time.sleep(0.01)
                         self.s.finished.emit()
@@ -775,11 +1439,278 @@ class ThetaKspace3D(threading.Thread):
                 self.s.finished.emit()
 
 
+def stateBytes(state):
+    '''
+    Bytes of memory held by the data of a state, data mapped on a file holds none.
+    '''
+    data = state["data"]
+    if not isinstance(data, np.ndarray) or isMapped(data):
+        return 0
+    return data.nbytes
+
+
+class Journal():
+    '''
+    Operations applied to a Spectrum since its raw state, as (function, arguments) entries.
+    Undo and redo replay the entries from the nearest checkpoint, which holds the state after an entry.
+    '''
+    def __init__(self):
+        self.entries = []
+        self.position = 0   # number of entries applied to the data
+        self.checkpoints = {}   # position: state
+        self.pinned = set()   # positions which cannot be replayed, their checkpoints are never dropped
+        self.replaying = False
+
+    def record(self, func, args, spec, pin=False):
+        if self.replaying:
+            return
+        del self.entries[self.position:]
+        for position in [position for position in self.checkpoints if position > self.position]:
+            del self.checkpoints[position]
+            self.pinned.discard(position)
+        self.entries.append((func, args))
+        self.position += 1
+        if pin or self.position % JOURNAL_CHECKPOINT_INTERVAL == 0:
+            self.checkpoints[self.position] = spec.getState()
+            if pin:
+                self.pinned.add(self.position)
+            dropable = sorted(position for position in self.checkpoints if position not in self.pinned)
+            excess = len(dropable)-JOURNAL_MAX_CHECKPOINTS
+            held = sum(stateBytes(self.checkpoints[position]) for position in dropable)
+            for position in dropable:
+                if excess <= 0 and held <= JOURNAL_CHECKPOINT_BYTES:
+                    break
+                held -= stateBytes(self.checkpoints.pop(position))
+                excess -= 1
+
+    def start(self, position):
+        '''
+        Return the nearest checkpoint at or before position, 0 for the raw state.
+        '''
+        return max([p for p in self.checkpoints if p <= position], default=0)
+
+    def clear(self):
+        self.__init__()
+
+    def copy(self):
+        journal = Journal()
+        journal.entries = list(self.entries)
+        journal.position = self.position
+        journal.checkpoints = {position:dict(state, axes=list(state["axes"]), property=dict(state["property"])) for position, state in self.checkpoints.items()}
+        journal.pinned = set(self.pinned)
+        return journal
+
+
+class DataInfo():
+    '''
+    Lightweight description of a dataset in a file, made from the headers only.
+    '''
+    def __init__(self, name, path, dimension, scaleinfo, spacemode=None, energyAxis=None, note=""):
+        self.name = name
+        self.path = path
+        self.dimension = tuple(dimension)
+        self.dims = len(self.dimension)
+        self.scaleinfo = scaleinfo   # (first, last, step) of each axis
+        self.spacemode = spacemode
+        self.energyAxis = energyAxis
+        self.note = note
+
+
+def uniformScaleInfo(offset, delta, size):
+    return (offset, offset+delta*(size-1), delta)
+
+
+class Axis():
+    '''
+    Coordinates of one dimension, offset+step*i unless explicit coordinates are given.
+    An Axis is never modified once created, operations make new ones, so raw states and checkpoints can share them.
+    '''
+    __slots__ = ("offset", "step", "length", "coords", "cache", "key")
+
+    def __init__(self, offset, step, length, coords=None):
+        self.offset = float(offset)
+        self.step = float(step)
+        self.length = int(length)
+        self.coords = coords
+        self.cache = None
+        # ascending search key of explicit coordinates, None when they are not monotonic
+        self.key = None
+        if coords is not None:
+            diff = np.diff(coords)
+            if (diff >= 0).all():
+                self.key = coords
+            elif (diff <= 0).all():
+                self.key = -coords
+
+    @classmethod
+    def fromScale(cls, scale):
+        scale = np.asarray(scale, dtype=np.float64)
+        n = len(scale)
+        if n < 2:
+            return cls(scale[0] if n > 0 else 0, 0, n)
+        step = (scale[-1]-scale[0])/(n-1)
+        if np.abs(scale-(scale[0]+step*np.arange(n))).max() <= UNIFORM_TOLERANCE*abs(step):
+            return cls(scale[0], step, n)
+        return cls(scale[0], scale[1]-scale[0], n, scale)
+
+    @property
+    def scale(self):
+        if self.coords is not None:
+            return self.coords
+        if self.cache is None:
+            self.cache = self.offset+self.step*np.arange(self.length)
+        return self.cache
+
+    @property
+    def first(self):
+        if self.coords is not None:
+            return self.coords[0]
+        return self.offset
+
+    @property
+    def last(self):
+        if self.coords is not None:
+            return self.coords[-1]
+        return self.offset+self.step*(self.length-1)
+
+    def value(self, i):
+        if self.coords is not None:
+            return self.coords[i]
+        return self.offset+self.step*i
+
+    def index(self, value):
+        '''
+        Index of the point nearest to value, the lower one on a tie as np.abs(scale-value).argmin() does.
+        Uniform axes are solved arithmetically, others are searched in the sorted coordinates.
+        '''
+        if value != value or self.length < 2:
+            return 0
+        if self.coords is None:
+            if self.step == 0:
+                return 0
+            return min(max(ceil(min(max((value-self.offset)/self.step, -1), self.length)-0.5), 0), self.length-1)
+        if self.key is None:
+            return int(np.abs(self.coords-value).argmin())
+        if self.key is not self.coords:
+            value = -value
+        i = int(self.key.searchsorted(value))
+        if i == 0:
+            return 0
+        if i == self.length:
+            return i-1
+        return i-1 if value-self.key[i-1] <= self.key[i]-value else i
+
+    def positions(self, values):
+        '''
+        Fractional indices of an array of values, NaN outside the axis.
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        if self.coords is None:
+            if self.step == 0:
+                pos = np.where(values == self.offset, 0.0, np.nan)
+            else:
+                pos = (values-self.offset)/self.step
+        elif self.key is None:
+            raise ValueError("The coordinates of the axis are not monotonic.")
+        else:
+            keys = values if self.key is self.coords else -values
+            i = self.key.searchsorted(keys).clip(1, max(self.length-1, 1))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pos = i-1+(keys-self.key[i-1])/(self.key[i]-self.key[i-1])
+        low, high = sorted((self.first, self.last))
+        return np.where((values >= low) & (values <= high), pos.clip(0, max(self.length-1, 0)), np.nan)
+
+    def fingerprint(self):
+        '''
+        Hashable identity of the coordinates, equal for equal axes.
+        '''
+        if self.coords is None:
+            return (self.offset, self.step, self.length)
+        return (self.offset, self.step, self.length, hashlib.blake2b(np.ascontiguousarray(self.coords, dtype=np.float64), digest_size=16).hexdigest())
+
+    def shift(self, delta):
+        if self.coords is not None:
+            return Axis(self.offset+delta, self.step, self.length, self.coords+delta)
+        return Axis(self.offset+delta, self.step, self.length)
+
+    def mirror(self):
+        if self.coords is not None:
+            return Axis.fromScale(-self.coords[::-1])
+        return Axis(-self.last, self.step, self.length)
+
+    def crop(self, start, stop):
+        if self.coords is not None:
+            return Axis.fromScale(self.coords[start:stop])
+        start, stop, _ = slice(start, stop).indices(self.length)
+        return Axis(self.offset+self.step*start, self.step, max(stop-start, 0))
+
+    def merge(self, num, length):
+        '''
+        Axis of num neighbouring points averaged together, centred on each group.
+        '''
+        return Axis(self.first+self.step*(num-1)/2, num*self.step, length)
+
+
+def axisProperty(i, name):
+    '''
+    Read access to the Axis i of a Spectrum, the scale can also be assigned.
+    '''
+    def getter(self):
+        axis = self.axes[i]
+        if axis is None:
+            return None if name == "scale" else 0
+        return getattr(axis, name)
+    if name != "scale":
+        return property(getter)
+    def setter(self, scale):
+        self.axes[i] = None if scale is None else Axis.fromScale(scale)
+        self.modified()
+    return property(getter, setter)
+
+
+def propertyDict():
+    '''
+    The property dict of a Spectrum is formatted from the axes only when it is read.
+    '''
+    def getter(self):
+        self.writeProperty()
+        return self.propertydict
+    def setter(self, pro):
+        self.propertydict = pro
+    return property(getter, setter)
+
+
+STATE_NAMES = ("data", "dimension", "dims", "spacemode", "energyAxis")
+AXIS_NAMES = "XYZT"
+versions = itertools.count(1)   # versions are unique across all spectra, a version identifies one content
+
+
 class Spectrum():
-    def __init__(self, fname="spec", data=None, xscale=None, yscale=None, zscale=None, tscale=None, spacemode=None, energyAxis=None, propstr=None, scalestr=None, datastr=None):
+    xscale = axisProperty(0, "scale")
+    xmin = axisProperty(0, "first")
+    xmax = axisProperty(0, "last")
+    xstep = axisProperty(0, "step")
+    yscale = axisProperty(1, "scale")
+    ymin = axisProperty(1, "first")
+    ymax = axisProperty(1, "last")
+    ystep = axisProperty(1, "step")
+    zscale = axisProperty(2, "scale")
+    zmin = axisProperty(2, "first")
+    zmax = axisProperty(2, "last")
+    zstep = axisProperty(2, "step")
+    tscale = axisProperty(3, "scale")
+    tmin = axisProperty(3, "first")
+    tmax = axisProperty(3, "last")
+    tstep = axisProperty(3, "step")
+    property = propertyDict()
+
+    def __init__(self, fname="spec", data=None, xscale=None, yscale=None, zscale=None, tscale=None, spacemode=None, energyAxis=None, propstr=None, scalestr=None, datastr=None, rawdata=None):
         #basic data
         self.name = fname
+        self.version = next(versions)
+        self.fingerprintcache = None   # (version, fingerprint)
         self.data = data
+        self.axes = [None]*4
         self.xscale = xscale
         self.yscale = yscale
         self.zscale = zscale
@@ -789,33 +1720,15 @@ class Spectrum():
 
         self.dimension = (2,)
         self.dims = 1
-        self.property = {}
+        self.propertydict = {}
         self.note = ""
 
-        self.xmin = 0
-        self.xmax = 0
-        self.xstep = 0
-        
-        self.ymin = 0
-        self.ymax = 0
-        self.ystep = 0
-        
-        self.zmin = 0
-        self.zmax = 0
-        self.zstep = 0
-
-        self.tmin = 0
-        self.tmax = 0
-        self.tstep = 0
-
-        #raw data
-        self.rawdata = None
-        self.rawxscale = None
-        self.rawyscale = None
-        self.rawzscale = None
-        self.rawtscale = None
-        self.rawproperty = {}
+        #raw data, a read-only mapping can be given for memory-mapped data
+        #otherwise rawdata shares the buffer of data until the first operation, see detach
+        self.rawdata = rawdata
+        self.rawstate = None
         self.rawdataflag = True
+        self.journal = Journal()
         
         #initiate property
         self.initProp()
@@ -824,130 +1737,188 @@ class Spectrum():
         self.setStrProperty(propstr)
         self.setStrScale(scalestr)
         self.setStrData(datastr)
+        self.rawstate = self.getState()
 
     def initProp(self):
         if self.data is not None:
             self.dimension = self.data.shape
             self.dims = len(self.dimension)
-            self.rawdata = np.copy(self.data)
-        if self.xscale is not None:
-            self.xmin = self.xscale[0]
-            self.xstep = self.xscale[1]-self.xscale[0]
-            self.xmax = self.xscale[-1]
-            self.rawxscale = np.copy(self.xscale)
-        if self.yscale is not None:
-            self.ymin = self.yscale[0]
-            self.ystep = self.yscale[1]-self.yscale[0]
-            self.ymax = self.yscale[-1]
-            self.rawyscale = np.copy(self.yscale)
-        if self.zscale is not None:
-            self.zmin = self.zscale[0]
-            self.zstep = self.zscale[1]-self.zscale[0]
-            self.zmax = self.zscale[-1]
-            self.rawzscale = np.copy(self.zscale)
-        if self.tscale is not None:
-            self.tmin = self.tscale[0]
-            self.tstep = self.tscale[1]-self.tscale[0]
-            self.tmax = self.tscale[-1]
-            self.rawtscale = np.copy(self.tscale)
-        self.writeProperty(False)
-        self.rawproperty = copy.deepcopy(self.property)
+            if self.rawdata is None:
+                self.rawdata = self.data
 
     def setStrProperty(self, StrProperty):
         if StrProperty != None:
-            self.property = ast.literal_eval(StrProperty)
-            self.rawproperty = copy.deepcopy(self.property)
-            self.readProperty(False)
+            self.propertydict.update(ast.literal_eval(StrProperty))
+            self.readProperty(self.propertydict)
     
     def setStrScale(self, StrScale):
         if StrScale != None:
             ScaleList = StrScale.rstrip().split("\n")
             if len(ScaleList) > 0:
-                self.xscale = np.fromstring(ScaleList[0], sep="\t")
-                self.rawxscale = np.copy(self.xscale)
+                self.xscale = np.array(ScaleList[0].split(), dtype=np.float64)
             if len(ScaleList) > 1:
-                self.yscale = np.fromstring(ScaleList[1], sep="\t")
-                self.rawyscale = np.copy(self.yscale)
+                self.yscale = np.array(ScaleList[1].split(), dtype=np.float64)
             if len(ScaleList) > 2:
-                self.zscale = np.fromstring(ScaleList[2], sep="\t")
-                self.rawzscale = np.copy(self.zscale)
+                self.zscale = np.array(ScaleList[2].split(), dtype=np.float64)
             if len(ScaleList) > 3:
-                self.tscale = np.fromstring(ScaleList[3], sep="\t")
-                self.rawtscale = np.copy(self.tscale)
+                self.tscale = np.array(ScaleList[3].split(), dtype=np.float64)
 
     def setStrData(self, StrData):
         if StrData != None:
-            self.data = np.fromstring(StrData, sep="\t")
-            if self.property.get("Dimension") != None:
+            self.data = np.array(StrData.split(), dtype=np.float64)
+            if self.propertydict.get("Dimension") != None:
                 self.data.shape = self.dimension
-            self.rawdata = np.copy(self.data)
-
-    def readProperty(self, readraw):
-        if readraw:
-            pro = self.rawproperty
-        else:
-            pro = self.property
-        self.dimension = ast.literal_eval(pro.get("Dimension"))
-        self.dims = len(self.dimension)
-        self.xmin = ast.literal_eval(pro.get("XMin"))
-        self.xmax = ast.literal_eval(pro.get("XMax"))
-        self.xstep = ast.literal_eval(pro.get("XStep"))
-        self.ymin = ast.literal_eval(pro.get("YMin"))
-        self.ymax = ast.literal_eval(pro.get("YMax"))
-        self.ystep = ast.literal_eval(pro.get("YStep"))
-        self.zmin = ast.literal_eval(pro.get("ZMin"))
-        self.zmax = ast.literal_eval(pro.get("ZMax"))
-        self.zstep = ast.literal_eval(pro.get("ZStep"))
-        self.tmin = ast.literal_eval(pro.get("TMin"))
-        self.tmax = ast.literal_eval(pro.get("TMax"))
-        self.tstep = ast.literal_eval(pro.get("TStep"))
-        self.spacemode = pro.get("spacemode")
-        self.energyAxis = pro.get("energyAxis")
-
-    def writeProperty(self, writeraw):
-        if writeraw:
-            pro = self.rawproperty
-        else:
-            pro = self.property
+            self.rawdata = self.data
+
+    def readProperty(self, pro):
+        '''
+        Take dimension, modes and the axes which are not set yet from a property dict of strings.
+        '''
+        if pro.get("Dimension") != None:
+            self.dimension = tuple(ast.literal_eval(pro.get("Dimension")))
+            self.dims = len(self.dimension)
+        for i, name in enumerate(AXIS_NAMES[0:self.dims]):
+            if self.axes[i] is None:
+                self.axes[i] = Axis(ast.literal_eval(pro.get(name+"Min", "0")), ast.literal_eval(pro.get(name+"Step", "0")), self.dimension[i])
+        self.spacemode = pro.get("spacemode", self.spacemode)
+        self.energyAxis = pro.get("energyAxis", self.energyAxis)
+
+    def writeProperty(self):
+        pro = self.propertydict
         pro["Dimension"] = "%s" % (self.dimension,)
-        pro["XMin"] = "%.6f" % self.xmin
-        pro["XMax"] = "%.6f" % self.xmax
-        pro["XStep"] = "%.6f" % self.xstep
-        pro["YMin"] = "%.6f" % self.ymin
-        pro["YMax"] = "%.6f" % self.ymax
-        pro["YStep"] = "%.6f" % self.ystep
-        pro["ZMin"] = "%.6f" % self.zmin
-        pro["ZMax"] = "%.6f" % self.zmax
-        pro["ZStep"] = "%.6f" % self.zstep
-        pro["TMin"] = "%.6f" % self.tmin
-        pro["TMax"] = "%.6f" % self.tmax
-        pro["TStep"] = "%.6f" % self.tstep
+        for name, axis in zip(AXIS_NAMES, self.axes):
+            if axis is None:
+                first, last, step = 0, 0, 0
+            else:
+                first, last, step = axis.first, axis.last, axis.step
+            pro[name+"Min"] = "%.6f" % first
+            pro[name+"Max"] = "%.6f" % last
+            pro[name+"Step"] = "%.6f" % step
         if self.spacemode != None:
             pro["spacemode"] = "%s" % self.spacemode
         if self.energyAxis != None:
             pro["energyAxis"] = "%s" % self.energyAxis
 
+    def detach(self):
+        '''
+        Give data its own buffer if it still shares memory with rawdata or with a copy (read-only).
+        '''
+        if self.data is None or isinstance(self.data, LazyArray):
+            return
+        if not self.data.flags.writeable or (isinstance(self.rawdata, np.ndarray) and np.may_share_memory(self.data, self.rawdata)):
+            self.data = copyArray(self.data)
+
+    def getState(self):
+        state = {name:getattr(self, name) for name in STATE_NAMES}
+        state["axes"] = list(self.axes)
+        state["property"] = dict(self.propertydict)
+        return state
+
+    def setState(self, state):
+        for name in STATE_NAMES:
+            setattr(self, name, state[name])
+        self.axes = list(state["axes"])
+        self.propertydict = dict(state["property"])
+        self.modified()
+
+    def goto(self, position):
+        '''
+        Bring the data to the state after the first position entries of the journal.
+        '''
+        journal = self.journal
+        start = journal.start(position)
+        if start == 0:
+            self.restoreRaw()
+        else:
+            self.setState(journal.checkpoints[start])
+        journal.replaying = True
+        try:
+            for func, args in journal.entries[start:position]:
+                func(self, *args)
+        finally:
+            journal.replaying = False
+        journal.position = position
+        self.rawdataflag = position == 0
+
+    def undo(self):
+        if self.journal.position == 0:
+            return False
+        self.goto(self.journal.position-1)
+        return True
+
+    def redo(self):
+        if self.journal.position == len(self.journal.entries):
+            return False
+        self.goto(self.journal.position+1)
+        return True
+
     def Restore(self):
-        self.data = np.copy(self.rawdata)
-        self.xscale = np.copy(self.rawxscale)
-        if self.dims > 1:
-            self.yscale = np.copy(self.rawyscale)
-        if self.dims > 2:
-            self.zscale = np.copy(self.rawzscale)
-        if self.dims > 3:
-            self.tscale = np.copy(self.rawtscale)
-        self.readProperty(True)
-        self.property = copy.deepcopy(self.rawproperty)
+        self.goto(0)
+
+    def restoreRaw(self):
+        self.setState(self.rawstate)
+        self.data = self.rawdata
         self.rawdataflag = True
+        self.modified()
+
+    def modified(self):
+        '''
+        Give the data a new version, every change of data, axes or modes goes through here.
+        '''
+        self.version = next(versions)
+
+    def fingerprint(self):
+        '''
+        blake2b of the data content, slab by slab in logical order, and of the axes and modes.
+        It only depends on the content, not on the memory layout, and it is computed once per version.
+        '''
+        if self.fingerprintcache is not None and self.fingerprintcache[0] == self.version:
+            return self.fingerprintcache[1]
+        version = self.version
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((self.dimension, self.spacemode, self.energyAxis)).encode("utf-8"))
+        for axis in self.axes[0:self.dims]:
+            h.update(repr(None if axis is None else axis.fingerprint()).encode("utf-8"))
+        if self.data is not None:
+            data = self.data if isinstance(self.data, LazyArray) else np.asarray(self.data)   # lazy data is hashed slab by slab too
+            h.update(data.dtype.str.encode("utf-8"))
+            if data.ndim == 0:
+                h.update(np.ascontiguousarray(data))
+            else:
+                step = max(SLAB_SIZE//max(data[0:1].nbytes, 1), 1)
+                for i in range(0, data.shape[0], step):
+                    h.update(np.ascontiguousarray(data[i:i+step]))
+        self.fingerprintcache = (version, h.hexdigest())
+        return self.fingerprintcache[1]
 
     def Save(self):
-        self.rawdata = np.copy(self.data)
-        self.rawxscale = np.copy(self.xscale)
-        if self.dims > 1:
-            self.rawyscale = np.copy(self.yscale)
-        if self.dims > 2:
-            self.rawzscale = np.copy(self.zscale)
-        if self.dims > 3:
-            self.rawtscale = np.copy(self.tscale)
-        self.rawproperty = copy.deepcopy(self.property)
-        self.rawdataflag = True
\ No newline at end of file
+        self.rawdata = self.data
+        self.rawstate = self.getState()
+        self.rawdataflag = True
+        self.journal.clear()
+
+    def copy(self):
+        '''
+        Duplicate sharing the arrays, which is instant whatever the size.
+        Shared arrays become read-only in both, the first operation then gives data its own buffer (see detach).
+        '''
+        views = {}   # id: (array, read-only view)
+        def readOnly(array):
+            if not isinstance(array, np.ndarray):
+                return array
+            if id(array) not in views:
+                view = array.view()
+                view.flags.writeable = False
+                views[id(array)] = (array, view)
+            return views[id(array)][1]
+        spec = copy.copy(self)
+        spec.axes = list(self.axes)
+        spec.propertydict = dict(self.propertydict)
+        spec.rawstate = dict(self.rawstate, axes=list(self.rawstate["axes"]), property=dict(self.rawstate["property"]))
+        spec.journal = self.journal.copy()
+        for each in (self, spec):
+            each.data = readOnly(each.data)
+            each.rawdata = readOnly(each.rawdata)
+            for state in [each.rawstate]+list(each.journal.checkpoints.values()):
+                state["data"] = readOnly(state["data"])
+        return spec
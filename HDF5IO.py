@@ -0,0 +1,202 @@
+'''
+This module aims to implement Reading and Writing operation for HDF5/NeXus files (.h5, .hdf5, .nxs).
+'''
+
+# Each NXdata group with a signal attribute is read as one Spectrum, the axes attribute names the scale of each dimension.
+# h5py is optional, the other formats work without it.
+
+import os
+import weakref
+import numpy as np
+from Data import Spectrum, DataInfo, LazyArray, SLAB_SIZE, showError, uniformScaleInfo, replacedFile
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+CHUNK_CACHE_SIZE = 64*1024**2   # bytes of decompressed chunks kept by h5py for hyperslab reads
+AXIS_NAMES = ("x", "y", "z", "t")
+
+
+def openHDF5File(filepath, mode="r"):
+    if h5py is None:
+        showError("Reading and writing HDF5 files requires the h5py package.")
+        return None
+    return h5py.File(filepath, mode, rdcc_nbytes=CHUNK_CACHE_SIZE)
+
+
+def findNXdata(h5file):
+    '''
+    Return the NXdata groups having a signal, in file order.
+    '''
+    grouplist = []
+    def visit(name, obj):
+        if isinstance(obj, h5py.Group) and "signal" in obj.attrs and obj.attrs["signal"] in obj:
+            grouplist.append(obj)
+    h5file.visititems(visit)
+    return grouplist
+
+
+def attrString(attrs, key):
+    value = attrs.get(key)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    return value
+
+
+def mapDataset(filepath, dataset, mode='c'):
+    '''
+    Memory-map a contiguous and uncompressed dataset, None is returned if it is chunked or compressed.
+    '''
+    offset = dataset.id.get_offset()
+    if dataset.chunks is not None or dataset.compression is not None or offset is None:
+        return None
+    return np.memmap(filepath, dtype=dataset.dtype, mode=mode, offset=offset, shape=dataset.shape, order='C')
+
+
+class HDF5Array(LazyArray):
+    '''
+    Dataset of a file kept open while the array is used, the chunks decompressed for a hyperslab stay in the chunk cache
+    of the file for the next ones.
+    '''
+    def __init__(self, filepath, datapath):
+        h5file = openHDF5File(filepath)
+        self.dataset = h5file[datapath]
+        super(HDF5Array, self).__init__(self.dataset.shape, self.dataset.dtype)
+        self.filepath = filepath
+        weakref.finalize(self, h5file.close)
+
+    def read(self, slices):
+        return self.dataset[slices]
+
+
+def readAxes(group, dataset):
+    '''
+    Return the scale dataset of each dimension of dataset, None where it is missing.
+    '''
+    axes = group.attrs.get("axes", [])
+    if isinstance(axes, (str, bytes)):
+        axes = [axes]
+    axes = [axis.decode("utf-8") if isinstance(axis, bytes) else axis for axis in axes]
+    axislist = []
+    for i in range(dataset.ndim):
+        if i < len(axes) and axes[i] in group and group[axes[i]].shape == (dataset.shape[i],):
+            axislist.append(group[axes[i]])
+        else:
+            axislist.append(None)
+    return axislist
+
+
+def probeHDF5File(filepath):
+    '''
+    Describe the NXdata groups of a file from their attributes and the scale end points.
+    '''
+    base = os.path.basename(filepath)
+    filename = os.path.splitext(base)[0]
+    h5file = openHDF5File(filepath)
+    if h5file is None:
+        return []
+    infolist = []
+    with h5file:
+        grouplist = findNXdata(h5file)
+        for group in grouplist:
+            dataset = group[attrString(group.attrs, "signal")]
+            if dataset.ndim < 1 or dataset.ndim > 4:
+                continue
+            scaleinfo = []
+            for axis, n in zip(readAxes(group, dataset), dataset.shape):
+                if axis is None:
+                    scaleinfo.append(uniformScaleInfo(0, 1, n))
+                else:
+                    head = axis[0:min(n, 2)]
+                    scaleinfo.append((head[0], axis[n-1], head[1]-head[0] if n > 1 else 0))
+            name = group.name.split('/')[-1] if len(grouplist) > 1 else filename
+            infolist.append(DataInfo(name, filepath, dataset.shape, scaleinfo, attrString(group.attrs, "spacemode"), 
+            attrString(group.attrs, "energyAxis"), attrString(group.attrs, "note") or ""))
+    return infolist
+
+
+def HDF5File2Data(filepath, lazy=False):
+    base = os.path.basename(filepath)
+    filename = os.path.splitext(base)[0]
+    h5file = openHDF5File(filepath)
+    if h5file is None:
+        return []
+    datalist = []
+    with h5file:
+        grouplist = findNXdata(h5file)
+        for group in grouplist:
+            dataset = group[attrString(group.attrs, "signal")]
+            if dataset.ndim < 1 or dataset.ndim > 4:
+                continue
+
+            # read data, when lazy contiguous datasets are mapped directly and chunked ones of 3 or 4 dimensions are read
+            # by hyperslabs as the viewers slice them
+            data = None
+            rawdata = None
+            if lazy:
+                data = mapDataset(filepath, dataset)
+                rawdata = mapDataset(filepath, dataset, mode='r')
+                if data is None and dataset.ndim > 2:
+                    data = HDF5Array(filepath, dataset.name)
+            if data is None:
+                data = dataset[()]
+
+            # read scale
+            scales = []
+            for axis, n in zip(readAxes(group, dataset), dataset.shape):
+                if axis is None:
+                    scales.append(np.arange(n, dtype=np.float64))
+                else:
+                    scales.append(axis[()].astype(np.float64))
+            scales += [None]*(4-dataset.ndim)
+
+            if len(grouplist) > 1:
+                name = group.name.split('/')[-1]
+            else:
+                name = filename
+            spec = Spectrum(name, data=data, xscale=scales[0], yscale=scales[1], zscale=scales[2], tscale=scales[3],
+            spacemode=attrString(group.attrs, "spacemode"), energyAxis=attrString(group.attrs, "energyAxis"), rawdata=rawdata)
+            note = attrString(group.attrs, "note")
+            if note is not None:
+                spec.note = note
+            spec.property["Path"]=filepath
+            datalist.append(spec)
+    return datalist
+
+
+def Data2HDF5File(Datalist, filepath, compression="gzip", level=4):
+    '''
+    Write each Spectrum as an NXdata group in a NeXus entry, the chunked dataset is filled slab by slab.
+    '''
+    with replacedFile(filepath) as temppath:
+        h5file = openHDF5File(temppath, "w")
+        if h5file is None:
+            return
+        with h5file:
+            entry = h5file.create_group("entry")
+            entry.attrs["NX_class"] = "NXentry"
+            names = []
+            for Data in Datalist:
+                name = Data.name
+                while name in names:
+                    name += "_"
+                names.append(name)
+                group = entry.create_group(name)
+                group.attrs["NX_class"] = "NXdata"
+                group.attrs["signal"] = "data"
+                group.attrs["axes"] = list(AXIS_NAMES[0:Data.dims])
+                if Data.spacemode is not None:
+                    group.attrs["spacemode"] = Data.spacemode
+                if Data.energyAxis is not None:
+                    group.attrs["energyAxis"] = Data.energyAxis
+                group.attrs["note"] = Data.note
+                for axis, scale in zip(AXIS_NAMES, (Data.xscale, Data.yscale, Data.zscale, Data.tscale)[0:Data.dims]):
+                    group.create_dataset(axis, data=np.asarray(scale, dtype=np.float64))
+
+                # write data
+                data = Data.data
+                dataset = group.create_dataset("data", shape=data.shape, dtype=data.dtype, chunks=True, compression=compression, compression_opts=level if compression is not None else None)
+                step = max(SLAB_SIZE//max(data[0].nbytes, 1), 1)
+                for i in range(0, data.shape[0], step):
+                    dataset[i:i+step] = data[i:i+step]
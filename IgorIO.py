@@ -8,9 +8,8 @@ import struct
 from struct import Struct
 import os, platform
 import numpy as np
-from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtCore import Qt
-from Data import Spectrum
+from Data import Spectrum, DataInfo, mapArray, writeSlabs, showError, uniformScaleInfo, replacedFile
 
 RECTYPE_MASK = 0x7FFF
 MAXDIMS = 4
@@ -60,141 +59,165 @@ RecordHeader = Struct('<Hhl')
 PlatformInfo = Struct('<hhd244s')
 
 
-def IgorPackedFile2Data(filepath, useFilename):
-    base = os.path.basename(filepath)
-    filename = os.path.splitext(base)[0]
-    datalist = []
+class WaveRecord():
+    '''
+    Table of contents entry of a wave in an Igor file, the data stay on disk.
+    '''
+    def __init__(self, name, dtype, shape, offset, note, dimdelta, dimoffset):
+        self.name = name
+        self.dtype = dtype
+        self.shape = shape          # Igor order: row, column, layer, chunk
+        self.offset = offset        # byte offset of the data in the file
+        self.note = note
+        self.dimdelta = dimdelta
+        self.dimoffset = dimoffset
+
+
+def readWaveRecord(binfile):
+    '''
+    Parse the headers and note of a wave starting at the current position of binfile.
+    The data are skipped, None is returned for unsupported versions.
+    '''
+    # check version
+    HeaderVersion, = struct.unpack('<h', binfile.read(struct.calcsize('<h')))
+    binHeaderStruct = toBinHeader(HeaderVersion)
+    waveHeaderStruct = toWaveHeader(HeaderVersion)
+    if binHeaderStruct is None or waveHeaderStruct is None:
+        showError("This is a Version {} Igor File.".format(HeaderVersion))
+        return None
+
+    # read binheader
+    binHeader = binHeaderStruct.unpack(binfile.read(binHeaderStruct.size))
+    formulaSize = binHeader[2]
+    noteSize = binHeader[3]
+
+    # read waveheader
+    waveHeader = waveHeaderStruct.unpack(binfile.read(waveHeaderStruct.size))
+    npnts = waveHeader[3]
+    dtype = npType[waveHeader[4]]
+    waveName = waveHeader[8].split(b'\x00', 1)[0].decode('utf-8')
+    dimsize = waveHeader[11:15]
+    dimdelta = waveHeader[15:19]
+    dimoffset = waveHeader[19:23]
+    dim = 1
+    while dim < MAXDIMS and dimsize[dim] != 0:
+        dim += 1
+    shape = dimsize[0:dim]
+
+    # skip data and formula, then read note
+    offset = binfile.tell()
+    note = ''
+    if noteSize != 0:
+        binfile.seek(offset+npnts*np.dtype(dtype).itemsize+formulaSize)
+        note = binfile.read(noteSize).decode()
+        note = note.replace('\r','\n')
+
+    return WaveRecord(waveName, dtype, shape, offset, note, dimdelta[0:dim], dimoffset[0:dim])
+
+
+def indexIgorPackedFile(filepath):
+    '''
+    Build the table of contents of the waves in a packed experiment by reading the headers only.
+    '''
+    recordlist = []
     with open(filepath, "rb") as binfile:
         while True:
             record_bytes = binfile.read(RecordHeader.size)
-            if record_bytes == b'':
+            if len(record_bytes) < RecordHeader.size:
                 break
-            else:
-                header = RecordHeader.unpack(record_bytes)
-                recordType, version, datanum = header
-
-            if recordType == 3:
-                # check version
-                HeaderVersion, = struct.unpack('<h', binfile.read(struct.calcsize('<h')))
-                binHeaderStruct = toBinHeader(HeaderVersion)
-                waveHeaderStruct = toWaveHeader(HeaderVersion)
-                if binHeaderStruct is None or waveHeaderStruct is None:
-                    QMessageBox.information(None, "Error", "This is a Version {} Igor File.".format(HeaderVersion), QMessageBox.Ok)
+            recordType, version, datanum = RecordHeader.unpack(record_bytes)
+            start = binfile.tell()
+            if recordType & RECTYPE_MASK == 3:
+                record = readWaveRecord(binfile)
+                if record is None:
                     break
+                recordlist.append(record)
+            binfile.seek(start+datanum)
+    return recordlist
+
+
+def WaveRecord2Data(filepath, record, name, lazy=False):
+    '''
+    Open the wave of a table of contents entry, memory-mapped if lazy is True.
+    '''
+    rawdata = None
+    if lazy:
+        data = mapArray(filepath, record.dtype, record.offset, record.shape)
+        rawdata = mapArray(filepath, record.dtype, record.offset, record.shape, mode='r')
+    else:
+        data = np.zeros(record.shape[::-1], dtype=record.dtype)
+        with open(filepath, "rb") as binfile:
+            binfile.seek(record.offset)
+            binfile.readinto(data)
+        data = data.T   # igor uses Fortran order
+
+    # generate spacemode and energyAxis
+    notedict = parseNote(record.note)
+    spacemode = notedict.get("spacemode")
+    energyAxis = notedict.get("energyAxis")
+
+    # generate scale
+    scales = [record.dimoffset[i]+record.dimdelta[i]*np.arange(record.shape[i]) for i in range(len(record.shape))]
+    scales += [None]*(MAXDIMS-len(scales))
 
-                # read binheader
-                binHeader = binHeaderStruct.unpack(binfile.read(binHeaderStruct.size))		
-                checksum = binHeader[0]			
-                wfmSize = binHeader[1]					
-                formulaSize = binHeader[2]
-                noteSize = binHeader[3]
-                dataEUnitsSize = binHeader[4]
-                dimEUnitsSize = binHeader[5:9]
-                dimLabelsSize = binHeader[9:13]
-                sIndicesSize = binHeader[13]
-                optionsSize1 = binHeader[14]
-                optionsSize2 = binHeader[15]
-
-                # read waveheader
-                waveHeader = waveHeaderStruct.unpack(binfile.read(waveHeaderStruct.size))
-                npnts = waveHeader[3]
-                type_code = waveHeader[4]
-                waveName = waveHeader[8].decode('utf-8')
-                dimsize = (waveHeader[11], waveHeader[12], waveHeader[13], waveHeader[14])
-                dimdelta = (waveHeader[15], waveHeader[16], waveHeader[17], waveHeader[18])
-                dimoffset = (waveHeader[19], waveHeader[20], waveHeader[21], waveHeader[22])
-                if dimsize[1] == 0: # 1D
-                    datashape = (dimsize[0],)
-                    dim = 1
-                elif dimsize[2] == 0: # 2D
-                    datashape = (dimsize[1], dimsize[0])
-                    dim = 2
-                elif dimsize[3] == 0: # 3D
-                    datashape = (dimsize[2], dimsize[1], dimsize[0])
-                    dim = 3
-                else:  # 4D
-                    datashape = (dimsize[3], dimsize[2], dimsize[1], dimsize[0])
-                    dim = 4
-
-                # read data
-                data = np.zeros(datashape, dtype=npType[type_code])
-                binfile.readinto(data)
-                if dim == 2:
-                    data = data.transpose(1,0)
-                elif dim == 3:
-                    data = data.transpose(2,1,0)
-                elif dim == 4:
-                    data = data.transpose(3,2,1,0)
-                
-
-                # read formula
-                if formulaSize != 0:
-                    binfile.read(formulaSize)
-
-                # read note
-                note=''
-                if noteSize != 0:
-                    notebyte = binfile.read(noteSize)
-                    note = notebyte.decode()
-                    note = note.replace('\r','\n')
-
-                # read dataUnits
-                if dataEUnitsSize != 0:
-                    binfile.read(dataEUnitsSize)
-
-                # read dimUnits
-                for i in dimEUnitsSize:
-                    if i != 0:
-                        binfile.read(i)
-
-                # read dimLabels
-                for i in dimLabelsSize:
-                    if i != 0:
-                        binfile.read(i)
-
-                # read sindice
-                if sIndicesSize != 0:
-                    binfile.read(sIndicesSize)
-
-                # read option
-                if optionsSize1 != 0:
-                    binfile.read(optionsSize1)
-                if optionsSize2 != 0:
-                    binfile.read(optionsSize2)
-
-                # generate spacemode and energyAxis
-                spacemode = searchspacemode(note)
-                energyAxis = searchenergyAxis(note)
-                
-                # generate scale
-                xscale = None
-                yscale = None
-                zscale = None
-                tscale = None
-                xscale = np.array([dimoffset[0]+i*dimdelta[0] for i in range(dimsize[0])])
-                if dim > 1:
-                    yscale = np.array([dimoffset[1]+i*dimdelta[1] for i in range(dimsize[1])])
-                if dim > 2:
-                    zscale = np.array([dimoffset[2]+i*dimdelta[2] for i in range(dimsize[2])])
-                if dim > 3:
-                    tscale = np.array([dimoffset[3]+i*dimdelta[3] for i in range(dimsize[3])])
-
-                if useFilename:
-                    name = filename
-                else:
-                    name = waveName            
-                spec = Spectrum(name, data=data, xscale=xscale, yscale=yscale, zscale=zscale, tscale=tscale, spacemode=spacemode, energyAxis=energyAxis)
-                spec.note = note
-                spec.property["Path"]=filepath
-                datalist.append(spec)
-            else:
-                recordData = binfile.read(datanum)
+    spec = Spectrum(name, data=data, xscale=scales[0], yscale=scales[1], zscale=scales[2], tscale=scales[3], spacemode=spacemode, energyAxis=energyAxis, rawdata=rawdata)
+    spec.note = record.note
+    spec.property["Path"]=filepath
+    return spec
 
+
+def IgorPackedFile2Data(filepath, useFilename, lazy=False):
+    base = os.path.basename(filepath)
+    filename = os.path.splitext(base)[0]
+    datalist = []
+    for record in indexIgorPackedFile(filepath):
+        if useFilename:
+            name = filename
+        else:
+            name = record.name
+        datalist.append(WaveRecord2Data(filepath, record, name, lazy))
     return datalist
 
 
+def IgorBinaryWave2Data(filepath):
+    '''
+    Open a single wave file (.ibw), its payload is memory-mapped in place.
+    '''
+    with open(filepath, "rb") as binfile:
+        record = readWaveRecord(binfile)
+    if record is None:
+        return None
+    return WaveRecord2Data(filepath, record, record.name, lazy=True)
+
+
+def WaveRecord2DataInfo(filepath, record, name):
+    scaleinfo = [uniformScaleInfo(record.dimoffset[i], record.dimdelta[i], record.shape[i]) for i in range(len(record.shape))]
+    notedict = parseNote(record.note)
+    return DataInfo(name, filepath, record.shape, scaleinfo, notedict.get("spacemode"), notedict.get("energyAxis"), record.note)
+
+
+def probeIgorPackedFile(filepath, useFilename):
+    '''
+    Describe the waves of a packed experiment from the record headers only.
+    '''
+    base = os.path.basename(filepath)
+    filename = os.path.splitext(base)[0]
+    return [WaveRecord2DataInfo(filepath, record, filename if useFilename else record.name) for record in indexIgorPackedFile(filepath)]
+
+
+def probeIgorBinaryWave(filepath):
+    '''
+    Describe a single wave file, which holds the same headers as a wave record of a packed experiment.
+    '''
+    with open(filepath, "rb") as binfile:
+        record = readWaveRecord(binfile)
+    if record is None:
+        return []
+    return [WaveRecord2DataInfo(filepath, record, record.name)]
+
+
 def Data2IgorPackedFile(Datalist, filepath):
-    with open(filepath, "wb") as binfile:
+    with replacedFile(filepath) as temppath, open(temppath, "wb") as binfile:
         version = 5
         binHeaderStruct = toBinHeader(version)
         waveHeaderStruct = toWaveHeader(version)
@@ -232,7 +255,7 @@ def Data2IgorPackedFile(Datalist, filepath):
             binfile.write(waveHeaderBytes)
 
             #write data and note
-            binfile.write(Data.data.tobytes('F'))
+            writeSlabs(binfile, Data.data, Data.data.dtype)
             binfile.write(Data.note.encode('utf-8'))
 
 
@@ -345,7 +368,7 @@ def toWaveHeaderParas(Data):
     for _ in range(MAXDIMS):  # 37:37+4 Handle dimLabels[MAXDIMS]
         wheader_paras.append(0)
     wheader_paras.append(0)   # 41 Handle waveNoteH
-    wheader_paras.append(platformCode[platform.system()])   # 42 unsigned char platform
+    wheader_paras.append(platformCode.get(platform.system(), 0))   # 42 unsigned char platform, 0 when unspecified
     for _ in range(3):
         wheader_paras.append(0)   # 43:43+3 unsigned char spare[3]
     for _ in range(13):   # 46:46+13 long whUnused[13]
@@ -367,27 +390,27 @@ def toWaveHeaderParas(Data):
     return tuple(wheader_paras)
 
 
-def searchspacemode(note):
-    itemlist = note.split('\n')
-    for item in itemlist:
-        if len(item.split('=')) == 2:
+def parseNote(note):
+    '''
+    Split the key=value lines of a wave note into a dict in a single pass.
+    '''
+    notedict = {}
+    for item in note.split('\n'):
+        if item.count('=') == 1:
             key, value = item.split('=')
-            if key == "spacemode":
-                return value
-    return None
+            notedict.setdefault(key, value)
+    return notedict
+
+
+def searchspacemode(note):
+    return parseNote(note).get("spacemode")
 
 
 def searchenergyAxis(note):
-    itemlist = note.split('\n')
-    for item in itemlist:
-        if len(item.split('=')) == 2:
-            key, value = item.split('=')
-            if key == "energyAxis":
-                return value
-    return None
+    return parseNote(note).get("energyAxis")
 
 
 if __name__ == "__main__":
     #IgorPackedFile2Data("D:/and.pxt", True)
     wave = Spectrum("wave", np.arange(5, dtype=np.float64), xscale=np.arange(0, 1, 0.2, dtype=np.float64))
-    Data2IgorPackedFile(wave, "D:/abc.pxt")
\ No newline at end of file
+    Data2IgorPackedFile(wave, "D:/abc.pxt")
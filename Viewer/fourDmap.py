@@ -651,9 +651,6 @@ class fourDmap(QWidget):
                 self.plotArtist()
                 self.setIntensity()
 
-    def scale2pnt(self, value, scale):
-        return (np.abs(scale - value)).argmin()
-
     def setIntensity(self):
         intensity = self.get_intensity(self.X.value(), self.Y.value(), self.Z.value(), self.T.value())
         if np.isnan(intensity):
@@ -664,10 +661,10 @@ class fourDmap(QWidget):
             self.Int.setText("%.2e" % intensity)
 
     def get_intensity(self, xvalue, yvalue, zvalue, tvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
-        zidx = self.scale2pnt(zvalue, self.data.zscale)
-        tidx = self.scale2pnt(tvalue, self.data.tscale)
+        xidx = self.data.axes[0].index(xvalue)
+        yidx = self.data.axes[1].index(yvalue)
+        zidx = self.data.axes[2].index(zvalue)
+        tidx = self.data.axes[3].index(tvalue)
         half_wid_xnum = int((self.XSlice.value()-1)/2)
         half_wid_ynum = int((self.YSlice.value()-1)/2)
         half_wid_znum = int((self.ZSlice.value()-1)/2)
@@ -695,8 +692,8 @@ class fourDmap(QWidget):
         return self.data.data[xminidx:xmaxidx, yminidx:ymaxidx, zminidx:zmaxidx, tminidx:tmaxidx].sum()
 
     def get_Spec(self, zvalue, tvalue):
-        zidx = self.scale2pnt(zvalue, self.data.zscale)
-        tidx = self.scale2pnt(tvalue, self.data.tscale)
+        zidx = self.data.axes[2].index(zvalue)
+        tidx = self.data.axes[3].index(tvalue)
         if self.ZSlice.value() == 1 and self.TSlice.value() == 1:
             return self.data.data[:, :, zidx, tidx]
         else:
@@ -718,8 +715,8 @@ class fourDmap(QWidget):
             return array
 
     def get_Map(self, xvalue, yvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
+        xidx = self.data.axes[0].index(xvalue)
+        yidx = self.data.axes[1].index(yvalue)
         if self.XSlice.value() == 1 and self.YSlice.value() == 1:
             return self.data.data[xidx, yidx, :, :]
         else:
@@ -741,7 +738,7 @@ class fourDmap(QWidget):
             return array
 
     def get_XDC(self, yvalue):
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
+        yidx = self.data.axes[1].index(yvalue)
         if self.YSlice.value() == 1:
             return self.Spec[:, yidx]
         else:
@@ -755,7 +752,7 @@ class fourDmap(QWidget):
             return np.sum(array, axis=1)
 
     def get_YDC(self, xvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
+        xidx = self.data.axes[0].index(xvalue)
         if self.XSlice.value() == 1:
             return self.Spec[xidx, :]
         else:
@@ -769,7 +766,7 @@ class fourDmap(QWidget):
             return np.sum(array, axis=0)
 
     def get_ZDC(self, tvalue):
-        tidx = self.scale2pnt(tvalue, self.data.tscale)
+        tidx = self.data.axes[3].index(tvalue)
         if self.TSlice.value() == 1:
             return self.Map[:, tidx]
         else:
@@ -783,7 +780,7 @@ class fourDmap(QWidget):
             return np.sum(array, axis=1)
 
     def get_TDC(self, zvalue):
-        zidx = self.scale2pnt(zvalue, self.data.zscale)
+        zidx = self.data.axes[2].index(zvalue)
         if self.ZSlice.value() == 1:
             return self.Map[zidx, :]
         else:
@@ -1210,4 +1207,4 @@ class fourDmap(QWidget):
         self.plotArtist()
 
     def resizeEvent_wrapper(self):
-        self.updateAxesPosition(False)
\ No newline at end of file
+        self.updateAxesPosition(False)
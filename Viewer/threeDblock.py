@@ -506,9 +506,6 @@ class threeDblock(QWidget):
                 self.plotArtist()
                 self.setIntensity()
 
-    def scale2pnt(self, value, scale):
-        return (np.abs(scale - value)).argmin()
-
     def setTickLabelFont(self, ax, font):
         for tick in ax.get_xticklabels():
             tick.set_fontname(font)
@@ -525,9 +522,9 @@ class threeDblock(QWidget):
             self.Int.setText("%.2e" % intensity)
 
     def get_intensity(self, xvalue, yvalue, zvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
-        zidx = self.scale2pnt(zvalue, self.data.zscale)
+        xidx = self.data.axes[0].index(xvalue)
+        yidx = self.data.axes[1].index(yvalue)
+        zidx = self.data.axes[2].index(zvalue)
         half_wid_xnum = int((self.XSlice.value()-1)/2)
         half_wid_ynum = int((self.YSlice.value()-1)/2)
         half_wid_znum = int((self.ZSlice.value()-1)/2)
@@ -549,7 +546,7 @@ class threeDblock(QWidget):
         return self.data.data[xminidx:xmaxidx, yminidx:ymaxidx, zminidx:zmaxidx].sum()
     
     def get_Zcut(self, zvalue):
-        zidx = self.scale2pnt(zvalue, self.data.zscale)
+        zidx = self.data.axes[2].index(zvalue)
         if self.ZSlice.value() == 1:
             return self.data.data[:, :, zidx]
         else:
@@ -561,7 +558,7 @@ class threeDblock(QWidget):
             return np.sum(array, axis=2)
 
     def get_Xcut(self, yvalue):
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
+        yidx = self.data.axes[1].index(yvalue)
         if self.YSlice.value() == 1:
             return self.data.data[:, yidx, :]
         else:
@@ -573,7 +570,7 @@ class threeDblock(QWidget):
             return np.sum(array, axis=1)
 
     def get_Ycut(self, xvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
+        xidx = self.data.axes[0].index(xvalue)
         if self.XSlice.value() == 1:
             return self.data.data[xidx, :, :]
         else:
@@ -585,7 +582,7 @@ class threeDblock(QWidget):
             return np.sum(array, axis=0)
 
     def get_XDC(self, yvalue):
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
+        yidx = self.data.axes[1].index(yvalue)
         if self.YSlice.value() == 1:
             return self.Zcut[:, yidx]
         else:
@@ -599,7 +596,7 @@ class threeDblock(QWidget):
             return np.sum(array, axis=1)
 
     def get_YDC(self, xvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
+        xidx = self.data.axes[0].index(xvalue)
         if self.XSlice.value() == 1:
             return self.Zcut[xidx, :]
         else:
@@ -613,7 +610,7 @@ class threeDblock(QWidget):
             return np.sum(array, axis=0)
 
     def get_ZDC(self, xvalue):  # the ZDC is obtained from Xcut. It is equivalent to obtain from Ycut
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
+        xidx = self.data.axes[0].index(xvalue)
         if self.XSlice.value() == 1:
             return self.Xcut[xidx, :]
         else:
@@ -398,12 +398,9 @@ class twoDimage(QWidget):
         for tick in ax.get_yticklabels():
             tick.set_fontname(font)
         
-    def scale2pnt(self, value, scale):
-        return (np.abs(scale - value)).argmin()
-
     def get_intensity(self, xvalue, yvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
+        xidx = self.data.axes[0].index(xvalue)
+        yidx = self.data.axes[1].index(yvalue)
         half_wid_xnum = int((self.XSlice.value()-1)/2)
         half_wid_ynum = int((self.YSlice.value()-1)/2)
         if xidx < half_wid_xnum:
@@ -419,7 +416,7 @@ class twoDimage(QWidget):
         return self.data.data[xminidx:xmaxidx, yminidx:ymaxidx].sum()
 
     def get_XDC(self, yvalue):
-        yidx = self.scale2pnt(yvalue, self.data.yscale)
+        yidx = self.data.axes[1].index(yvalue)
         half_wid_num = int((self.YSlice.value()-1)/2)
         if yidx < half_wid_num:
             yminidx = 0
@@ -430,7 +427,7 @@ class twoDimage(QWidget):
         return np.sum(array, axis=1)
 
     def get_YDC(self, xvalue):
-        xidx = self.scale2pnt(xvalue, self.data.xscale)
+        xidx = self.data.axes[0].index(xvalue)
         half_wid_num = int((self.XSlice.value()-1)/2)
         if xidx < half_wid_num:
             xminidx = 0
@@ -0,0 +1,181 @@
+'''
+Catalog Module
+'''
+
+# Files are indexed from their headers only (dataimporter.probe), one row per file, per dataset and per note key=value.
+# A file is probed again only when its size or mtime changed, files which disappeared are dropped from the catalog.
+
+import os, sqlite3, hashlib, threading
+from PyQt5.QtCore import pyqtSignal, QObject
+from dataimporter import probe
+from IgorIO import parseNote
+
+CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".arpesviewer", "catalog.sqlite")
+CATALOG_FORMATS = (".ig2py", ".arpy", ".pxt", ".pxp", ".ibw", ".h5", ".hdf5", ".nxs")
+FINGERPRINT_SIZE = 64*1024   # bytes hashed from the beginning of a file
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER, mtime INTEGER, fingerprint TEXT);
+CREATE TABLE IF NOT EXISTS scans (id INTEGER PRIMARY KEY, file INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT, dims INTEGER, dimension TEXT, xmin REAL, xmax REAL, xstep REAL, ymin REAL, ymax REAL, ystep REAL,
+    zmin REAL, zmax REAL, zstep REAL, tmin REAL, tmax REAL, tstep REAL, spacemode TEXT, energyAxis TEXT, note TEXT);
+CREATE TABLE IF NOT EXISTS notes (scan INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE, key TEXT, value TEXT);
+CREATE INDEX IF NOT EXISTS scans_file ON scans(file);
+CREATE INDEX IF NOT EXISTS scans_name ON scans(name);
+CREATE INDEX IF NOT EXISTS scans_mode ON scans(spacemode, dims);
+CREATE INDEX IF NOT EXISTS notes_scan ON notes(scan);
+CREATE INDEX IF NOT EXISTS notes_key ON notes(key, value);
+'''
+
+
+def fingerprint(filepath, size):
+    '''
+    blake2b of the file size and its first FINGERPRINT_SIZE bytes, which hold the headers of every supported format.
+    '''
+    h = hashlib.blake2b(str(size).encode("utf-8"), digest_size=16)
+    with open(filepath, "rb") as binfile:
+        h.update(binfile.read(FINGERPRINT_SIZE))
+    return h.hexdigest()
+
+
+def likePattern(text):
+    '''
+    LIKE pattern matching text anywhere, its wildcards are escaped with a backslash.
+    '''
+    return "%"+text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")+"%"
+
+
+class Catalog():
+    def __init__(self, dbpath=CATALOG_PATH):
+        if os.path.dirname(dbpath):
+            os.makedirs(os.path.dirname(dbpath), exist_ok=True)
+        self.dbpath = dbpath
+        self.db = sqlite3.connect(dbpath, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def indexFile(self, filepath, stat):
+        '''
+        Probe one file and replace its rows, nothing is stored if it cannot be read so that it is tried again next time.
+        '''
+        try:
+            infolist = probe(filepath)
+        except Exception:
+            infolist = None
+        self.db.execute("DELETE FROM files WHERE path=?", (filepath,))
+        if infolist is None:
+            return False
+        cur = self.db.execute("INSERT INTO files (path, size, mtime, fingerprint) VALUES (?,?,?,?)",
+        (filepath, stat.st_size, stat.st_mtime_ns, fingerprint(filepath, stat.st_size)))
+        fileid = cur.lastrowid
+        for info in infolist:
+            scaleinfo = [tuple(float(v) for v in axis) for axis in info.scaleinfo]+[(None, None, None)]*(4-info.dims)
+            cur = self.db.execute("INSERT INTO scans (file, name, dims, dimension, xmin, xmax, xstep, ymin, ymax, ystep, zmin, zmax, zstep, tmin, tmax, tstep, spacemode, energyAxis, note) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (fileid, info.name, info.dims, "%s" % (tuple(int(n) for n in info.dimension),))+sum(scaleinfo, ())+(info.spacemode, info.energyAxis, info.note))
+            self.db.executemany("INSERT INTO notes (scan, key, value) VALUES (?,?,?)", [(cur.lastrowid, key, value) for key, value in parseNote(info.note).items()])
+        return True
+
+    def indexFolder(self, folder, recursive=True, cancel=None):
+        '''
+        Bring the catalog up to date with folder, only new or changed files are probed.
+        Return the number of files indexed and removed.
+        '''
+        folder = os.path.abspath(folder)
+        pattern = os.path.join(folder, "")
+        with self.lock, self.db:
+            known = {path:(size, mtime) for path, size, mtime in
+            self.db.execute("SELECT path, size, mtime FROM files WHERE substr(path, 1, ?)=?", (len(pattern), pattern))}
+            seen = set()
+            indexed = 0
+            for root, dirs, files in os.walk(folder):
+                if not recursive:
+                    dirs.clear()
+                for f in files:
+                    if cancel is not None and cancel.is_set():
+                        return indexed, 0
+                    if os.path.splitext(f)[1].lower() not in CATALOG_FORMATS:
+                        continue
+                    filepath = os.path.join(root, f)
+                    try:
+                        stat = os.stat(filepath)
+                    except OSError:
+                        continue
+                    seen.add(filepath)
+                    if known.get(filepath) == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                    if self.indexFile(filepath, stat):
+                        indexed += 1
+            removed = [(path,) for path in known if path not in seen and (recursive or os.path.dirname(path) == folder)]
+            self.db.executemany("DELETE FROM files WHERE path=?", removed)
+        return indexed, len(removed)
+
+    def search(self, text="", spacemode=None, energyAxis=None, dims=None, notes=None, limit=1000):
+        '''
+        Find scans whose name, path or note contains text and which match the given fields exactly.
+        notes is a dict of note key=value pairs which must all be present.
+        Return rows of (path, name, dims, dimension, spacemode, energyAxis).
+        '''
+        conditions = []
+        params = []
+        if text:
+            conditions.append("(scans.name LIKE ? ESCAPE '\\' OR files.path LIKE ? ESCAPE '\\' OR scans.note LIKE ? ESCAPE '\\')")
+            params += [likePattern(text)]*3
+        for column, value in (("spacemode", spacemode), ("energyAxis", energyAxis), ("dims", dims)):
+            if value is not None:
+                conditions.append("scans.%s=?" % column)
+                params.append(value)
+        for key, value in (notes or {}).items():
+            conditions.append("scans.id IN (SELECT scan FROM notes WHERE key=? AND value=?)")
+            params += [key, value]
+        sql = "SELECT files.path, scans.name, scans.dims, scans.dimension, scans.spacemode, scans.energyAxis FROM scans JOIN files ON scans.file=files.id"
+        if conditions:
+            sql += " WHERE "+" AND ".join(conditions)
+        sql += " ORDER BY scans.id LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def noteKeys(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT DISTINCT key FROM notes ORDER BY key")]
+
+
+class IndexThread(threading.Thread):
+    '''
+    Index a folder with its own connection, searches from the GUI keep running on the WAL database meanwhile.
+    '''
+    def __init__(self, folder, dbpath, s):
+        super(IndexThread, self).__init__(daemon=True)
+        self.folder = folder
+        self.dbpath = dbpath
+        self.s = s
+        self.cancelEvent = threading.Event()
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+    def run(self):
+        '''
+        finished is always emitted, after failed if indexing stopped on an error.
+        '''
+        indexed, removed = 0, 0
+        try:
+            catalog = Catalog(self.dbpath)
+            try:
+                indexed, removed = catalog.indexFolder(self.folder, cancel=self.cancelEvent)
+            finally:
+                catalog.close()
+        except Exception as err:
+            self.s.failed.emit(str(err))
+        finally:
+            self.s.finished.emit(indexed, removed)
+
+
+class indexSignal(QObject):
+    finished = pyqtSignal(int, int)
+    failed = pyqtSignal(str)
@@ -3,10 +3,12 @@ Data Browser Module
 '''
 
 from PyQt5.QtWidgets import (QWidget, QMenu, QTreeWidget, QTreeWidgetItem, QTableWidget, QTableWidgetItem, 
-QAbstractItemView, QHeaderView, QStyleFactory, QTextEdit, QPushButton, QHBoxLayout, QVBoxLayout)
+QAbstractItemView, QHeaderView, QStyleFactory, QTextEdit, QPushButton, QHBoxLayout, QVBoxLayout, QLineEdit, QComboBox, 
+QLabel, QFileDialog)
 from PyQt5.QtGui import QFont, QColor, QCursor, QBrush, QIcon
 from PyQt5.QtCore import Qt, QSize, QTimer
-import copy
+from catalog import Catalog, IndexThread, indexSignal, CATALOG_PATH
+from memorymanager import MemoryManager
 
 
 class DataBrowser(QWidget):
@@ -31,6 +33,13 @@ class DataBrowser(QWidget):
         self.minWidth = 250
         self.setMinimumWidth(self.minWidth)
 
+        #Catalog
+        self.catalogWin = CatalogWin(self)
+
+    def showCatalog(self):
+        self.catalogWin.show()
+        self.catalogWin.OnSearch()
+
 
 class DataList(QTreeWidget):
     def __init__(self, Browser):
@@ -39,6 +48,7 @@ class DataList(QTreeWidget):
         self.Browser = Browser
         self.noteWin = NoteWin()
         self.SelectionModeFlag = True  # True for single-selection, False for multi-selection
+        self.memoryManager = MemoryManager()
 
         #Property
         self.setColumnCount(1)
@@ -143,6 +153,7 @@ class DataList(QTreeWidget):
         itemtoadd.setForeground(0, QBrush(colorlist[dim-1]))
         itemtoadd.setItemData(data)
         self.expandItem(self.SpecList[dim-1])
+        self.memoryManager.add(data)
     
     def delDataItem(self):
         if len(self.selectedItems()) > 0:
@@ -150,6 +161,7 @@ class DataList(QTreeWidget):
                 self.noteWin.close()
                 index = self.itemIndex(item)
                 item.parent().takeChild(index)
+                self.memoryManager.remove(item.Data)
 
     def renameItem(self):
         current_item = self.currentItem()
@@ -167,7 +179,7 @@ class DataList(QTreeWidget):
     def copyItem(self):
         current_item = self.currentItem()
         if not current_item.isFather and not current_item is None:
-            self.addDataItem(copy.deepcopy(current_item.Data))
+            self.addDataItem(current_item.Data.copy())
 
     def showNote(self):
         self.noteWin.setItem(self.currentItem())
@@ -278,4 +290,111 @@ class NoteWin(QWidget):
             self.note.setPlainText(self.item.Data.note)
 
     def clear(self):
-        self.note.clear()
\ No newline at end of file
+        self.note.clear()
+
+class CatalogWin(QWidget):
+    '''
+    Search the scans indexed in the catalog, double-click a result to import its file.
+    '''
+    def __init__(self, Browser, dbpath=CATALOG_PATH):
+        super(CatalogWin, self).__init__()
+        self.Browser = Browser
+        self.dbpath = dbpath
+        self.catalog = None
+        self.indexThread = None
+        self.indexError = None   # message of the last indexing error
+        self.setWindowIcon(QIcon("./image/import.ico"))
+        self.setWindowTitle("Catalog")
+        self.resize(800, 500)
+
+        #search
+        self.text = QLineEdit()
+        self.text.setPlaceholderText("name, path or note")
+        self.text.returnPressed.connect(self.OnSearch)
+        self.notes = QLineEdit()
+        self.notes.setPlaceholderText("key=value; key=value")
+        self.notes.returnPressed.connect(self.OnSearch)
+        self.spacemode = QComboBox()
+        self.spacemode.addItems(["Any", "Angular", "Momentum"])
+        self.spacemode.currentIndexChanged.connect(self.OnSearch)
+        self.dims = QComboBox()
+        self.dims.addItems(["Any", "1D", "2D", "3D", "4D"])
+        self.dims.currentIndexChanged.connect(self.OnSearch)
+        self.IndexButton = QPushButton("Index Folder")
+        self.IndexButton.clicked.connect(self.OnIndex)
+        hbox_search = QHBoxLayout()
+        hbox_search.addWidget(self.text, 2)
+        hbox_search.addWidget(self.notes, 2)
+        hbox_search.addWidget(self.spacemode)
+        hbox_search.addWidget(self.dims)
+        hbox_search.addWidget(self.IndexButton)
+
+        #result
+        self.result = QTableWidget()
+        self.result.setColumnCount(5)
+        self.result.setHorizontalHeaderLabels(["Name", "Dimension", "spacemode", "energyAxis", "Path"])
+        self.result.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.result.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.result.verticalHeader().hide()
+        self.result.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.result.cellDoubleClicked.connect(self.OnOpen)
+        self.status = QLabel()
+
+        vbox = QVBoxLayout()
+        vbox.addLayout(hbox_search)
+        vbox.addWidget(self.result)
+        vbox.addWidget(self.status)
+        self.setLayout(vbox)
+
+    def getCatalog(self):
+        if self.catalog is None:
+            self.catalog = Catalog(self.dbpath)
+        return self.catalog
+
+    def OnSearch(self):
+        notes = {}
+        for item in self.notes.text().split(';'):
+            if item.count('=') == 1:
+                key, value = item.split('=')
+                notes[key.strip()] = value.strip()
+        spacemode = self.spacemode.currentText() if self.spacemode.currentIndex() > 0 else None
+        dims = self.dims.currentIndex() if self.dims.currentIndex() > 0 else None
+        rows = self.getCatalog().search(self.text.text(), spacemode=spacemode, dims=dims, notes=notes)
+        self.result.setRowCount(len(rows))
+        for i, (path, name, dims, dimension, spacemode, energyAxis) in enumerate(rows):
+            for j, val in enumerate((name, dimension, spacemode, energyAxis, path)):
+                self.result.setItem(i, j, QTableWidgetItem("" if val is None else str(val)))
+        self.status.setText("%d scans" % len(rows))
+
+    def OnOpen(self, row, column):
+        self.Browser.Win.ImportData([self.result.item(row, 4).text()])
+
+    def OnIndex(self):
+        if self.indexThread is not None and self.indexThread.is_alive():
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Index Folder", ".")
+        if len(folder) > 0:
+            self.getCatalog()
+            s = indexSignal()
+            s.finished.connect(self.OnIndexed)
+            s.failed.connect(self.OnIndexFailed)
+            self.indexError = None
+            self.indexThread = IndexThread(folder, self.dbpath, s)
+            self.IndexButton.setEnabled(False)
+            self.status.setText("Indexing "+folder+"...")
+            self.indexThread.start()
+
+    def OnIndexFailed(self, message):
+        self.indexError = message
+
+    def OnIndexed(self, indexed, removed):
+        self.IndexButton.setEnabled(True)
+        self.OnSearch()
+        if self.indexError is not None:
+            self.status.setText("Indexing failed: %s. " % self.indexError+self.status.text())
+        else:
+            self.status.setText("%d files indexed, %d removed. " % (indexed, removed)+self.status.text())
+
+    def closeEvent(self, event):
+        if self.indexThread is not None:
+            self.indexThread.cancel()
@@ -0,0 +1,128 @@
+'''
+Decode Cache Module
+'''
+
+# Decoded arrays are kept as .npy sidecars with a meta.json per entry, one directory per entry.
+# An entry is keyed by the absolute path, size and mtime of the source file, so a changed file misses the cache.
+# index.json records the size and last use of each entry, the least recently used ones are evicted above the size cap.
+
+import os, json, time, shutil, hashlib, threading
+import numpy as np
+from Data import Spectrum
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".arpesviewer", "cache")
+CACHE_SIZE = 8*1024**3   # bytes
+
+
+class DecodeCache():
+    def __init__(self, cachedir=CACHE_DIR, maxsize=CACHE_SIZE):
+        self.cachedir = cachedir
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+
+    def key(self, filepath):
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        return path, hashlib.sha1(("%s|%d|%d" % (path, stat.st_size, stat.st_mtime_ns)).encode("utf-8")).hexdigest()
+
+    def readIndex(self):
+        try:
+            with open(os.path.join(self.cachedir, "index.json")) as jsonfile:
+                return json.load(jsonfile)
+        except (OSError, ValueError):
+            return {}
+
+    def writeIndex(self, index):
+        indexpath = os.path.join(self.cachedir, "index.json")
+        with open(indexpath+".tmp", "w") as jsonfile:
+            json.dump(index, jsonfile)
+        os.replace(indexpath+".tmp", indexpath)
+
+    def remove(self, index, key):
+        index.pop(key, None)
+        shutil.rmtree(os.path.join(self.cachedir, key), ignore_errors=True)
+
+    def load(self, filepath):
+        '''
+        Return the cached Spectrum list of filepath with memory-mapped data, None if it is not cached.
+        '''
+        path, key = self.key(filepath)
+        with self.lock:
+            index = self.readIndex()
+            if key not in index:
+                return None
+            entrydir = os.path.join(self.cachedir, key)
+            try:
+                with open(os.path.join(entrydir, "meta.json")) as jsonfile:
+                    meta = json.load(jsonfile)
+                datalist = []
+                for i, item in enumerate(meta):
+                    datafile = os.path.join(entrydir, "%d.npy" % i)
+                    scales = [None if scale is None else np.array(scale, dtype=np.float64) for scale in item["scales"]]
+                    spec = Spectrum(item["name"], data=np.load(datafile, mmap_mode='c'), xscale=scales[0], yscale=scales[1], zscale=scales[2], tscale=scales[3],
+                    spacemode=item["spacemode"], energyAxis=item["energyAxis"], propstr=repr(item["property"]), rawdata=np.load(datafile, mmap_mode='r'))
+                    spec.note = item["note"]
+                    datalist.append(spec)
+            except (OSError, ValueError, KeyError):
+                self.remove(index, key)
+                self.writeIndex(index)
+                return None
+            index[key]["atime"] = time.time()
+            self.writeIndex(index)
+            return datalist
+
+    def store(self, filepath, datalist):
+        '''
+        Save the decoded Spectrum list of filepath, replacing older entries of the same path. Failures leave the cache unchanged.
+        The entry is written to a temporary directory without the lock, which is only held to move it into place.
+        '''
+        path, key = self.key(filepath)
+        entrydir = os.path.join(self.cachedir, key)
+        tempdir = os.path.join(self.cachedir, ".%s.%d.%d.tmp" % (key, os.getpid(), threading.get_ident()))
+        try:
+            os.makedirs(tempdir, exist_ok=True)
+            meta = []
+            size = 0
+            for i, spec in enumerate(datalist):
+                datafile = os.path.join(tempdir, "%d.npy" % i)
+                np.save(datafile, spec.data)
+                size += os.path.getsize(datafile)
+                scales = [None if scale is None else np.asarray(scale, dtype=np.float64).tolist() for scale in (spec.xscale, spec.yscale, spec.zscale, spec.tscale)]
+                meta.append({"name":spec.name, "scales":scales, "spacemode":spec.spacemode, "energyAxis":spec.energyAxis,
+                "property":spec.property, "note":spec.note})
+            with open(os.path.join(tempdir, "meta.json"), "w") as jsonfile:
+                json.dump(meta, jsonfile)
+        except (OSError, TypeError, ValueError):
+            shutil.rmtree(tempdir, ignore_errors=True)
+            return
+        with self.lock:
+            index = self.readIndex()
+            try:
+                if key in index:   # stored meanwhile by another import of the same file
+                    shutil.rmtree(tempdir, ignore_errors=True)
+                else:
+                    shutil.rmtree(entrydir, ignore_errors=True)
+                    os.replace(tempdir, entrydir)
+            except OSError:
+                shutil.rmtree(tempdir, ignore_errors=True)
+                return
+            for oldkey in [oldkey for oldkey, entry in index.items() if entry["path"] == path and oldkey != key]:
+                self.remove(index, oldkey)
+            index[key] = {"path":path, "size":size, "atime":time.time()}
+            self.evict(index)
+            self.writeIndex(index)
+
+    def evict(self, index):
+        '''
+        Remove the least recently used entries until the cache fits in maxsize.
+        '''
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda key: index[key]["atime"]):
+            if total <= self.maxsize:
+                break
+            total -= index[key]["size"]
+            self.remove(index, key)
+
+    def clear(self):
+        with self.lock:
+            shutil.rmtree(self.cachedir, ignore_errors=True)
@@ -0,0 +1,143 @@
+'''
+Data Importer Module
+'''
+
+from PyQt5.QtCore import pyqtSignal, QObject
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
+import Data
+from IgorIO import IgorPackedFile2Data, IgorBinaryWave2Data, probeIgorPackedFile, probeIgorBinaryWave
+from HDF5IO import HDF5File2Data, probeHDF5File
+from datacache import DecodeCache
+import os, threading
+
+CACHED_FORMATS = (".ig2py", ".pxt", ".pxp")
+PROCESS_FORMATS = (".ig2py", ".pxt")   # parsed in Python under the GIL, decoded in worker processes
+decodeCache = DecodeCache()
+
+
+def decodeFile(filepath, lazy):
+    '''
+    Read a data file according to its extension without the decode cache, it also runs in worker processes.
+    '''
+    ext = os.path.splitext(filepath)[1].lower()
+    specList = []
+    if ext == ".ig2py":
+        specList = [Data.Ig2Py2Data(filepath)]
+    elif ext == ".arpy":
+        specList = [Data.ArPy2Data(filepath, lazy)]
+    elif ext == ".pxt":
+        specList = IgorPackedFile2Data(filepath, True, lazy)
+    elif ext == ".pxp":
+        specList = IgorPackedFile2Data(filepath, False, lazy)
+    elif ext == ".ibw":
+        specList = [IgorBinaryWave2Data(filepath)]
+    elif ext in (".h5", ".hdf5", ".nxs"):
+        specList = HDF5File2Data(filepath, lazy)
+    return [spec for spec in specList if spec is not None]
+
+
+def loadFile(filepath, decode=decodeFile):
+    '''
+    Read a data file according to its extension and return the list of Spectrum in it, decode(filepath, lazy) reads cache misses.
+    '''
+    base = os.path.basename(filepath)
+    ext = os.path.splitext(base)[1].lower()
+    lazy = os.path.getsize(filepath) > Data.LAZY_FILE_SIZE
+    if ext in CACHED_FORMATS:
+        specList = decodeCache.load(filepath)
+        if specList is not None:
+            return specList
+    specList = decode(filepath, lazy)
+    if len(specList) > 0 and (ext == ".ig2py" or (ext in CACHED_FORMATS and not lazy)):
+        decodeCache.store(filepath, specList)   # lazy binary files are already memory-mapped in place
+    return specList
+
+
+def probe(filepath):
+    '''
+    Describe the datasets of a file (dimension, scale ranges, spacemode, energyAxis and note) without reading their data.
+    '''
+    base = os.path.basename(filepath)
+    ext = os.path.splitext(base)[1].lower()
+    if ext == ".ig2py":
+        return Data.probeIg2Py(filepath)
+    elif ext == ".arpy":
+        return Data.probeArPy(filepath)
+    elif ext == ".pxt":
+        return probeIgorPackedFile(filepath, True)
+    elif ext == ".pxp":
+        return probeIgorPackedFile(filepath, False)
+    elif ext == ".ibw":
+        return probeIgorBinaryWave(filepath)
+    elif ext in (".h5", ".hdf5", ".nxs"):
+        return probeHDF5File(filepath)
+    return []
+
+
+class ImportThread(threading.Thread):
+    '''
+    Parse files in a pool of worker threads and stream the results back by signals in finishing order.
+    The threads hand the text formats to a pool of worker processes, the other readers mostly wait on I/O and stay in the threads.
+    '''
+    def __init__(self, filelist, core, s):
+        super(ImportThread, self).__init__()
+        self.filelist = filelist
+        self.core = core
+        self.s = s
+        self.cancelled = threading.Event()
+        self.processes = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def load(self, filepath):
+        if self.cancelled.is_set():
+            return filepath, [], None
+        try:
+            return filepath, loadFile(filepath, self.decode), None
+        except Data.DataFileError as err:
+            return filepath, [], str(err)
+        except Exception as err:   # a broken file must not stop the other imports
+            return filepath, [], "Error in reading file ({}).".format(err)
+
+    def decode(self, filepath, lazy):
+        ext = os.path.splitext(filepath)[1].lower()
+        if self.processes is None or ext not in PROCESS_FORMATS or (lazy and ext == ".pxt"):   # lazy arrays map the file in place
+            return decodeFile(filepath, lazy)
+        result = self.processes.apply_async(decodeFile, (filepath, lazy))
+        while not result.ready():
+            if self.cancelled.is_set():
+                return []
+            result.wait(0.1)
+        return result.get()
+
+    def run(self):
+        workers = max(min(self.core, len(self.filelist)), 1)
+        if any(os.path.splitext(filepath)[1].lower() in PROCESS_FORMATS for filepath in self.filelist):
+            self.processes = mp.Pool(workers)
+        pool = ThreadPool(workers)
+        for i, (filepath, specList, error) in enumerate(pool.imap_unordered(self.load, self.filelist)):
+            if self.cancelled.is_set():
+                if self.processes is not None:
+                    self.processes.terminate()
+                pool.terminate()
+                break
+            if error is not None:
+                self.s.error.emit(os.path.basename(filepath)+": "+error)
+            if len(specList) > 0:
+                self.s.loaded.emit(specList)
+            self.s.progress.emit(i+1)
+        pool.close()
+        pool.join()
+        if self.processes is not None:
+            self.processes.close()
+            self.processes.join()
+        self.s.finished.emit()
+
+
+class importSignal(QObject):
+    loaded = pyqtSignal(object)
+    progress = pyqtSignal(int)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
@@ -4,7 +4,7 @@ Data Processor Module
 
 from PyQt5.QtWidgets import (QWidget, QTabWidget, QLabel, QVBoxLayout, QHBoxLayout, QScrollArea, QLayout, QGroupBox, 
 QPushButton, QCheckBox, QStyleFactory, QDoubleSpinBox, QSpinBox, QRadioButton, QFormLayout, QDialog, QProgressBar, 
-QMessageBox)
+QMessageBox, QComboBox)
 from PyQt5.QtCore import Qt, pyqtSignal, QObject
 from PyQt5.QtGui import QPalette, QMovie, QColor
 import Data
@@ -123,6 +123,7 @@ class SingleTab(QScrollArea):
         self.core_num = int(os.cpu_count()/2)
         self.solver_max_iteration_step = 30
         self.solver_error = 1e-7
+        self.solver = Data.KSPACE_SOLVER
         self.DevWin = DevSettingDialog(self, self.core_num, self.solver_max_iteration_step, self.solver_error)
 
         self.box = QVBoxLayout()
@@ -489,6 +490,20 @@ class SingleTab(QScrollArea):
         hbox_save_restore.addStretch(1)
         self.box.addLayout(hbox_save_restore)
 
+        #Undo & Redo
+        self.undoButton = QPushButton("Undo")
+        self.undoButton.setShortcut("Ctrl+Z")
+        self.undoButton.clicked.connect(self.UndoData)
+        self.redoButton = QPushButton("Redo")
+        self.redoButton.setShortcut("Ctrl+Y")
+        self.redoButton.clicked.connect(self.RedoData)
+        hbox_undo_redo = QHBoxLayout()
+        hbox_undo_redo.addStretch(1)
+        hbox_undo_redo.addWidget(self.undoButton)
+        hbox_undo_redo.addWidget(self.redoButton)
+        hbox_undo_redo.addStretch(1)
+        self.box.addLayout(hbox_undo_redo)
+
         #Developer Setting
         self.DevSetting = QCheckBox("Developer Setting")
         self.DevSetting.stateChanged.connect(self.OpenDevSetting)
@@ -662,44 +677,26 @@ class SingleTab(QScrollArea):
 
     @processGeneral
     def OnRemoveNaN(self, flag):
-        mask = np.isnan(self.singleData.data)
-        self.singleData.data[mask] = self.setvalue.value()
+        Data.removeNaN(self.singleData, self.setvalue.value())
     
     @processGeneral
     def offset(self, flag):
         if self.sender() == self.xdecreaseButton:
-            self.singleData.xscale -= self.xstep.value()
-            self.singleData.xmin -= self.xstep.value()
-            self.singleData.xmax -= self.xstep.value()           
+            Data.offset(self.singleData, 'X', -self.xstep.value())
         if self.sender() == self.xincreaseButton:
-            self.singleData.xscale += self.xstep.value()
-            self.singleData.xmin += self.xstep.value()
-            self.singleData.xmax += self.xstep.value()           
+            Data.offset(self.singleData, 'X', self.xstep.value())
         if self.sender() == self.ydecreaseButton:
-            self.singleData.yscale -= self.ystep.value()
-            self.singleData.ymin -= self.ystep.value()
-            self.singleData.ymax -= self.ystep.value()           
+            Data.offset(self.singleData, 'Y', -self.ystep.value())
         if self.sender() == self.yincreaseButton:
-            self.singleData.yscale += self.ystep.value()
-            self.singleData.ymin += self.ystep.value()
-            self.singleData.ymax += self.ystep.value()          
+            Data.offset(self.singleData, 'Y', self.ystep.value())
         if self.sender() == self.zdecreaseButton:
-            self.singleData.zscale -= self.zstep.value()
-            self.singleData.zmin -= self.zstep.value()
-            self.singleData.zmax -= self.zstep.value()          
+            Data.offset(self.singleData, 'Z', -self.zstep.value())
         if self.sender() == self.zincreaseButton:
-            self.singleData.zscale += self.zstep.value()
-            self.singleData.zmin += self.zstep.value()
-            self.singleData.zmax += self.zstep.value()
+            Data.offset(self.singleData, 'Z', self.zstep.value())
         if self.sender() == self.tdecreaseButton:
-            self.singleData.tscale -= self.tstep.value()
-            self.singleData.tmin -= self.tstep.value()
-            self.singleData.tmax -= self.tstep.value()          
+            Data.offset(self.singleData, 'T', -self.tstep.value())
         if self.sender() == self.tincreaseButton:
-            self.singleData.tscale += self.tstep.value()
-            self.singleData.tmin += self.tstep.value()
-            self.singleData.tmax += self.tstep.value()  
-        self.singleData.writeProperty(False)    
+            Data.offset(self.singleData, 'T', self.tstep.value())
 
     @processGeneral
     def OnCropSpec(self, flag):
@@ -752,13 +749,9 @@ class SingleTab(QScrollArea):
     @process2D
     def Tokspace2D(self, flag):
         if self.xaxis_2D_energy.isChecked():
-            if Data.Tokspace2D(self.singleData, 'X') == 0:
-                if self.singleData.energyAxis == None:
-                    self.singleData.energyAxis = 'X'
+            Data.Tokspace2D(self.singleData, 'X')
         else:
-            if Data.Tokspace2D(self.singleData, 'Y') == 0:
-                if self.singleData.energyAxis == None:
-                    self.singleData.energyAxis = 'Y'
+            Data.Tokspace2D(self.singleData, 'Y')
 
     @process3D
     def transpose3D(self, flag):
@@ -791,9 +784,9 @@ class SingleTab(QScrollArea):
         s.stoped.connect(dlg.StopedSlot)
         if self.sender() == self.theta3DButton_3D:
             if self.slit_h_3D.isChecked():
-                t = Data.ThetaKspace3D(self.singleData, 'H', self.bias_3D.value(), dlg, self.core_num, self.solver_max_iteration_step, self.solver_error, os.getpid(), s)
+                t = Data.ThetaKspace3D(self.singleData, 'H', self.bias_3D.value(), dlg, self.core_num, self.solver_max_iteration_step, self.solver_error, os.getpid(), s, self.solver)
             else:
-                t = Data.ThetaKspace3D(self.singleData, 'V', self.bias_3D.value(), dlg, self.core_num, self.solver_max_iteration_step, self.solver_error, os.getpid(), s)
+                t = Data.ThetaKspace3D(self.singleData, 'V', self.bias_3D.value(), dlg, self.core_num, self.solver_max_iteration_step, self.solver_error, os.getpid(), s, self.solver)
         t.start()
         return dlg.exec_()
 
@@ -811,6 +804,7 @@ class SingleTab(QScrollArea):
 
     def OpenDevSetting(self, state):
         if state == 2:
+            self.DevWin.updateMemory()
             self.DevWin.exec_()
             self.DevSetting.setCheckState(0)
 
@@ -826,6 +820,18 @@ class SingleTab(QScrollArea):
         self.Win.setData(self.singleData)
         self.saveButton.setEnabled(False)
 
+    def UndoData(self):
+        if self.singleData.undo():
+            self.Win.DataBrowser.InfoList.setProperty(self.singleData.property)
+            self.Win.setData(self.singleData)
+            self.saveButton.setEnabled(not self.singleData.rawdataflag)
+
+    def RedoData(self):
+        if self.singleData.redo():
+            self.Win.DataBrowser.InfoList.setProperty(self.singleData.property)
+            self.Win.setData(self.singleData)
+            self.saveButton.setEnabled(not self.singleData.rawdataflag)
+
 
 class MultipleTab(QScrollArea):
     def __init__(self, Win):
@@ -923,6 +929,14 @@ class DevSettingDialog(QDialog):
 
         #kspace solver parameters
         self.ks_solver_group = QGroupBox("k-space solver")
+        self.solver_label = QLabel("Solver:")
+        self.solver_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.solver = QComboBox()
+        self.solver.setFixedWidth(80)
+        self.solver.addItem("Closed", "closed")
+        self.solver.addItem("Newton", "newton")
+        self.solver.setCurrentIndex(self.solver.findData(Data.KSPACE_SOLVER))
+        self.solver.currentIndexChanged.connect(self.changeSolver)
         self.max_iteration_step_label = QLabel("Max iteration step:")
         self.max_iteration_step_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
         self.max_iteration_step = QSpinBox()
@@ -936,6 +950,11 @@ class DevSettingDialog(QDialog):
         self.error.setFixedWidth(80)
         self.error.setRange(0, 1e8)
         self.error.setValue(self.rel_error*1e7)
+        hbox_solver = QHBoxLayout()
+        hbox_solver.addStretch(1)
+        hbox_solver.addWidget(self.solver_label)
+        hbox_solver.addStretch(1)
+        hbox_solver.addWidget(self.solver)
         hbox_mis = QHBoxLayout()
         hbox_mis.addStretch(1)
         hbox_mis.addWidget(self.max_iteration_step_label)
@@ -946,12 +965,47 @@ class DevSettingDialog(QDialog):
         hbox_error.addWidget(self.error_label)
         hbox_error.addStretch(1)
         hbox_error.addWidget(self.error)
+        self.backend_label = QLabel("Backend: %s" % Data.KSPACE_BACKEND)
+        self.backend_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
         vbox_kspace = QVBoxLayout()
+        vbox_kspace.addWidget(self.backend_label)
+        vbox_kspace.addLayout(hbox_solver)
         vbox_kspace.addLayout(hbox_mis)
         vbox_kspace.addLayout(hbox_error)
         self.ks_solver_group.setLayout(vbox_kspace)
         self.box.addWidget(self.ks_solver_group)
 
+        #memory
+        self.memory_group = QGroupBox("Memory")
+        self.budget_label = QLabel("Memory Budget (MB):")
+        self.budget_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.budget = QSpinBox()
+        self.budget.setFixedWidth(80)
+        self.budget.setRange(16, 1024*1024)
+        self.budget.setValue(Data.MEMORY_BUDGET//1024**2)
+        hbox_budget = QHBoxLayout()
+        hbox_budget.addStretch(1)
+        hbox_budget.addWidget(self.budget_label)
+        hbox_budget.addStretch(1)
+        hbox_budget.addWidget(self.budget)
+        self.workspace_label = QLabel("Workspace Budget (MB):")
+        self.workspace_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.workspace = QSpinBox()
+        self.workspace.setFixedWidth(80)
+        self.workspace.setRange(16, 1024*1024)
+        hbox_workspace = QHBoxLayout()
+        hbox_workspace.addStretch(1)
+        hbox_workspace.addWidget(self.workspace_label)
+        hbox_workspace.addStretch(1)
+        hbox_workspace.addWidget(self.workspace)
+        self.memory_stats = QLabel()
+        vbox_memory = QVBoxLayout()
+        vbox_memory.addLayout(hbox_budget)
+        vbox_memory.addLayout(hbox_workspace)
+        vbox_memory.addWidget(self.memory_stats)
+        self.memory_group.setLayout(vbox_memory)
+        self.box.addWidget(self.memory_group)
+
         #setting button
         self.OKButton = QPushButton("Set")
         self.OKButton.clicked.connect(self.OnSet)
@@ -967,23 +1021,49 @@ class DevSettingDialog(QDialog):
         self.setLayout(self.box)
         self.setFixedSize(300, self.minimumHeight())
         self.position = self.pos()
+        self.changeSolver()
+
+    def changeSolver(self, index=None):
+        # the iteration parameters only apply to the Newton solver
+        newton = self.solver.currentData() == "newton"
+        self.max_iteration_step.setEnabled(newton)
+        self.error.setEnabled(newton)
+
+    def memoryManager(self):
+        return self.parent.Win.DataBrowser.DataList.memoryManager
+
+    def updateMemory(self):
+        stats = self.memoryManager().stats()
+        self.workspace.setValue(self.memoryManager().budget//1024**2)
+        self.memory_stats.setText("Resident %.0f MB, spilled %.0f MB\n%d evictions, %d faults" % (stats["resident"]/1024**2, stats["spilled"]/1024**2, 
+        stats["evictions"], stats["faults"]))
 
     def OnSet(self, flag):
         self.parent.core_num = self.core.value()
         self.parent.solver_max_iteration_step = self.max_iteration_step.value()
         self.parent.solver_error = self.error.value()*1e-7
+        self.parent.solver = self.solver.currentData()
+        Data.MEMORY_BUDGET = self.budget.value()*1024**2
+        self.memoryManager().budget = self.workspace.value()*1024**2
+        self.memoryManager().balance()
         self.accept()
 
     def OnCancel(self, flag):
         self.core.setValue(self.parent.core_num)
         self.max_iteration_step.setValue(self.parent.solver_max_iteration_step)
         self.error.setValue(self.parent.solver_error*1e7)
+        self.solver.setCurrentIndex(self.solver.findData(self.parent.solver))
+        self.budget.setValue(Data.MEMORY_BUDGET//1024**2)
+        self.workspace.setValue(self.memoryManager().budget//1024**2)
         self.reject()
 
     def closeEvent(self, event):
         self.core.setValue(self.parent.core_num)
         self.max_iteration_step.setValue(self.parent.solver_max_iteration_step)
         self.error.setValue(self.parent.solver_error*1e7)
+        self.solver.setCurrentIndex(self.solver.findData(self.parent.solver))
+        self.budget.setValue(Data.MEMORY_BUDGET//1024**2)
+        self.workspace.setValue(self.memoryManager().budget//1024**2)
 
 
 class signal(QObject):
@@ -0,0 +1,84 @@
+'''
+NumPy kspace Module
+'''
+
+# Same functions as the compiled kspace module (src/kspace_module), used when it is not built for the running interpreter.
+# solver runs the Newton iteration of ckspace.c:solver_c on whole arrays, the points which converged are masked out
+# of the following steps, so each point takes the same steps and gets the same result as in the compiled loop.
+
+import numpy as np
+from math import pi
+
+
+def px(alpha, theta, phi):
+    return np.sin(alpha)*np.cos(phi)+np.cos(alpha)*np.sin(phi)*np.cos(theta)
+
+
+def dpxda(alpha, theta, phi):
+    return np.cos(alpha)*np.cos(phi)-np.sin(alpha)*np.sin(phi)*np.cos(theta)
+
+
+def dpxdt(alpha, theta, phi):
+    return -np.cos(alpha)*np.sin(phi)*np.sin(theta)
+
+
+def py(alpha, theta):
+    return np.cos(alpha)*np.sin(theta)
+
+
+def dpyda(alpha, theta):
+    return -np.sin(alpha)*np.sin(theta)
+
+
+def dpydt(alpha, theta):
+    return np.cos(alpha)*np.cos(theta)
+
+
+def newtonStep(alpha0, theta0, phi, px_, py_):
+    '''
+    One Newton step from (alpha0, theta0), alpha_solver and theta_solver at once.
+    '''
+    sa, ca, st, ct = np.sin(alpha0), np.cos(alpha0), np.sin(theta0), np.cos(theta0)
+    sp, cp = np.sin(phi), np.cos(phi)
+    fx = sa*cp+ca*sp*ct-px_
+    fy = ca*st-py_
+    xa, xt = ca*cp-sa*sp*ct, -ca*sp*st
+    ya, yt = -sa*st, ca*ct
+    det = xa*yt-xt*ya
+    return alpha0-(yt*fx-xt*fy)/det, theta0-(ya*fx-xa*fy)/(-det)
+
+
+def alpha_solver(alpha0, theta0, phi, px_, py_):
+    return newtonStep(alpha0, theta0, phi, px_, py_)[0]
+
+
+def theta_solver(alpha0, theta0, phi, px_, py_):
+    return newtonStep(alpha0, theta0, phi, px_, py_)[1]
+
+
+def solver(alphalist, thetalist, phi, px_list, py_list, err, maxstep):
+    '''
+    Solve every point in place from the initial alphalist, thetalist, the points not converged after maxstep steps get PI.
+    '''
+    alpha, theta = alphalist.copy(), thetalist.copy()
+    px_list, py_list = np.asarray(px_list, dtype=np.float64), np.asarray(py_list, dtype=np.float64)
+    steps = np.zeros(len(alpha), dtype=np.int64)
+    active = np.arange(len(alpha))
+    with np.errstate(all='ignore'):
+        for step in range(maxstep+1):
+            a, t, x, y = alpha[active], theta[active], px_list[active], py_list[active]
+            # a NaN residual ends the loop of the compiled solver as well
+            moving = (np.abs(px(a, t, phi)-x) >= err) | (np.abs(py(a, t)-y) >= err)
+            active, a, t, x, y = active[moving], a[moving], t[moving], x[moving], y[moving]
+            if len(active) == 0:
+                break
+            alpha[active], theta[active] = newtonStep(a, t, phi, x, y)
+            steps[active] += 1
+        failed = steps > maxstep
+        alpha, theta = np.fmod(alpha, 2*pi), np.fmod(theta, 2*pi)
+        alpha[alpha > pi] -= 2*pi
+        theta[theta > pi] -= 2*pi
+    alpha[failed] = pi
+    theta[failed] = pi
+    alphalist[:] = alpha
+    thetalist[:] = theta
@@ -2,15 +2,18 @@
 MainWindow Module
 '''
 
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QHBoxLayout, QPushButton, QAction, QFileDialog, QSplitter)
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QHBoxLayout, QPushButton, QAction, QFileDialog, QSplitter, 
+QProgressDialog, QMessageBox)
 from PyQt5.QtCore import QTimer, pyqtSignal, QObject
 from PyQt5.QtGui import QIcon
 from databrowser import DataBrowser
 from dataprocessor import DataProcessor
 from imageviewer import ImageViewer
 from visualization3D import MYWidget
+from dataimporter import ImportThread, importSignal
 import Data
-from IgorIO import IgorPackedFile2Data, Data2IgorPackedFile
+from IgorIO import Data2IgorPackedFile
+from HDF5IO import Data2HDF5File
 import os
 
 
@@ -23,6 +26,7 @@ class MainWindow(QMainWindow):
         self.App = App
         self.splitterPos = 0
         self.initCompleteFlag = False
+        self.importThread = None
         self.signal = resizeSignal()
         self.setGeometry(300, 100, 900, 900)
         self.setWindowIcon(QIcon("./image/mainwin.ico"))
@@ -46,6 +50,9 @@ class MainWindow(QMainWindow):
         self.exportAct.setShortcut('Ctrl+E')
         self.exportAct.setIcon(QIcon("./image/export.ico"))
         self.exportAct.setEnabled(False)
+        self.catalogAct = QAction('&Catalog', self)
+        self.catalogAct.setShortcut('Ctrl+F')
+        self.catalogAct.setIcon(QIcon("./image/import.ico"))
         self.exitAct = QAction('&Exit', self)
         self.exitAct.setIcon(QIcon("./image/exit.ico"))
         self.fileMenu.addAction(self.openAct)
@@ -53,10 +60,12 @@ class MainWindow(QMainWindow):
         self.fileMenu.addSeparator()
         self.fileMenu.addAction(self.importAct)
         self.fileMenu.addAction(self.exportAct)
+        self.fileMenu.addAction(self.catalogAct)
         self.fileMenu.addSeparator()
         self.fileMenu.addAction(self.exitAct)
         self.importAct.triggered.connect(self.OnImport)
         self.exportAct.triggered.connect(self.OnExport)
+        self.catalogAct.triggered.connect(self.showCatalog)
         self.exitAct.triggered.connect(self.close)
 
         #Data Browser
@@ -168,57 +177,67 @@ class MainWindow(QMainWindow):
             QTimer.singleShot(delay, lambda: self.resize(self.width()+dwidth, self.height()))
 
     def OnImport(self):
-        filelist = QFileDialog.getOpenFileNames(self, "Import Data", ".", "Igor Packed Files(*.pxt; *.pxp);;ArPy Files(*.arpy);;Ig2Py Files(*.Ig2Py)")[0]
+        filelist = QFileDialog.getOpenFileNames(self, "Import Data", ".", "Igor Packed Files(*.pxt; *.pxp);;Igor Binary Wave Files(*.ibw);;ArPy Files(*.arpy);;Ig2Py Files(*.Ig2Py);;HDF5/NeXus Files(*.h5; *.hdf5; *.nxs)")[0]
         if len(filelist) > 0:
             self.ImportData(filelist)
 
+    def showCatalog(self):
+        self.DataBrowser.showCatalog()
+
     def OnExport(self):
         name = self.DataBrowser.DataList.currentItem().Data.name
-        savedfile = QFileDialog.getSaveFileName(self, "Export Data", name, "Igor Packed Files(*.pxt);;ArPy Files(*.arpy)")[0]
+        savedfile, selectedfilter = QFileDialog.getSaveFileName(self, "Export Data", name, "Igor Packed Files(*.pxt);;ArPy Files(*.arpy);;Compressed ArPy Files(*.arpy);;HDF5/NeXus Files(*.h5)")
         if len(savedfile) > 0:
-            self.ExportData(savedfile)
+            self.ExportData(savedfile, selectedfilter.startswith("Compressed"))
     
     def ImportData(self, filelist):
-        for filepath in filelist:
-            base = os.path.basename(filepath)
-            ext = os.path.splitext(base)[1]
-            if ext.lower() == ".ig2py":
-                spec = Data.Ig2Py2Data(filepath)
-                if spec != None:
-                    self.NewData(spec)
-            elif ext.lower() == ".arpy":
-                spec = Data.ArPy2Data(filepath)
-                if spec != None:
-                    self.NewData(spec)
-            elif ext.lower() == ".pxt":
-                specList = IgorPackedFile2Data(filepath, True)
-                for spec in specList:
-                    self.NewData(spec)
-            elif ext.lower() == ".pxp":
-                specList = IgorPackedFile2Data(filepath, False)
-                for spec in specList:
-                    self.NewData(spec)
-
-    def ExportData(self, savedfile):
+        if self.importThread is not None and self.importThread.is_alive():
+            QMessageBox.information(None, "Error", "Another import is in progress.", QMessageBox.Ok)
+            return
+        self.importDlg = QProgressDialog("Importing data...", "Cancel", 0, len(filelist), self)
+        self.importDlg.setWindowTitle("Import Data")
+        self.importDlg.setMinimumDuration(500)
+        self.importDlg.setValue(0)
+        s = importSignal()
+        s.loaded.connect(self.NewDataList)
+        s.progress.connect(self.importDlg.setValue)
+        s.error.connect(lambda message: QMessageBox.information(None, "Error", message, QMessageBox.Ok))
+        s.finished.connect(self.importDlg.close)
+        self.importThread = ImportThread(filelist, os.cpu_count(), s)
+        self.importDlg.canceled.connect(self.importThread.cancel)
+        self.importThread.start()
+
+    def ExportData(self, savedfile, compressed=False):
         base = os.path.basename(savedfile)
         ext = os.path.splitext(base)[1]
         if ext == ".arpy":
             data = self.DataBrowser.DataList.currentItem().Data
-            Data.Data2ArPy(data, savedfile)
+            if compressed:
+                Data.Data2ChunkedArPy(data, savedfile)
+            else:
+                Data.Data2ArPy(data, savedfile)
         elif ext == ".pxt":
             #data = self.DataBrowser.DataList.currentItem().Data
             datalist = [item.Data for item in self.DataBrowser.DataList.selectedItems()]
             Data2IgorPackedFile(datalist, savedfile)
+        elif ext in (".h5", ".hdf5", ".nxs"):
+            datalist = [item.Data for item in self.DataBrowser.DataList.selectedItems()]
+            Data2HDF5File(datalist, savedfile)
 
     def setData(self, data):
+        self.DataBrowser.DataList.memoryManager.touch(data)
         self.DataProcessor.updateUI(data)
         self.ImageViewer.setData(data)
-        if self.MYButton.isChecked():
+        if self.MYButton.isChecked() and (data is not self.MYWidget.data or data is None or data.version != self.MYWidget.version):
             self.MYWidget.setData(data)
     
     def NewData(self, data):
         self.DataBrowser.DataList.addDataItem(data)
 
+    def NewDataList(self, datalist):
+        for data in datalist:
+            self.NewData(data)
+
     def resizeEvent(self, event):
         if self.DataBrowser.width() < self.splitterPos:
             self.splitter.moveSplitter(self.splitterPos, 1)
@@ -235,7 +254,10 @@ class MainWindow(QMainWindow):
             self.resize(self.width()-1, self.height())
 
     def closeEvent(self, event):
+        if self.importThread is not None:
+            self.importThread.cancel()
         self.DataBrowser.DataList.noteWin.close()
+        self.DataBrowser.catalogWin.close()
 
 
 class resizeSignal(QObject):
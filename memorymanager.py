@@ -0,0 +1,173 @@
+'''
+Memory Manager Module
+'''
+
+# The arrays of a Spectrum (data, raw data and the journal states) are grouped by the buffer owning their memory.
+# Spilling copies each owner once to a scratch memmap and rebuilds every array on the copy with the same offset and strides,
+# so arrays sharing a buffer keep sharing it. Faulting in does the same from the scratch memmap back to memory.
+# Arrays mapped from a data file are not resident and are left alone.
+# A buffer shared by several datasets (see Spectrum.copy) is spilled for all of them at once, or not at all while one of them is on screen.
+# A spilled buffer still referenced outside the datasets is not freed, it is counted as resident until it is released.
+
+import weakref
+from collections import OrderedDict
+import numpy as np
+from Data import isMapped, scratchArray
+
+WORKSPACE_BUDGET = 4*1024**3   # bytes resident for all datasets, the least recently viewed ones are spilled above it
+
+
+def owner(array):
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def address(array):
+    return array.__array_interface__["data"][0]
+
+
+def flatBytes(array):
+    '''
+    The bytes of a contiguous array in memory order, None if it cannot be moved.
+    '''
+    if array.dtype.hasobject or not (array.flags.c_contiguous or array.flags.f_contiguous):
+        return None
+    return (array if array.flags.c_contiguous else array.T).reshape(-1).view(np.uint8)
+
+
+class MemoryManager():
+    def __init__(self, budget=WORKSPACE_BUDGET):
+        self.budget = budget
+        self.specs = OrderedDict()   # id: Spectrum, least recently viewed first
+        self.current = None   # id of the Spectrum on screen, it is never spilled
+        self.spilled = {}   # id of Spectrum: {id: scratch buffer} of its spilled owners
+        self.retained = []   # weak references to spilled owners still referenced elsewhere
+        self.evictions = 0
+        self.faults = 0
+
+    def arrays(self, spec):
+        states = [spec.rawstate]+list(spec.journal.checkpoints.values())
+        return [array for array in [spec.data, spec.rawdata]+[state["data"] for state in states if state is not None] if isinstance(array, np.ndarray)]
+
+    def owners(self, spec):
+        return {id(buffer):buffer for buffer in (owner(array) for array in self.arrays(spec))}
+
+    def resident(self, spec=None):
+        '''
+        Bytes held in memory by spec, or by all datasets, the scale caches of the axes are included.
+        The total also counts the spilled owners still referenced elsewhere.
+        '''
+        specs = list(self.specs.values()) if spec is None else [spec]
+        owners = {}
+        if spec is None:
+            self.retained = [ref for ref in self.retained if ref() is not None]
+            owners.update({id(ref()):ref() for ref in self.retained})
+        caches = {}
+        for spec in specs:
+            owners.update(self.owners(spec))
+            caches.update({id(axis):axis.cache for axis in spec.axes if axis is not None and axis.cache is not None})
+        return sum(buffer.nbytes for buffer in owners.values() if not isMapped(buffer))+sum(cache.nbytes for cache in caches.values())
+
+    def spilledBuffers(self, spec):
+        '''
+        Scratch buffers still used by spec, those released by later operations are dropped.
+        '''
+        owners = self.owners(spec)
+        buffers = {key:buffer for key, buffer in self.spilled.get(id(spec), {}).items() if key in owners}
+        if buffers:
+            self.spilled[id(spec)] = buffers
+        else:
+            self.spilled.pop(id(spec), None)
+        return buffers
+
+    def spilledBytes(self):
+        buffers = {id(buffer):buffer for spec in self.specs.values() for buffer in self.spilledBuffers(spec).values()}
+        return sum(buffer.nbytes for buffer in buffers.values())
+
+    def stats(self):
+        return {"resident":self.resident(), "spilled":self.spilledBytes(), "datasets":len(self.specs), "evictions":self.evictions, "faults":self.faults}
+
+    def add(self, spec):
+        self.specs[id(spec)] = spec
+        self.balance()
+
+    def remove(self, spec):
+        self.specs.pop(id(spec), None)
+        self.spilled.pop(id(spec), None)
+        if self.current == id(spec):
+            self.current = None
+
+    def touch(self, spec):
+        '''
+        Mark spec as viewed, fault it back in if it fits in the budget and spill other datasets if needed.
+        spec is None when no dataset is shown.
+        '''
+        self.current = None if spec is None else id(spec)
+        if id(spec) not in self.specs:
+            return
+        self.specs.move_to_end(id(spec))
+        buffers = self.spilledBuffers(spec)
+        if buffers and self.resident(spec)+sum(buffer.nbytes for buffer in buffers.values()) <= self.budget:
+            self.relocate(spec, lambda buffer: id(buffer) in buffers, lambda nbytes: np.empty(nbytes, dtype=np.uint8))
+            del self.spilled[id(spec)]
+            self.faults += 1
+        self.balance()
+
+    def balance(self):
+        '''
+        Spill the least recently viewed datasets until the resident bytes fit in the budget, the one on screen is kept.
+        A spill counts as an eviction only if it releases memory.
+        '''
+        for spec in list(self.specs.values()):
+            if self.resident() <= self.budget:
+                break
+            if id(spec) == self.current:
+                continue
+            shown = self.owners(self.specs[self.current]) if self.current in self.specs else {}
+            buffers = {key:buffer for key, buffer in self.owners(spec).items() if key not in shown and not isMapped(buffer)}
+            moved = {}
+            for each in [spec]+[other for other in self.specs.values() if other is not spec and buffers.keys() & self.owners(other).keys()]:
+                newbuffers = self.relocate(each, lambda buffer: id(buffer) in buffers, lambda nbytes: scratchArray(nbytes, np.uint8), moved)
+                if newbuffers:
+                    self.spilled.setdefault(id(each), {}).update({id(newbuffer):newbuffer for newbuffer in newbuffers})
+            refs = [weakref.ref(buffer) for buffer, newbuffer in moved.values()]
+            del buffers, moved
+            self.retained += [ref for ref in refs if ref() is not None]
+            if any(ref() is None for ref in refs):
+                self.evictions += 1
+
+    def relocate(self, spec, movable, newBuffer, moved=None):
+        '''
+        Move the owners of the arrays of spec accepted by movable to buffers from newBuffer(nbytes).
+        moved ({id of owner: (owner, new buffer)}) carries the moves over several datasets sharing owners.
+        Return the new buffers used by spec.
+        '''
+        moved = {} if moved is None else moved
+        used = {}   # id of new buffer: new buffer
+        rebuilt = {}   # id of array: (array, new array)
+        def move(array):
+            if not isinstance(array, np.ndarray):
+                return array
+            if id(array) in rebuilt:
+                return rebuilt[id(array)][1]
+            buffer = owner(array)
+            flat = flatBytes(buffer) if movable(buffer) else None
+            if flat is None or array.size == 0:
+                return array
+            if id(buffer) not in moved:
+                newbuffer = newBuffer(flat.nbytes)
+                newbuffer[:] = flat
+                moved[id(buffer)] = (buffer, newbuffer)
+            newbuffer = moved[id(buffer)][1]
+            used[id(newbuffer)] = newbuffer
+            newarray = np.ndarray(array.shape, array.dtype, buffer=newbuffer, offset=address(array)-address(buffer), strides=array.strides)
+            newarray.flags.writeable = array.flags.writeable   # read-only views of shared buffers stay read-only
+            rebuilt[id(array)] = (array, newarray)
+            return newarray
+        spec.data = move(spec.data)
+        spec.rawdata = move(spec.rawdata)
+        for state in [spec.rawstate]+list(spec.journal.checkpoints.values()):
+            if state is not None:
+                state["data"] = move(state["data"])
+        return list(used.values())
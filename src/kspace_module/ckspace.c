@@ -78,6 +78,74 @@ int solver_c(double *alpha0, double *theta0, double phi, double px_, double py_,
     return step;
 }
 
+int closed_solver_c(double *alpha0, double *theta0, double phi, double px_, double py_)
+{
+    // (sin(alpha), py, cos(alpha)cos(theta)) is a unit vector, px = r*sin(beta+phi) with r = sqrt(1-py^2), sin(alpha) = r*sin(beta)
+    double r = sqrt(1-py_*py_);
+    double asinp = asin(px_/r);
+    double beta = asinp-phi;
+    if(cos(beta) < 0)
+    {
+        beta = PI-asinp-phi;
+    }
+    *alpha0 = asin(r*sin(beta));
+    *theta0 = atan2(py_, r*cos(beta));
+    if(isnan(*alpha0) || isnan(*theta0))
+    {
+        *alpha0 = PI;
+        *theta0 = PI;
+        return 0;
+    }
+    return 1;
+}
+
+void horizontal_c(double *phi, double *theta, double px_, double py_)
+{
+    double sintheta;
+    *phi = asin(px_);
+    sintheta = py_/cos(*phi);
+    if(sintheta > 1)
+        sintheta = 1;
+    if(sintheta < -1)
+        sintheta = -1;
+    *theta = asin(sintheta);
+}
+
+long locate_c(const double *scale, long n, double value, double *frac)
+{
+    // index of the interval of the monotonic scale holding value and the fraction in it, -1 if value is out of the scale
+    long lo = 0, hi = n-1, mid;
+    int descending;
+    if(n < 2 || isnan(value))
+    {
+        return -1;
+    }
+    descending = scale[n-1] < scale[0];
+    if((descending ? (value > scale[0] || value < scale[n-1]) : (value < scale[0] || value > scale[n-1])))
+    {
+        return -1;
+    }
+    // first guess as if the scale were uniform, which it usually is, and bisection if it is wrong
+    mid = scale[n-1] == scale[0] ? 0 : (long)((value-scale[0])/(scale[n-1]-scale[0])*(n-1));
+    if(mid > n-2)
+        mid = n-2;
+    if(descending ? (scale[mid] >= value && value >= scale[mid+1]) : (scale[mid] <= value && value <= scale[mid+1]))
+    {
+        lo = mid;
+        hi = mid+1;
+    }
+    while(hi-lo > 1)
+    {
+        mid = (lo+hi)/2;
+        if(descending ? scale[mid] >= value : scale[mid] <= value)
+            lo = mid;
+        else
+            hi = mid;
+    }
+    *frac = (value-scale[lo])/(scale[hi]-scale[lo]);
+    return lo;
+}
+
 /*
 int main()
 {
@@ -123,4 +191,4 @@ int main()
     fclose(fp);
     system("pause");
     return 0;
-}*/
\ No newline at end of file
+}*/
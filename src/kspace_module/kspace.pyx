@@ -1,4 +1,6 @@
 cimport cython
+from cython.parallel cimport prange
+from libc.math cimport sqrt, NAN
 
 cdef extern from "ckspace.c":
     double px_c(double alpha, double theta, double phi)
@@ -10,6 +12,14 @@ cdef extern from "ckspace.c":
     double alpha_solver_c(double alpha0, double theta0, double phi, double px_, double py_)
     double theta_solver_c(double alpha0, double theta0, double phi, double px_, double py_)
     int solver_c(double *alpha0, double *theta0, double phi, double px_, double py_, double err, int maxstep) nogil
+    int closed_solver_c(double *alpha0, double *theta0, double phi, double px_, double py_) nogil
+    void horizontal_c(double *phi, double *theta, double px_, double py_) nogil
+    long locate_c(const double *scale, long n, double value, double *frac) nogil
+    double PI
+
+ctypedef fused real:
+    float
+    double
 
 ############ python functions #################
 
@@ -46,3 +56,91 @@ def solver(double[:] alphalist, double[:] thetalist, double phi, double[:] px_li
     with nogil:
         for i in range(I):
             step = solver_c(<double *> &alphalist[i], <double *> &thetalist[i], phi, px_list[i], py_list[i], err, maxstep)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline double interpolate(const real[:, :, :] data, Py_ssize_t k, const double[::1] xscale, const double[::1] yscale, double x, double y) noexcept nogil:
+    cdef double fx = 0, fy = 0
+    cdef long i = locate_c(&xscale[0], xscale.shape[0], x, &fx)
+    cdef long j = locate_c(&yscale[0], yscale.shape[0], y, &fy)
+    if i < 0 or j < 0:
+        return NAN
+    return (1-fx)*((1-fy)*data[i, j, k]+fy*data[i, j+1, k])+fx*((1-fy)*data[i+1, j, k]+fy*data[i+1, j+1, k])
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def convert(const real[:, :, :] data, const double[::1] xscale, const double[::1] yscale, const double[::1] energies, 
+            const double[:, ::1] kxgrid, const double[:, ::1] kygrid, double[:, :, :] out, int mode, double phi, double err, int maxstep, int threads):
+    '''
+    Convert the energy slices data[:, :, k] on the angle scales to out[:, :, k] on the kx, ky grids, in parallel over energies and k points.
+    mode is 0 for the horizontal slit, 1 for the closed-form and 2 for the Newton solver of the vertical slit with bias phi (radian).
+    Points out of the angle scales are NaN.
+    '''
+    cdef Py_ssize_t n, i, j, k
+    cdef Py_ssize_t ny = kxgrid.shape[1], nk = kxgrid.shape[0]*kxgrid.shape[1], nz = energies.shape[0]
+    cdef double kn, alpha, theta
+    cdef double alpha0 = (xscale[0]+xscale[xscale.shape[0]-1])*PI/360, theta0 = (yscale[0]+yscale[yscale.shape[0]-1])*PI/360
+    with nogil:
+        for n in prange(nz*nk, num_threads=threads, schedule='static'):
+            # the energy is the fastest index, as in the memory of data and out
+            i = n//(ny*nz)
+            j = n//nz%ny
+            k = n%nz
+            kn = 0.512*sqrt(energies[k])
+            if mode == 0:
+                # same order of operations as Kx2Angle_array and KxKy2Angle_array of Data
+                horizontal_c(&alpha, &theta, kxgrid[i, j]/0.512/sqrt(energies[k]), kygrid[i, j]/0.512/sqrt(energies[k]))
+            elif mode == 1:
+                closed_solver_c(&alpha, &theta, phi, kxgrid[i, j]/kn, kygrid[i, j]/kn)
+            else:
+                alpha = alpha0
+                theta = theta0
+                solver_c(&alpha, &theta, phi, kxgrid[i, j]/kn, kygrid[i, j]/kn, err, maxstep)
+            out[i, j, k] = interpolate(data, k, xscale, yscale, alpha*180/PI, theta*180/PI)
+
+cdef inline bint position(double value, const double[::1] scale, Py_ssize_t *i, double *f) noexcept nogil:
+    # interval i and fraction f of value on a uniform scale, False out of the scale as for interpn
+    cdef Py_ssize_t n = scale.shape[0]
+    cdef double first = scale[0], last = scale[n-1], p
+    if not (first <= value <= last or last <= value <= first):
+        return False
+    p = (value-first)/(last-first)*(n-1)
+    i[0] = min(max(<Py_ssize_t>p, 0), n-2)
+    f[0] = min(max(p-i[0], 0.0), 1.0)
+    return True
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def bilinear(const real[:, :] data, const double[::1] xscale, const double[::1] yscale, const double[:] x, const double[:] y, double[:] out, double fill, int threads=1):
+    '''
+    Sample data on the uniform scales at the points (x, y) into out, fill out of the scales.
+    Same result as interpn with the linear method, NaN of data included, for scales of at least 2 points.
+    '''
+    cdef Py_ssize_t n, i, j
+    cdef double fx, fy
+    with nogil:
+        for n in prange(x.shape[0], num_threads=threads, schedule='static'):
+            if position(x[n], xscale, &i, &fx) and position(y[n], yscale, &j, &fy):
+                out[n] = (1-fx)*((1-fy)*data[i, j]+fy*data[i, j+1])+fx*((1-fy)*data[i+1, j]+fy*data[i+1, j+1])
+            else:
+                out[n] = fill
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def trilinear(const real[:, :, :] data, const double[::1] xscale, const double[::1] yscale, const double[::1] zscale, const double[:] x, const double[:] y, const double[:] z, 
+              double[:] out, double fill, int threads=1):
+    '''
+    Three dimensional bilinear.
+    '''
+    cdef Py_ssize_t n, i, j, k
+    cdef double fx, fy, fz
+    with nogil:
+        for n in prange(x.shape[0], num_threads=threads, schedule='static'):
+            if position(x[n], xscale, &i, &fx) and position(y[n], yscale, &j, &fy) and position(z[n], zscale, &k, &fz):
+                out[n] = ((1-fx)*((1-fy)*((1-fz)*data[i, j, k]+fz*data[i, j, k+1])+fy*((1-fz)*data[i, j+1, k]+fz*data[i, j+1, k+1]))
+                          +fx*((1-fy)*((1-fz)*data[i+1, j, k]+fz*data[i+1, j, k+1])+fy*((1-fz)*data[i+1, j+1, k]+fz*data[i+1, j+1, k+1])))
+            else:
+                out[n] = fill
@@ -1,5 +1,9 @@
-from distutils.core import setup
+import sys
+from distutils.core import setup, Extension
 from Cython.Build import cythonize
 
+# OpenMP runs the prange loops of kspace.convert on several threads, without it they run on one
+openmp = {"win32":(["/openmp"], []), "darwin":([], [])}.get(sys.platform, (["-fopenmp"], ["-fopenmp"]))
+
 setup(name='kspace',
-      ext_modules=cythonize("kspace.pyx"))
+      ext_modules=cythonize(Extension("kspace", ["kspace.pyx"], extra_compile_args=openmp[0], extra_link_args=openmp[1])))
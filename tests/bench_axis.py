@@ -0,0 +1,33 @@
+'''
+Time of Axis.index against np.abs(scale-value).argmin(), run as python tests/bench_axis.py [lookups].
+'''
+
+import sys
+import time
+import numpy as np
+import conftest
+import Data
+
+
+def measure(func, values):
+    start = time.perf_counter()
+    result = [func(value) for value in values]
+    return time.perf_counter()-start, result
+
+
+def main(lookups):
+    rng = np.random.default_rng(0)
+    for length in (100, 1000, 100000):
+        uniform = np.linspace(-15, 15, length)
+        nonuniform = np.sort(rng.uniform(-15, 15, length))[::-1]
+        for name, scale in (("uniform", uniform), ("descending", nonuniform)):
+            axis = Data.Axis.fromScale(scale)
+            values = rng.uniform(-16, 16, lookups)
+            indextime, indices = measure(axis.index, values)
+            argmintime, expected = measure(lambda value: int(np.abs(scale-value).argmin()), values)
+            assert indices == expected
+            print("%-10s %7d points  Axis.index %8.2f us  argmin %8.2f us" % (name, length, indextime/lookups*1e6, argmintime/lookups*1e6))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
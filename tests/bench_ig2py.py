@@ -0,0 +1,90 @@
+'''
+Time and peak memory of reading an ig2py file, run as python tests/bench_ig2py.py [numbers].
+Ig2Py2Data is compared with the parser it replaced in b244072, which is kept here as the reference.
+'''
+
+import ast
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import conftest
+import Data
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter()-start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def baselineIg2Py2Data(filepath):
+    '''
+    Ig2Py2Data and Spectrum.setStrData before b244072: readlines, the data lines joined with +=, then np.fromstring and the raw copy.
+    '''
+    with open(filepath) as txtfile:
+        filestr = txtfile.readlines()
+        headeridx = filestr.index("[Header]\n")
+        ProStr = "{"
+        i = 1
+        while not len(filestr[headeridx+i].rstrip()) == 0:
+            ProStr += filestr[headeridx+i].rstrip()+","
+            i += 1
+        ProStr += "\"Location\":\""+filepath+"\","
+        ProStr += "}"
+        ScaleStr = ""
+        scaleidx = filestr.index("[Scale]\n")
+        i = 1
+        while not len(filestr[scaleidx+i].rstrip()) == 0:
+            ScaleStr += filestr[scaleidx+i]
+            i += 1
+        dataidx = filestr.index("[Data]\n")
+        DataStr = ""
+        for line in filestr[dataidx+1:]:
+            DataStr += line
+    data = np.fromstring(DataStr, sep="\t")
+    data.shape = ast.literal_eval(ast.literal_eval(ProStr)["Dimension"])
+    rawdata = np.copy(data)   # kept by the Spectrum next to data
+    return data
+
+
+def readIg2Py(filepath):
+    return Data.Ig2Py2Data(filepath).data
+
+
+def writeFile(filepath, count):
+    columns = 1000
+    rows = max(count//columns, 1)
+    data = np.random.default_rng(0).random((rows, columns))
+    with open(filepath, "w") as txtfile:
+        txtfile.write("#Igor to Python\n[Header]\n\"Dimension\":\"(%d, %d)\"\n\"XMin\":\"0\"\n\"XStep\":\"1\"\n\"YMin\":\"0\"\n\"YStep\":\"1\"\n\n[Scale]\n" % (rows, columns))
+        txtfile.write("\t".join("%d" % v for v in range(rows))+"\t\n"+"\t".join("%d" % v for v in range(columns))+"\t\n\n[Data]\n")
+        for row in data:   # one line per row, as Igor writes them
+            txtfile.write("\t".join("%.6g" % v for v in row)+"\t\n")
+        txtfile.write("\n")
+
+
+def main(count):
+    fd, filepath = tempfile.mkstemp(suffix=".ig2py")
+    os.close(fd)
+    writeFile(filepath, count)
+    try:
+        print("%d numbers, %.1f MB of text" % (count, os.path.getsize(filepath)/2**20))
+        results = []
+        for name, func in [("Ig2Py2Data", lambda: readIg2Py(filepath)), ("before b244072", lambda: baselineIg2Py2Data(filepath))]:
+            elapsed, peak, result = measure(func)
+            results.append(result)
+            print("%-18s %8.3f s %10.1f MB" % (name, elapsed, peak/2**20))
+        np.testing.assert_array_equal(results[0], results[1])
+    finally:
+        os.remove(filepath)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4000000)
@@ -0,0 +1,63 @@
+'''
+Time of importing ig2py files with the text parsing in worker threads or in worker processes, run as python tests/bench_import.py [files] [numbers].
+The speedup of the processes is bounded by the number of cores, it is none on a single core.
+'''
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import conftest
+import dataimporter
+from datacache import DecodeCache
+
+
+class Signal():
+    def __init__(self):
+        self.received = []
+
+    def emit(self, *args):
+        self.received.append(args)
+
+
+class Signals():
+    def __init__(self):
+        self.loaded, self.progress, self.error, self.finished = Signal(), Signal(), Signal(), Signal()
+
+
+def writeFile(filepath, rows, columns):
+    data = np.random.default_rng(0).random((rows, columns))
+    with open(filepath, "w") as txtfile:
+        txtfile.write("#Igor to Python\n[Header]\n\"Dimension\":\"(%d, %d)\"\n\"XMin\":\"0\"\n\"XStep\":\"1\"\n\"YMin\":\"0\"\n\"YStep\":\"1\"\n\n[Scale]\n" % (rows, columns))
+        txtfile.write("\t".join("%d" % v for v in range(rows))+"\t\n"+"\t".join("%d" % v for v in range(columns))+"\t\n\n[Data]\n")
+        txtfile.write("\t".join("%.6g" % v for v in data.ravel())+"\t\n\n")
+
+
+def importFiles(filelist, directory, formats):
+    dataimporter.decodeCache = DecodeCache(tempfile.mkdtemp(dir=directory))   # every run misses the cache
+    dataimporter.PROCESS_FORMATS = formats
+    s = Signals()
+    thread = dataimporter.ImportThread(filelist, os.cpu_count(), s)
+    start = time.perf_counter()
+    thread.start()
+    thread.join()
+    assert len(s.loaded.received) == len(filelist) and not s.error.received
+    return time.perf_counter()-start
+
+
+def main(files, count):
+    columns = 1000
+    with tempfile.TemporaryDirectory() as directory:
+        filelist = [os.path.join(directory, "%d.ig2py" % i) for i in range(files)]
+        for filepath in filelist:
+            writeFile(filepath, max(count//columns, 1), columns)
+        print("%d files of %d numbers, %d cores" % (files, count, os.cpu_count()))
+        threadtime = importFiles(filelist, directory, ())
+        processtime = importFiles(filelist, directory, (".ig2py", ".pxt"))
+        print("threads   %7.3f s" % threadtime)
+        print("processes %7.3f s  %5.1fx" % (processtime, threadtime/processtime))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8, int(sys.argv[2]) if len(sys.argv) > 2 else 2*10**6)
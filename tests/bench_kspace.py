@@ -0,0 +1,77 @@
+'''
+Time of kspace.bilinear and kspace.trilinear against interpn, run as python tests/bench_kspace.py [case ...] [--threads n].
+The cases are bilinear-1k (1k^2 grid, 1M points), bilinear-4k (4k^2 grid, 16M points) and trilinear-1k (1k^3 float32 cube
+mapped from a scratch file, 4M points), all of them by default.
+The compiled kspace has to be built and importable, the NumPy fallback has no kernels.
+'''
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import scipy.interpolate as ip
+import conftest
+import Data
+
+POINTS_3D = 4*1024**2   # points sampled in the 1k^3 cube, interpn needs several times their size in memory
+
+
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter()-start, result
+
+
+def report(name, points, kernel, reference):
+    kerneltime, out = measure(kernel)
+    referencetime, expected = measure(reference)
+    np.testing.assert_allclose(out, expected, rtol=0, atol=1e-6)
+    print("%-13s %9d points  kernel %7.3f s  interpn %7.3f s  %5.1fx" % (name, points, kerneltime, referencetime, referencetime/kerneltime))
+
+
+def bilinear(size, threads):
+    rng = np.random.default_rng(0)
+    scale = np.linspace(-15, 15, size)
+    points = size*size
+    data = rng.random((size, size))
+    x, y = rng.uniform(-16, 16, points), rng.uniform(-16, 16, points)
+    out = np.empty(points)
+    report("bilinear-%dk" % (size//1000), points, lambda: Data.kspace.bilinear(data, scale, scale, x, y, out, np.nan, threads) or out,
+    lambda: ip.interpn((scale, scale), data, np.column_stack((x, y)), bounds_error=False, fill_value=np.nan))
+
+
+def trilinear(size, threads):
+    rng = np.random.default_rng(0)
+    scale, zscale = np.linspace(-15, 15, size), np.linspace(16, 17, size)
+    with tempfile.TemporaryDirectory() as directory:
+        cube = np.memmap(os.path.join(directory, "cube.bin"), dtype=np.float32, mode='w+', shape=(size, size, size))
+        for i in range(size):
+            cube[i] = rng.random((size, size), dtype=np.float32)
+        cube.flush()
+        x, y, z = rng.uniform(-16, 16, POINTS_3D), rng.uniform(-16, 16, POINTS_3D), rng.uniform(16, 17, POINTS_3D)
+        out = np.empty(POINTS_3D)
+        report("trilinear-%dk" % (size//1000), POINTS_3D, lambda: Data.kspace.trilinear(cube, scale, scale, zscale, x, y, z, out, np.nan, threads) or out,
+        lambda: ip.interpn((scale, scale, zscale), cube, np.column_stack((x, y, z)), bounds_error=False, fill_value=np.nan))
+        del cube
+
+
+CASES = {"bilinear-1k":lambda threads: bilinear(1000, threads), "bilinear-4k":lambda threads: bilinear(4000, threads),
+         "trilinear-1k":lambda threads: trilinear(1000, threads)}
+
+
+def main(args):
+    if not hasattr(Data.kspace, "bilinear"):
+        print("kspace (%s) has no bilinear/trilinear kernels, build src/kspace_module first" % Data.KSPACE_BACKEND)
+        return
+    threads = 1
+    if "--threads" in args:
+        i = args.index("--threads")
+        threads = int(args[i+1])
+        args = args[:i]+args[i+2:]
+    for name in args or list(CASES):
+        CASES[name](threads)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
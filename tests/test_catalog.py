@@ -0,0 +1,78 @@
+'''
+Indexing folders into the scan catalog.
+'''
+
+import time
+import catalog
+
+
+class Signal():
+    def __init__(self):
+        self.calls = []
+
+    def emit(self, *args):
+        self.calls.append(args)
+
+
+class Signals():
+    def __init__(self):
+        self.finished = Signal()
+        self.failed = Signal()
+
+
+def test_index_thread_finishes_on_error(tmp_path, monkeypatch):
+    def fail(self, folder, cancel=None):
+        raise OSError("disk error")
+    monkeypatch.setattr(catalog.Catalog, "indexFolder", fail)
+    s = Signals()
+    thread = catalog.IndexThread(str(tmp_path), str(tmp_path/"catalog.db"), s)
+    thread.start()
+    thread.join(10)
+    assert s.failed.calls == [("disk error",)]
+    assert s.finished.calls == [(0, 0)]
+
+
+def test_index_thread_finishes(tmp_path):
+    s = Signals()
+    thread = catalog.IndexThread(str(tmp_path), str(tmp_path/"catalog.db"), s)
+    thread.start()
+    thread.join(10)
+    assert s.failed.calls == []
+    assert s.finished.calls == [(0, 0)]
+
+
+def fillCatalog(db, files, scans):
+    '''
+    Rows as indexFolder writes them, scans per file with a few note keys each.
+    '''
+    with db:
+        db.executemany("INSERT INTO files (id, path, size, mtime, fingerprint) VALUES (?,?,?,?,?)",
+        [(i, "/data/beamtime_%03d/sample_%d/scan_%05d.pxt" % (i//500, i%7, i), 1000, 0, "") for i in range(files)])
+        db.executemany("INSERT INTO scans (id, file, name, dims, dimension, spacemode, energyAxis, note) VALUES (?,?,?,?,?,?,?,?)",
+        [(i, i//scans, "scan_%05d_%d" % (i//scans, i%scans), 3, "(300, 200, 100)", "Angular", "Z",
+        "hv=%d\rT=%d\rPolarization=LH\r" % (20+i%100, 10+i%50)) for i in range(files*scans)])
+        db.executemany("INSERT INTO notes (scan, key, value) VALUES (?,?,?)",
+        [(i, key, value) for i in range(files*scans) for key, value in (("hv", str(20+i%100)), ("T", str(10+i%50)), ("Polarization", "LH"))])
+
+
+def test_search_escapes_wildcards(tmp_path):
+    cat = catalog.Catalog(str(tmp_path/"catalog.db"))
+    with cat.db:
+        cat.db.executemany("INSERT INTO files (id, path) VALUES (?,?)", [(1, "/data/a_1.pxt"), (2, "/data/ab1.pxt"), (3, "/data/100%.pxt")])
+        cat.db.executemany("INSERT INTO scans (file, name, note) VALUES (?,?,?)", [(1, "a_1", ""), (2, "ab1", ""), (3, "100%", "")])
+    assert [row[1] for row in cat.search("a_1")] == ["a_1"]
+    assert [row[1] for row in cat.search("0%")] == ["100%"]
+    assert cat.search("\\") == []
+    cat.close()
+
+
+def test_search_time(tmp_path):
+    cat = catalog.Catalog(str(tmp_path/"catalog.db"))
+    fillCatalog(cat.db, 20000, 5)   # 100k scans, several beamtimes of files
+    start = time.perf_counter()
+    rows = cat.search("scan_1999", notes={"Polarization":"LH"})
+    nomatch = cat.search("no such scan")
+    elapsed = time.perf_counter()-start
+    assert len(rows) == 50 and nomatch == []
+    assert elapsed < 1.0   # a full scan of the text columns, fast enough for searching as one types
+    cat.close()
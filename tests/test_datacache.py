@@ -0,0 +1,49 @@
+'''
+Storing and loading decoded files in the decode cache.
+'''
+
+import threading
+import numpy as np
+import Data
+import datacache
+from datacache import DecodeCache
+
+
+def makeFile(directory, name):
+    filepath = directory/name
+    filepath.write_text(name)
+    return str(filepath)
+
+
+def test_store_and_load(tmp_path):
+    cache = DecodeCache(str(tmp_path/"cache"))
+    filepath = makeFile(tmp_path, "a.ig2py")
+    data = np.arange(12, dtype=np.float64).reshape(3, 4)
+    cache.store(filepath, [Data.Spectrum("a", data=data, xscale=np.arange(3), yscale=np.arange(4))])
+    datalist = cache.load(filepath)
+    np.testing.assert_array_equal(datalist[0].data, data)
+    np.testing.assert_array_equal(datalist[0].yscale, np.arange(4))
+    assert not [name for name in (tmp_path/"cache").iterdir() if name.name.endswith(".tmp")]
+
+
+def test_load_is_not_blocked_by_store(tmp_path, monkeypatch):
+    cache = DecodeCache(str(tmp_path/"cache"))
+    cached, stored = makeFile(tmp_path, "a.ig2py"), makeFile(tmp_path, "b.ig2py")
+    cache.store(cached, [Data.Spectrum("a", data=np.zeros((2, 2)))])
+    saving, release = threading.Event(), threading.Event()
+    save = np.save
+    def slowSave(*args):
+        saving.set()
+        release.wait(5)
+        save(*args)
+    monkeypatch.setattr(datacache.np, "save", slowSave)
+    thread = threading.Thread(target=cache.store, args=(stored, [Data.Spectrum("b", data=np.ones((2, 2)))]))
+    thread.start()
+    try:
+        assert saving.wait(5)
+        assert cache.load(cached) is not None   # returns while the other entry is still being written
+        assert cache.load(stored) is None
+    finally:
+        release.set()
+        thread.join()
+    np.testing.assert_array_equal(cache.load(stored)[0].data, np.ones((2, 2)))
@@ -0,0 +1,154 @@
+'''
+Exporting a lazily loaded dataset back to the file it is mapped from.
+'''
+
+import os
+import threading
+import tracemalloc
+import numpy as np
+import pytest
+import Data
+from IgorIO import IgorPackedFile2Data, Data2IgorPackedFile
+import HDF5IO
+
+
+def makeSpectrum(shape=(40, 30, 20)):
+    data = np.random.default_rng(0).random(shape).astype(np.float32)
+    return Data.Spectrum("s", data=data, xscale=np.linspace(-10, 10, shape[0]), yscale=np.linspace(-5, 5, shape[1]), 
+    zscale=np.linspace(16, 17, shape[2]), spacemode="Angular", energyAxis="Z")
+
+
+def test_arpy_reexport_to_source(tmp_path):
+    filepath = str(tmp_path/"a.arpy")
+    spec = makeSpectrum()
+    Data.Data2ArPy(spec, filepath)
+    size = os.path.getsize(filepath)
+    lazy = Data.ArPy2Data(filepath, lazy=True)
+    assert Data.isMapped(lazy.data)
+    Data.Data2ArPy(lazy, filepath)
+    assert os.path.getsize(filepath) == size
+    np.testing.assert_array_equal(Data.ArPy2Data(filepath).data, spec.data)
+    np.testing.assert_array_equal(np.asarray(lazy.data), spec.data)   # the old mapping is still readable
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".tmp")] == []
+
+
+def test_chunked_arpy_reexport_to_source(tmp_path):
+    filepath = str(tmp_path/"a.arpy")
+    spec = makeSpectrum()
+    Data.Data2ArPy(spec, filepath)
+    lazy = Data.ArPy2Data(filepath, lazy=True)
+    Data.Data2ChunkedArPy(lazy, filepath)
+    np.testing.assert_array_equal(Data.ArPy2Data(filepath).data, spec.data)
+
+
+def test_chunked_arpy_export_peak_memory(tmp_path):
+    data = mappedCube(str(tmp_path/"cube.bin"), (128, 128, 384))   # 48 MB, 48 chunks of 512 kB as float32
+    spec = Data.Spectrum("s", data=data, xscale=np.arange(128.), yscale=np.arange(128.), zscale=np.arange(384.))
+    filepath = str(tmp_path/"a.arpy")
+    peak = tracedPeak(Data.Data2ChunkedArPy, spec, filepath, (64, 64, 32), "none", 1, 2)
+    assert peak < 8*512*1024   # the four chunks in flight and the one being written
+    np.testing.assert_array_equal(Data.ArPy2Data(filepath).data, data)
+
+
+def test_chunked_arpy_out_of_core_import(tmp_path, monkeypatch):
+    monkeypatch.setattr(Data, "SCRATCH_DIR", str(tmp_path))
+    filepath = str(tmp_path/"a.arpy")
+    spec = makeSpectrum()
+    Data.Data2ChunkedArPy(spec, filepath, (16, 16, 8))
+    monkeypatch.setattr(Data, "MEMORY_BUDGET", spec.data.nbytes//2)
+    data = Data.ArPy2Data(filepath).data
+    assert Data.isMapped(data)
+    np.testing.assert_array_equal(data, spec.data)
+
+
+def test_pxt_reexport_to_source(tmp_path):
+    filepath = str(tmp_path/"a.pxt")
+    spec = makeSpectrum()
+    Data2IgorPackedFile([spec], filepath)
+    lazy = IgorPackedFile2Data(filepath, True, lazy=True)[0]
+    assert Data.isMapped(lazy.data)
+    Data2IgorPackedFile([lazy], filepath)
+    np.testing.assert_array_equal(IgorPackedFile2Data(filepath, True)[0].data, spec.data)
+
+
+def test_hdf5_reexport_to_source(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    filepath = str(tmp_path/"a.h5")
+    spec = makeSpectrum()
+    with h5py.File(filepath, "w") as h5file:
+        group = h5file.create_group("entry/s")
+        group.attrs["signal"] = "data"
+        group.create_dataset("data", data=spec.data)   # contiguous, so it is memory-mapped when lazy
+    lazy = HDF5IO.HDF5File2Data(filepath, lazy=True)[0]
+    assert Data.isMapped(lazy.data)
+    HDF5IO.Data2HDF5File([lazy], filepath)
+    np.testing.assert_array_equal(HDF5IO.HDF5File2Data(filepath)[0].data, spec.data)
+
+
+def test_failed_export_keeps_target(tmp_path):
+    filepath = str(tmp_path/"a.arpy")
+    spec = makeSpectrum()
+    Data.Data2ArPy(spec, filepath)
+    before = open(filepath, "rb").read()
+    broken = makeSpectrum()
+    broken.data = None
+    with pytest.raises(Exception):
+        Data.Data2ArPy(broken, filepath)
+    assert open(filepath, "rb").read() == before
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".tmp")] == []
+
+
+def test_unreplaceable_target_is_reported(tmp_path, monkeypatch):
+    filepath = str(tmp_path/"a.arpy")
+    spec = makeSpectrum()
+    Data.Data2ArPy(spec, filepath)
+    before = open(filepath, "rb").read()
+    def replace(src, dst):
+        raise PermissionError(13, "Permission denied")   # as for a mapped file on Windows
+    monkeypatch.setattr(os, "replace", replace)
+    errors = []
+    def export():
+        try:
+            Data.Data2ArPy(makeSpectrum((5, 6, 7)), filepath)
+        except Data.DataFileError as err:   # showError outside the GUI thread
+            errors.append(str(err))
+    thread = threading.Thread(target=export)
+    thread.start()
+    thread.join()
+    assert errors == ["Cannot replace a.arpy: Permission denied."]
+    assert open(filepath, "rb").read() == before
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".tmp")] == []
+
+
+def mappedCube(filepath, shape):
+    data = np.memmap(filepath, dtype=np.float64, mode='w+', shape=shape)
+    data[...] = np.arange(shape[-1])
+    data.flush()
+    return np.memmap(filepath, dtype=np.float64, mode='r', shape=shape)
+
+
+def tracedPeak(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_write_slabs_peak_memory(tmp_path):
+    data = mappedCube(str(tmp_path/"cube.bin"), (64, 64, 512))   # 16 MB, 8 MB as float32
+    slabsize = 1024**2
+    with open(str(tmp_path/"out.bin"), "wb") as binfile:
+        peak = tracedPeak(Data.writeSlabs, binfile, data, np.float32, slabsize)
+    assert peak < 3*slabsize
+    np.testing.assert_array_equal(np.fromfile(str(tmp_path/"out.bin"), dtype=np.float32).reshape(data.shape, order='F'), data)
+
+
+def test_arpy_export_peak_memory(tmp_path):
+    data = mappedCube(str(tmp_path/"cube.bin"), (128, 128, 384))   # 48 MB, three slabs as float32
+    spec = Data.Spectrum("s", data=data, xscale=np.arange(128.), yscale=np.arange(128.), zscale=np.arange(384.), 
+    spacemode="Angular", energyAxis="Z")
+    peak = tracedPeak(Data.Data2ArPy, spec, str(tmp_path/"a.arpy"))
+    assert peak < 2*Data.SLAB_SIZE
+    np.testing.assert_array_equal(Data.ArPy2Data(str(tmp_path/"a.arpy")).data, data)
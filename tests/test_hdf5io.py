@@ -0,0 +1,58 @@
+'''
+Lazy reading of HDF5 datasets.
+'''
+
+import numpy as np
+import pytest
+import Data
+import HDF5IO
+
+h5py = pytest.importorskip("h5py")
+
+
+def writeDataset(filepath, data, **kwargs):
+    with h5py.File(filepath, "w") as h5file:
+        group = h5file.create_group("entry/s")
+        group.attrs["signal"] = "data"
+        group.create_dataset("data", data=data, **kwargs)
+
+
+def test_lazy_chunked_gzip(tmp_path):
+    filepath = str(tmp_path/"a.h5")
+    data = np.random.default_rng(0).random((50, 30, 20)).astype(np.float32)
+    writeDataset(filepath, data, chunks=(7, 10, 20), compression="gzip")
+    spec = HDF5IO.HDF5File2Data(filepath, lazy=True)[0]
+    assert isinstance(spec.data, HDF5IO.HDF5Array)
+    assert spec.dimension == data.shape and spec.data.dtype == data.dtype
+    dataset = spec.data.dataset
+    for key in [np.s_[:, :, 3], np.s_[4, :, :], np.s_[2:9, 5, :], np.s_[::-2, 1:-1, 7], np.s_[..., -1], np.s_[40:80], np.s_[5:5]]:
+        np.testing.assert_array_equal(spec.data[key], data[key])
+    assert spec.data.dataset is dataset and dataset.id.valid   # one handle, and its chunk cache, for every slice
+    np.testing.assert_array_equal(np.asarray(spec.data), data)
+    np.testing.assert_array_equal(spec.data[data > 0.5], data[data > 0.5])
+    np.testing.assert_array_equal(HDF5IO.HDF5File2Data(filepath)[0].data, data)
+
+
+def test_lazy_chunked_operation(tmp_path):
+    filepath = str(tmp_path/"a.h5")
+    data = np.random.default_rng(1).random((10, 8, 6))
+    writeDataset(filepath, data, chunks=(5, 4, 3), compression="gzip")
+    spec = HDF5IO.HDF5File2Data(filepath, lazy=True)[0]
+    fingerprint = spec.fingerprint()
+    Data.mirror3D(spec, 'X')
+    assert isinstance(spec.data, np.ndarray) and isinstance(spec.rawdata, HDF5IO.HDF5Array)
+    np.testing.assert_array_equal(spec.data, data[::-1])
+    spec.undo()
+    np.testing.assert_array_equal(np.asarray(spec.data), data)
+    assert spec.fingerprint() == fingerprint
+    HDF5IO.Data2HDF5File([spec], filepath)   # exported over the file it reads
+    np.testing.assert_array_equal(HDF5IO.HDF5File2Data(filepath)[0].data, data)
+
+
+def test_lazy_contiguous(tmp_path):
+    filepath = str(tmp_path/"a.h5")
+    data = np.arange(24, dtype=np.float64).reshape(4, 6)
+    writeDataset(filepath, data)
+    spec = HDF5IO.HDF5File2Data(filepath, lazy=True)[0]
+    assert isinstance(spec.data, np.memmap)
+    np.testing.assert_array_equal(spec.data, data)
@@ -0,0 +1,54 @@
+'''
+Parsing the numbers of ig2py files chunk by chunk.
+'''
+
+import io
+import numpy as np
+import pytest
+import Data
+
+
+TEXTS = ["1 2.5\t-3\n4e-1  5\n", "1\t2\t3\t", "  1\n\n\n2\t\t 3   \n\n", "10\t-20.25\t3e+2", "\n\t \n"]
+
+
+def expected(text):
+    return np.array(text.split(), dtype=np.float64)
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 3, 4, 5, 7, 1 << 22])
+@pytest.mark.parametrize("text", TEXTS)
+def test_read_numbers_chunk_boundaries(text, chunksize):
+    np.testing.assert_array_equal(Data.readNumbers(io.StringIO(text), chunksize=chunksize), expected(text))
+    count = len(expected(text))
+    np.testing.assert_array_equal(Data.readNumbers(io.StringIO(text), count, chunksize=chunksize), expected(text))
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 3, 1 << 22])
+def test_read_numbers_count_mismatch(chunksize):
+    text = "1\t2\t3\t\n\n"
+    assert Data.readNumbers(io.StringIO(text), 2, chunksize=chunksize) is None
+    assert Data.readNumbers(io.StringIO(text), 4, chunksize=chunksize) is None
+    assert Data.readNumbers(io.StringIO("1\tx\t3\n"), 3, chunksize=chunksize) is None
+
+
+def test_ig2py_file(tmp_path):
+    data = np.arange(12, dtype=np.float64).reshape(3, 4)/8
+    filepath = tmp_path/"a.ig2py"
+    with open(filepath, "w") as txtfile:
+        txtfile.write("#Igor to Python\n[Header]\n")
+        txtfile.write("\"Dimension\":\"(3, 4)\"\n\"XMin\":\"-1\"\n\"XStep\":\"1\"\n\"YMin\":\"0\"\n\"YStep\":\"0.5\"\n\n")
+        txtfile.write("[Scale]\n-1\t0\t1\t\n0\t0.5\t1\t1.5\t\n\n[Data]\n")
+        txtfile.write("\t".join("%g" % v for v in data.ravel())+"\t\n\n")
+    spec = Data.Ig2Py2Data(str(filepath))
+    np.testing.assert_array_equal(spec.data, data)
+    np.testing.assert_array_equal(spec.xscale, [-1, 0, 1])
+
+
+def test_str_scale_and_data():
+    spec = Data.Spectrum("s", data=np.zeros((2, 3)))
+    spec.setStrScale("0\t1\t\n0\t0.5\t1\t\n")
+    np.testing.assert_array_equal(spec.xscale, [0, 1])
+    np.testing.assert_array_equal(spec.yscale, [0, 0.5, 1])
+    spec.propertydict["Dimension"] = "(2, 3)"
+    spec.setStrData("1\t2\t3\t4\t5\t6\t")
+    np.testing.assert_array_equal(spec.data, [[1, 2, 3], [4, 5, 6]])
@@ -0,0 +1,37 @@
+'''
+Recording operations in the journal of a Spectrum.
+'''
+
+import numpy as np
+import Data
+
+
+def makeSpectrum():
+    data = np.random.default_rng(0).random((30, 40))
+    return Data.Spectrum("s", data=data, xscale=np.linspace(-10, 10, 30), yscale=np.linspace(16, 17, 40), 
+    spacemode="Angular", energyAxis="Y")
+
+
+def test_failed_operation_is_not_recorded(monkeypatch):
+    spec = makeSpectrum()
+    version = spec.version
+    monkeypatch.setattr(Data, "kspaceArray", lambda *args: None)   # some k out of reach
+    assert Data.Tokspace2D(spec, 'Y') == -1
+    assert spec.journal.position == 0 and spec.journal.entries == []
+    assert spec.version == version and spec.rawdataflag
+    assert spec.spacemode == "Angular"
+
+
+def test_checkpoints_bounded_by_bytes(monkeypatch):
+    spec = makeSpectrum()
+    monkeypatch.setattr(Data, "JOURNAL_CHECKPOINT_INTERVAL", 1)
+    monkeypatch.setattr(Data, "JOURNAL_CHECKPOINT_BYTES", 2.5*spec.data.nbytes)
+    expected = [spec.data]
+    for i in range(10):
+        Data.mirror2D(spec, 'X' if i % 3 else 'Y')
+        expected.append(np.array(spec.data))
+    assert len(spec.journal.checkpoints) == 2
+    assert sum(Data.stateBytes(state) for state in spec.journal.checkpoints.values()) <= Data.JOURNAL_CHECKPOINT_BYTES
+    for position in (7, 3, 0, 10):
+        spec.goto(position)
+        np.testing.assert_array_equal(spec.data, expected[position])
@@ -0,0 +1,56 @@
+'''
+The sampling kernels of the compiled kspace against interpn.
+'''
+
+import types
+import numpy as np
+import pytest
+import scipy.interpolate as ip
+import Data
+
+pytestmark = pytest.mark.skipif(not hasattr(Data.kspace, "bilinear"), reason="the compiled kspace is not built")
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("descending", [False, True])
+def test_bilinear(dtype, descending):
+    rng = np.random.default_rng(0)
+    xscale, yscale = np.linspace(-15, 15, 41), np.linspace(-5, 5, 23)
+    if descending:
+        xscale = xscale[::-1].copy()
+    data = rng.random((41, 23)).astype(dtype)
+    data[10, 5] = np.nan
+    x = np.concatenate((rng.uniform(-16, 16, 5000), xscale, [xscale[0], xscale[-1]]))
+    y = np.concatenate((rng.uniform(-6, 6, 5000), yscale[rng.integers(0, 23, 41)], [yscale[0], yscale[-1]]))
+    out = np.empty(len(x))
+    Data.kspace.bilinear(data, xscale, yscale, x, y, out, np.nan, 1)
+    expected = ip.interpn((xscale, yscale), data, np.column_stack((x, y)), bounds_error=False, fill_value=np.nan)
+    np.testing.assert_allclose(out, expected, rtol=0, atol=1e-6 if dtype == np.float32 else 1e-12)
+
+
+def test_trilinear():
+    rng = np.random.default_rng(1)
+    scales = np.linspace(-15, 15, 31), np.linspace(-5, 5, 17), np.linspace(16, 17, 9)
+    data = rng.random((31, 17, 9))
+    x, y, z = rng.uniform(-16, 16, 5000), rng.uniform(-6, 6, 5000), rng.uniform(15.9, 17.1, 5000)
+    out = np.empty(5000)
+    Data.kspace.trilinear(data, *scales, x, y, z, out, np.nan, 1)
+    expected = ip.interpn(scales, data, np.column_stack((x, y, z)), bounds_error=False, fill_value=np.nan)
+    np.testing.assert_allclose(out, expected, rtol=0, atol=1e-12)
+
+
+def test_k_space_cuts_use_bilinear(monkeypatch):
+    rng = np.random.default_rng(2)
+    xscale, yscale = np.linspace(-15, 15, 61), np.linspace(-10, 10, 41)
+    data = rng.random((61, 41))
+    kxgrid, kygrid = np.meshgrid(np.linspace(-0.6, 0.6, 50), np.linspace(-0.4, 0.4, 30), indexing='ij')
+    args = [data, 20.0, kxgrid, kygrid, xscale, yscale]
+    calls = []
+    kernel = Data.kspace.bilinear
+    monkeypatch.setattr(Data, "kspace", types.SimpleNamespace(bilinear=lambda *a: calls.append(a) or kernel(*a)))
+    cut, cut_v = Data.interpzcut(args), Data.interpzcut_v(args+[10, 50, 1e-8, "closed"])
+    assert len(calls) == 2
+    monkeypatch.setattr(Data, "kspace", types.SimpleNamespace())   # interpn
+    np.testing.assert_allclose(cut, Data.interpzcut(args), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(cut_v, Data.interpzcut_v(args+[10, 50, 1e-8, "closed"]), rtol=0, atol=1e-12)
+    assert np.isfinite(cut).any() and np.isfinite(cut_v).any()
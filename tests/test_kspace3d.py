@@ -0,0 +1,30 @@
+'''
+Choosing how ThetaKspace3D converts a cube.
+'''
+
+import sys
+import multiprocessing
+import numpy as np
+import Data
+import kspacenumpy
+
+
+def test_slices_without_shared_memory(monkeypatch):
+    monkeypatch.setattr(Data, "kspace", kspacenumpy)   # no kspace.convert, so the process pool is used
+    monkeypatch.setitem(sys.modules, "multiprocessing.shared_memory", None)   # import fails as before Python 3.8
+    monkeypatch.delattr(multiprocessing, "shared_memory", raising=False)
+    monkeypatch.setattr(Data.ThetaKspace3D, "convertSlices", lambda self, kxgrid, kygrid, bias: "slices")
+    spec = Data.Spectrum("s", data=np.zeros((3, 4, 5)))
+    conversion = Data.ThetaKspace3D(spec, 'H', 0, None, 1, 0, 1e-6, 0, None)
+    assert conversion.convert(np.zeros((2, 2)), np.zeros((2, 2)), None) == "slices"
+
+
+def test_shared_result_is_memory():
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(create=True, size=8*12)
+    shm.unlink()
+    result = Data.sharedResult(shm, (3, 4))
+    result[...] = 1
+    assert not Data.isMapped(result) and not Data.isMapped(result[1:])
+    del result
+    assert shm.buf is None   # closed with the array
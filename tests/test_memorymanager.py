@@ -0,0 +1,62 @@
+'''
+Spilling datasets of the workspace to scratch files.
+'''
+
+import numpy as np
+import Data
+from memorymanager import MemoryManager
+
+
+def makeSpectrum(name):
+    return Data.Spectrum(name, data=np.random.default_rng(0).random((100, 100)))   # 80 kB
+
+
+def test_displayed_dataset_is_not_spilled(tmp_path, monkeypatch):
+    monkeypatch.setattr(Data, "SCRATCH_DIR", str(tmp_path))
+    manager = MemoryManager(budget=200*1024)
+    shown, older = makeSpectrum("shown"), makeSpectrum("older")
+    manager.add(older)
+    manager.add(shown)
+    manager.touch(shown)
+    manager.add(makeSpectrum("new"))   # the newest dataset is not the one on screen
+    manager.add(makeSpectrum("newer"))
+    assert manager.resident() <= manager.budget
+    assert not Data.isMapped(shown.data)
+    assert Data.isMapped(older.data)
+    manager.touch(None)
+    manager.add(makeSpectrum("last"))
+    assert Data.isMapped(shown.data)
+
+
+def test_shared_buffer_is_spilled_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(Data, "SCRATCH_DIR", str(tmp_path))
+    manager = MemoryManager(budget=200*1024)
+    spec = makeSpectrum("spec")
+    duplicate = spec.copy()
+    manager.add(spec)
+    manager.add(duplicate)
+    assert manager.resident() == spec.data.nbytes
+    manager.add(makeSpectrum("new"))
+    manager.add(makeSpectrum("newer"))
+    assert manager.evictions == 1
+    assert Data.isMapped(spec.data) and Data.isMapped(duplicate.data)
+    assert np.shares_memory(spec.data, duplicate.data)
+    assert not spec.data.flags.writeable and not duplicate.data.flags.writeable   # still copy-on-write
+    assert manager.stats()["spilled"] == spec.data.nbytes
+
+
+def test_referenced_buffer_stays_resident(tmp_path, monkeypatch):
+    monkeypatch.setattr(Data, "SCRATCH_DIR", str(tmp_path))
+    manager = MemoryManager(budget=200*1024)
+    spec = makeSpectrum("spec")
+    held = spec.data   # e.g. kept by a viewer
+    new = makeSpectrum("new")
+    manager.add(spec)
+    manager.add(new)
+    manager.add(makeSpectrum("newer"))
+    assert Data.isMapped(spec.data)
+    assert Data.isMapped(new.data)   # spilling spec did not free anything
+    assert manager.evictions == 1
+    assert manager.resident() == 2*held.nbytes
+    del held
+    assert manager.resident() == new.data.nbytes
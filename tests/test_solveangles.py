@@ -0,0 +1,113 @@
+'''
+Accuracy of the closed-form vertical-slit inverse solveAngles against the forward map and the iterative kspace.solver.
+'''
+
+import numpy as np
+import pytest
+from math import pi
+import Data
+
+BIASES = [0, 10, 30, -45]   # phi in degrees
+
+
+def forward(alpha, theta, phi):
+    return np.sin(alpha)*np.cos(phi)+np.cos(alpha)*np.sin(phi)*np.cos(theta), np.cos(alpha)*np.sin(theta)
+
+
+def towardsAnalyzer(alpha, theta, phi):
+    '''
+    Component of the emission direction along the analyzer axis, the physical region is where it is not negative.
+    '''
+    return np.cos(phi)*np.cos(alpha)*np.cos(theta)-np.sin(phi)*np.sin(alpha)
+
+
+def physical(alpha, theta, phi):
+    '''
+    Directions leaving the sample and in front of the analyzer, the closed form picks the branch leaving the sample.
+    On the sample surface cos(alpha)cos(theta) = 0 both branches solve the equations and rounding picks one.
+    '''
+    return (towardsAnalyzer(alpha, theta, phi) >= 0) & (np.cos(alpha)*np.cos(theta) > 1e-9)
+
+
+def angleGrid(center, width, n):
+    a, t = np.meshgrid(np.radians(np.linspace(center[0]-width, center[0]+width, n)), 
+    np.radians(np.linspace(center[1]-width, center[1]+width, n)), indexing='ij')
+    return a.ravel(), t.ravel()
+
+
+@pytest.mark.parametrize("bias", BIASES)
+def test_inverts_forward_map_up_to_the_edge(bias):
+    phi = np.radians(bias)
+    alpha, theta = angleGrid((0, 0), 90, 361)
+    keep = physical(alpha, theta, phi)
+    alpha, theta = alpha[keep], theta[keep]
+    px, py = forward(alpha, theta, phi)
+    a, t = Data.solveAngles(phi, px, py)
+    solved = a != pi
+    # points are lost only on the edge px^2+py^2 = 1, where rounding may put them outside
+    assert (px*px+py*py)[~solved].min(initial=1) > 1-1e-12
+    x, y = forward(a[solved], t[solved], phi)
+    assert np.abs(x-px[solved]).max() < 1e-12 and np.abs(y-py[solved]).max() < 1e-12
+    assert (towardsAnalyzer(a[solved], t[solved], phi) > -1e-12).all()
+    inner = solved & (np.abs(alpha) < np.radians(89)) & (np.abs(theta) < np.radians(89))
+    assert np.abs(a-alpha)[inner].max() < 1e-6 and np.abs(t-theta)[inner].max() < 1e-6
+
+
+@pytest.mark.parametrize("bias", BIASES)
+def test_no_solution_outside_valid_region(bias):
+    px, py = np.meshgrid(np.linspace(-1.5, 1.5, 121), np.linspace(-1.5, 1.5, 121), indexing='ij')
+    px, py = px.ravel(), py.ravel()
+    a, t = Data.solveAngles(np.radians(bias), px, py)
+    outside = px*px+py*py > 1
+    assert (a[outside] == pi).all() and (t[outside] == pi).all()
+    assert (a[px*px+py*py < 1-1e-9] != pi).all()
+
+
+@pytest.mark.parametrize("energy", [5, 20, 100])
+@pytest.mark.parametrize("bias, center", [(0, (0, 0)), (0, (30, 60)), (0, (74, 74)), (10, (0, 0)), (10, (30, 60)), 
+(10, (60, 0)), (30, (0, 0)), (30, (30, 0)), (30, (0, 74)), (-45, (0, 0)), (-45, (-30, 30))])
+def test_matches_iterative_solver(energy, bias, center):
+    '''
+    kx, ky of an analyzer window of +-15 degrees around center, the solver starts from the center as in interpzcut_v.
+    '''
+    phi = np.radians(bias)
+    alpha, theta = angleGrid(center, 15, 61)
+    keep = physical(alpha, theta, phi)
+    k = 0.512*np.sqrt(energy)
+    kx, ky = (k*p for p in forward(alpha[keep], theta[keep], phi))
+    px, py = kx/(0.512*np.sqrt(energy)), ky/(0.512*np.sqrt(energy))
+    a, t = Data.solveAngles(phi, px, py)
+    na = np.full(len(px), np.radians(center[0]))
+    nt = np.full(len(px), np.radians(center[1]))
+    Data.kspace.solver(na, nt, phi, px, py, 1e-10, 100)
+    converged = na != pi
+    assert converged.mean() > 0.99
+    assert np.abs(na-a)[converged].max() < 1e-6 and np.abs(nt-t)[converged].max() < 1e-6
+
+
+def direction(alpha, theta):
+    '''
+    Emission direction, (alpha, theta) and (pi-alpha, theta+pi) are the same one.
+    '''
+    return np.stack((np.sin(alpha), np.cos(alpha)*np.sin(theta), np.cos(alpha)*np.cos(theta)))
+
+
+@pytest.mark.parametrize("bias, center", [(10, (60, 60)), (10, (60, 74)), (30, (30, 60))])
+def test_edge_against_iterative_solver(bias, center):
+    '''
+    Near the edge the iterative solver may converge to the solution behind the analyzer, or not at all.
+    The closed form still inverts every point, and matches the solver wherever it found the physical solution.
+    '''
+    phi = np.radians(bias)
+    alpha, theta = angleGrid(center, 15, 61)
+    keep = physical(alpha, theta, phi)
+    px, py = forward(alpha[keep], theta[keep], phi)
+    assert (px*px+py*py).max() > 1-1e-7
+    a, t = Data.solveAngles(phi, px, py)
+    np.testing.assert_allclose(a, alpha[keep], atol=1e-6)
+    np.testing.assert_allclose(t, theta[keep], atol=1e-6)
+    na, nt = np.full(len(px), np.radians(center[0])), np.full(len(px), np.radians(center[1]))
+    Data.kspace.solver(na, nt, phi, px, py, 1e-10, 100)
+    found = (na != pi) & physical(na, nt, phi)
+    assert found.any()
+    assert np.abs(direction(na, nt)-direction(a, t))[:, found].max() < 1e-6
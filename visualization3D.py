@@ -53,6 +53,8 @@ class MYWidget(QWidget):
     def __init__(self, Win):
         super(MYWidget, self).__init__()
         self.Win = Win
+        self.data = None
+        self.version = None   # version of the data shown, the scene is rebuilt only for a new one
         self.setFocusPolicy(Qt.ClickFocus)
         self.box = QVBoxLayout()
 
@@ -166,6 +168,7 @@ class MYWidget(QWidget):
 
     def setData(self, Data):
         self.data = Data
+        self.version = None if Data is None else Data.version
         self.visualization.scene.mlab.clf()
         xSF = self.xScalingFactor.value()
         ySF = self.yScalingFactor.value()
@@ -286,4 +289,4 @@ class MYWidget(QWidget):
                 self.iso_groupbox.setEnabled(True)
         else:
             self.volume_groupbox.setEnabled(False)
-            self.iso_groupbox.setEnabled(False)
\ No newline at end of file
+            self.iso_groupbox.setEnabled(False)